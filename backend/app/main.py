@@ -4,7 +4,8 @@ from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
 from .routes import health, bills, investments
-from .routes import rates
+from .routes import portfolio, rates
+from .services import bill_store, blocking_io, compression, db, http_clients, job_queue, pdf_service, portfolio_history, temp_sweeper, tracing
 from .services.scheduler import run_daily_1030_job
 
 
@@ -13,7 +14,21 @@ def create_app() -> FastAPI:
 
   @app.on_event("startup")
   async def _startup() -> None:
+    await http_clients.startup()
+    await pdf_service.startup()
+    await blocking_io.run_blocking(portfolio_history.ensure_built)
+    await blocking_io.run_blocking(bill_store.sync_from_disk)
+    await job_queue.start(bills.run_extraction_job)
     asyncio.create_task(run_daily_1030_job())
+    asyncio.create_task(temp_sweeper.run_forever())
+
+  @app.on_event("shutdown")
+  async def _shutdown() -> None:
+    await job_queue.stop()
+    await http_clients.shutdown()
+    pdf_service.shutdown()
+    blocking_io.shutdown()
+    db.close_pool()
 
   # Allow local frontend (Vite) to call this API during development
   app.add_middleware(
@@ -27,10 +42,17 @@ def create_app() -> FastAPI:
     allow_headers=["*"],
   )
 
+  # gzip, or brotli when available, for JSON bodies above COMPRESS_MIN_BYTES.
+  app.add_middleware(compression.CompressionMiddleware)
+
+  # Outermost, so every log line and span of a request carries its trace id.
+  app.add_middleware(tracing.TraceMiddleware)
+
   app.include_router(health.router, prefix="/health", tags=["health"])
   app.include_router(bills.router, prefix="/bills", tags=["bills"])
   app.include_router(investments.router, prefix="/investments", tags=["investments"])
   app.include_router(rates.router, prefix="/rates", tags=["rates"])
+  app.include_router(portfolio.router, prefix="/portfolio", tags=["portfolio"])
 
   return app
 
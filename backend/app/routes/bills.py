@@ -1,13 +1,19 @@
 from fastapi import APIRouter, File, UploadFile, HTTPException
-from fastapi import APIRouter, File, UploadFile, HTTPException, Form
-from fastapi.responses import JSONResponse
+from fastapi import APIRouter, File, UploadFile, HTTPException, Form, Query
+from fastapi.responses import JSONResponse, StreamingResponse
+import asyncio
 import base64
 import json
+import mimetypes
 import os
+import time
 import uuid
+import zipfile
 
-from ..services.openai_client import OpenAIClient
-from ..services.pdf_service import pdf_first_page_to_png_bytes
+from ..services import bill_store, blocking_io, extraction_cache, image_preprocess, job_queue, job_store, openai_client, pdf_service, tracing
+
+
+log = tracing.get_logger("bills")
 
 
 def _compute_missing_stonecost(extracted: dict) -> dict:
@@ -33,7 +39,7 @@ def _compute_missing_stonecost(extracted: dict) -> dict:
   """
   # Already has stoneCost value > 0, use it
   if isinstance(extracted.get('stoneCost'), (int, float)) and extracted['stoneCost'] > 0:
-    print(f"[_compute_missing_stonecost] Using direct stoneCost: {extracted['stoneCost']}")
+    log.debug("Using direct stoneCost", stone_cost=extracted['stoneCost'])
     return extracted
   
   # Try to compute from grossPrice - (weight × rate)
@@ -50,20 +56,232 @@ def _compute_missing_stonecost(extracted: dict) -> dict:
     
     if computed_stone > 0:
       extracted['stoneCost'] = round(computed_stone, 2)
-      print(f"[_compute_missing_stonecost] Computed stoneCost: {extracted['stoneCost']} "
-            f"(grossPrice={gross_price} - metalCost={net_metal_cost})")
+      log.debug("Computed stoneCost", stone_cost=extracted['stoneCost'], gross_price=gross_price, metal_cost=net_metal_cost)
       return extracted
     else:
-      print(f"[_compute_missing_stonecost] Computed stoneCost would be ≤ 0 "
-            f"({computed_stone}), leaving as-is")
+      log.debug("Computed stoneCost would be <= 0, leaving as-is", computed=computed_stone)
       return extracted
   
   # Cannot compute, leave as-is
-  print(f"[_compute_missing_stonecost] Cannot compute stoneCost "
-        f"(grossPrice={gross_price}, netWeight={net_weight}, goldRate={gold_rate})")
+  log.debug("Cannot compute stoneCost", gross_price=gross_price, net_weight=net_weight, gold_rate=gold_rate)
   return extracted
 
 
+def _duplicate_detail(existing: dict, original_name: str) -> str:
+  if existing["original_name"] == original_name:
+    return f"A file named '{original_name}' already exists. Please remove it before uploading."
+  return (
+    f"This bill was already uploaded as '{existing['original_name']}' (bill_id {existing['bill_id']}). "
+    f"Use POST /bills/{existing['bill_id']}/extract to extract it again."
+  )
+
+
+def _images_hash(hashes: list[str]) -> str:
+  # Keyed on the images before preprocessing, so a cache hit skips that work too. With
+  # preprocessing off a single image keeps its plain content hash, matching older entries.
+  if len(hashes) == 1:
+    content_hash = hashes[0]
+  else:
+    content_hash = extraction_cache.sha256_hex("\n".join(hashes))
+  if image_preprocess.preset()[1] is None:
+    return content_hash
+  return extraction_cache.sha256_hex(f"{image_preprocess.signature()}\n{content_hash}")
+
+
+def _multi_page_prompt(extraction_prompt: str, pages: int) -> str:
+  if pages == 1:
+    return extraction_prompt
+  return (
+    f"{extraction_prompt}\n\nThe bill spans {pages} pages, attached as images in page order. "
+    "Combine them into ONE JSON object for the whole bill."
+  )
+
+
+async def _image_url(source: bytes | str, mime: str) -> str | openai_client.ImageFile:
+  """A data URL for in-memory image bytes; a stored file is streamed from disk instead."""
+  if isinstance(source, str):
+    return await blocking_io.run_blocking(openai_client.ImageFile, source, mime)
+  return f"data:{mime};base64,{base64.b64encode(source).decode('ascii')}"
+
+
+async def _extract(extraction_prompt: str, images: list[bytes | str], hashes: list[str], mime: str, force_refresh: bool, label: str) -> tuple[dict, bool, dict | None]:
+  """Run the vision extraction for a bill's images, going through the extraction cache.
+
+  ``images`` are rendered page bytes or the path of a stored image upload; ``hashes`` are
+  their content hashes.
+
+  The cache key is the image hash (including the preprocessing preset), the prompt hash
+  and the model, so editing a prompt or switching models never serves stale output.
+  Returns (extracted, cached, payload report); the report is None on a cache hit.
+  """
+  extraction_prompt = _multi_page_prompt(extraction_prompt, len(images))
+  image_hash = _images_hash(hashes)
+  prompt_hash = extraction_cache.sha256_hex(extraction_prompt)
+  model = openai_client.MODEL
+  if not force_refresh:
+    cached = await blocking_io.run_blocking(extraction_cache.get, image_hash, prompt_hash, model)
+    if cached is not None:
+      log.info("Extraction cache hit", label=label, image_hash=image_hash[:12])
+      with tracing.span("bills.stonecost"):
+        return _compute_missing_stonecost(cached), True, None
+
+  prepared, payload = await image_preprocess.preprocess(images, mime)
+  log.info("Preprocessed bill images", label=label, **payload)
+
+  # Built once a model slot is free, so queued requests do not each hold encoded images.
+  async def data_urls() -> list[str | openai_client.ImageFile]:
+    return [await _image_url(img, m) for img, m in prepared]
+
+  client = openai_client.get_client()
+  result = await client.call_gpt4o_vision(extraction_prompt, data_urls)
+  with tracing.span("bills.postprocess", label=label):
+    extracted_raw = result["content"] or "{}"
+    with tracing.span("bills.parse", content_length=len(extracted_raw)):
+      try:
+        extracted_json = json.loads(extracted_raw)
+        parsed = True
+      except json.JSONDecodeError:
+        log.warning("Failed to parse JSON from OpenAI content, wrapping as raw", label=label)
+        extracted_json = {"raw": extracted_raw}
+        parsed = False
+    if parsed:
+      # Only well-formed extractions are cached; the stored copy is pre-post-processing so
+      # changes to _compute_missing_stonecost apply to cache hits too.
+      await blocking_io.run_blocking(extraction_cache.put, image_hash, prompt_hash, model, extracted_json)
+    # Whole bills only at DEBUG; the fields are not serialized otherwise.
+    log.debug("Extracted bill", label=label, extracted=extracted_json)
+
+    # Post-process: Compute stoneCost if not extracted (for diamond bills)
+    with tracing.span("bills.stonecost"):
+      extracted_json = _compute_missing_stonecost(extracted_json)
+  return extracted_json, False, payload
+
+
+async def _render_pdf(path: str) -> tuple[list[bytes], bool]:
+  """A PDF's pages rendered to PNG, and whether pages past PDF_MAX_PAGES were left out."""
+  pages, page_count = await pdf_service.render_pages(path)
+  if not pages:
+    log.warning("pdf_service.render_pages returned no pages", path=path)
+    raise ValueError("Unable to render PDF: it has no pages or could not be read")
+  log.debug("Rendered PDF pages", png_bytes=[len(p) for p in pages])
+  return pages, page_count > pdf_service.MAX_PAGES
+
+
+async def _model_images(path: str, sha256: str, content_type: str, rendered: tuple[list[bytes], bool] | None = None) -> tuple[list[bytes | str], list[str], str, str, bool]:
+  """(images, hashes, mime, label, truncated) sent to the model: a stored image by path, or
+  a PDF's pages rendered to PNG (pass ``rendered`` if they were already rendered)."""
+  if content_type == "application/pdf":
+    pages, truncated = rendered or await _render_pdf(path)
+    return pages, [extraction_cache.sha256_hex(p) for p in pages], "image/png", "pdf", truncated
+  return [path], [sha256], content_type, "image", False
+
+
+def _extraction_prompt(category: str | None) -> str:
+  if category in {"diamond_jewellery", "diamond"}:
+    return EXTRACTION_PROMPT_DIAMOND
+  return EXTRACTION_PROMPT_GOLD
+
+
+def _is_supported(content_type: str) -> bool:
+  return content_type.startswith("image/") or content_type == "application/pdf"
+
+
+def _original_name(filename: str | None, bill_id: str, content_type: str) -> str:
+  # Use the original filename when saving temporarily. Sanitize to basename to avoid path traversal.
+  original_name = os.path.basename(filename) if filename else ''
+  # Fallback to uuid-based name if original filename missing
+  if not original_name:
+    original_name = f"{bill_id}.pdf" if content_type == 'application/pdf' else f"{bill_id}.img"
+  return original_name
+
+
+async def _reject_duplicate(content_hash: str, original_name: str) -> None:
+  # Reject a bill whose content (even under another name) or original filename is already
+  # registered. Both are indexed lookups in the bills table.
+  with tracing.span("bills.dedupe"):
+    existing = await blocking_io.run_blocking(bill_store.find_duplicate, content_hash, original_name)
+  if existing:
+    log.info("Duplicate bill rejected", original_name=original_name, existing_bill_id=existing["bill_id"], existing_name=existing["original_name"])
+    raise HTTPException(status_code=409, detail=_duplicate_detail(existing, original_name))
+
+
+async def _save_temp(bill_id: str, original_name: str, staged: bill_store.StagedUpload, content_type: str) -> str | None:
+  """Register the staged upload and move it to temp storage; returns its path, or None if the move failed."""
+  try:
+    bill, duplicate = await blocking_io.run_blocking(bill_store.register_staged, bill_id, original_name, staged, content_type)
+  except OSError as e:
+    log.error("Failed to save bill to temp storage", bill_id=bill_id, error=str(e))
+    return None
+  if duplicate:
+    raise HTTPException(status_code=409, detail=_duplicate_detail(duplicate, original_name))
+  path = bill_store.absolute_path(bill["storage_path"])
+  log.info("Saved bill to temp storage", bill_id=bill_id, path=path)
+  return path
+
+
+async def _ingest(upload: UploadFile) -> bill_store.StagedUpload:
+  """Stream an upload into the incoming directory in chunks, hashing and enforcing
+  BILL_MAX_UPLOAD_BYTES as it goes, so the file is never held in memory whole."""
+  if upload.size is not None and upload.size > bill_store.MAX_UPLOAD_BYTES:
+    raise HTTPException(status_code=413, detail=f"'{upload.filename}' is too large. {bill_store.UploadTooLarge(bill_store.MAX_UPLOAD_BYTES)}")
+  staged = await blocking_io.run_blocking(bill_store.StagedUpload)
+  try:
+    with tracing.span("bills.read") as span:
+      while chunk := await upload.read(bill_store.HASH_CHUNK_BYTES):
+        await blocking_io.run_blocking(staged.write, chunk)
+      span["bytes"] = staged.size
+      return await blocking_io.run_blocking(staged.finish)
+  except bill_store.UploadTooLarge as e:
+    raise HTTPException(status_code=413, detail=f"'{upload.filename}' is too large. {e}")
+  except BaseException:
+    await blocking_io.run_blocking(staged.discard)
+    raise
+
+
+async def _extract_stored(bill_id: str, category: str | None, force_refresh: bool) -> dict | None:
+  """render → OpenAI → _compute_missing_stonecost for a registered bill, through the
+  extraction cache; None if the bill is not registered."""
+  bill = await blocking_io.run_blocking(bill_store.get_bill, bill_id)
+  if bill is None:
+    return None
+  # Looked up at run time, since the bill may have been committed (moved) meanwhile.
+  path = bill_store.absolute_path(bill["storage_path"])
+  content_type = bill["content_type"] or mimetypes.guess_type(bill["original_name"])[0] or "application/octet-stream"
+  images, hashes, mime, label, truncated = await _model_images(path, bill["sha256"], content_type)
+  extracted_json, cached, payload = await _extract(_extraction_prompt(category), images, hashes, mime, force_refresh, label)
+  return {
+    "bill_id": bill["bill_id"],
+    "file_path": path,
+    "extracted": extracted_json,
+    "cached": cached,
+    "truncated": truncated,
+    "payload": payload,
+  }
+
+
+async def run_extraction_job(job: dict) -> dict:
+  """Job-queue handler: extract a stored bill."""
+  result = await _extract_stored(job["bill_id"], job["category"], job["force_refresh"])
+  if result is None:
+    raise ValueError(f"Bill {job['bill_id']} is not registered")
+  return result
+
+
+def _job_view(job: dict) -> dict:
+  return {
+    "job_id": job["job_id"],
+    "bill_id": job["bill_id"],
+    "status": job["state"],
+    "category": job["category"],
+    "attempts": job["attempts"],
+    "created_at": job["created_at"],
+    "started_at": job["started_at"],
+    "finished_at": job["finished_at"],
+    "result": job["result"],
+    "error": job["error"],
+  }
+
+
 router = APIRouter()
 
 
@@ -319,142 +537,257 @@ Rules:
 """
 
 
+async def _upload_one(
+  staged: bill_store.StagedUpload,
+  filename: str | None,
+  content_type: str,
+  category: str | None,
+  force_refresh: bool,
+) -> dict:
+  """Single-bill pipeline shared by /upload and /batch: dedupe, store temp, extract.
+
+  Takes ownership of ``staged``: it is moved into temp storage or discarded.
+  """
+  try:
+    return await _process_staged(staged, filename, content_type, category, force_refresh)
+  finally:
+    await blocking_io.run_blocking(staged.discard)
+
+
+async def _process_staged(
+  staged: bill_store.StagedUpload,
+  filename: str | None,
+  content_type: str,
+  category: str | None,
+  force_refresh: bool,
+) -> dict:
+  extraction_prompt = _extraction_prompt(category)
+
+  if not _is_supported(content_type):
+    log.info("Unsupported content type", content_type=content_type)
+    raise HTTPException(status_code=400, detail="Only image or PDF files are supported")
+
+  # Save uploads to a temporary bills directory. Files will be moved to the final bills
+  # directory only when an investment is saved (user confirms).
+  bill_id = str(uuid.uuid4())
+  log.info("Staged upload", bill_id=bill_id, bytes=staged.size, sha256=staged.sha256[:12])
+  original_name = _original_name(filename, bill_id, content_type)
+  await _reject_duplicate(staged.sha256, original_name)
+
+  # PDFs are rendered before the bill is registered, so an unreadable one is rejected.
+  rendered = None
+  if content_type == "application/pdf":
+    try:
+      rendered = await _render_pdf(staged.path)
+    except ValueError as e:
+      raise HTTPException(status_code=400, detail=str(e))
+
+  file_path = await _save_temp(bill_id, original_name, staged, content_type)
+  images, hashes, mime, label, truncated = await _model_images(file_path or staged.path, staged.sha256, content_type, rendered)
+  extracted_json, cached, payload = await _extract(extraction_prompt, images, hashes, mime, force_refresh, label)
+
+  return {
+    "bill_id": bill_id,
+    "file_path": file_path,
+    "extracted": extracted_json,
+    "cached": cached,
+    "truncated": truncated,
+    "payload": payload,
+  }
+
+
 @router.post("/upload")
-async def upload_bill(file: UploadFile = File(...), category: str | None = Form(default=None)) -> JSONResponse:
+async def upload_bill(
+  file: UploadFile = File(...),
+  category: str | None = Form(default=None),
+  force_refresh: bool = Form(default=False),
+) -> JSONResponse:
   content_type = file.content_type or "application/octet-stream"
-  print(f"[bills.upload] Received file: name={file.filename}, content_type={content_type}")
-  print(f"[bills.upload] Category: {category}")
+  log.info("Received bill", filename=file.filename, content_type=content_type, category=category)
+  if not _is_supported(content_type):
+    log.info("Unsupported content type", content_type=content_type)
+    raise HTTPException(status_code=400, detail="Only image or PDF files are supported")
 
-  extraction_prompt = EXTRACTION_PROMPT_GOLD
-  if category in {"diamond_jewellery", "diamond"}:
-    extraction_prompt = EXTRACTION_PROMPT_DIAMOND
+  staged = await _ingest(file)
+  return JSONResponse(await _upload_one(staged, file.filename, content_type, category, force_refresh))
 
-  if not (content_type.startswith("image/") or content_type == "application/pdf"):
-    print("[bills.upload] Unsupported content type")
-    raise HTTPException(status_code=400, detail="Only image or PDF files are supported")
 
-  raw_bytes = await file.read()
-  print(f"[bills.upload] Raw bytes length: {len(raw_bytes)}")
+BATCH_MAX_CONCURRENCY = int(os.getenv("BILLS_BATCH_MAX_CONCURRENCY", "16"))
+BATCH_DEFAULT_CONCURRENCY = int(os.getenv("BILLS_BATCH_CONCURRENCY", "4"))
+BATCH_MAX_FILES = int(os.getenv("BILLS_BATCH_MAX_FILES", "500"))
 
-  # Save uploads to a temporary bills directory. Files will be moved to the final bills
-  # directory only when an investment is saved (user confirms).
-  base_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "files"))
-  temp_dir = os.path.join(base_dir, "temp_bills")
-  os.makedirs(temp_dir, exist_ok=True)
-  bills_dir = os.path.join(base_dir, "bills")
-  os.makedirs(bills_dir, exist_ok=True)
-  print(f"[bills.upload] Temp bills directory: {temp_dir}")
-  print(f"[bills.upload] Final bills directory: {bills_dir}")
+_ZIP_TYPES = {"application/zip", "application/x-zip-compressed", "application/x-zip"}
 
-  bill_id = str(uuid.uuid4())
-  print(f"[bills.upload] Generated bill_id: {bill_id}")
 
-  # Use the original filename when saving temporarily. Sanitize to basename to avoid path traversal.
-  original_name = os.path.basename(file.filename) if file.filename else ''
-  # Fallback to uuid-based name if original filename missing
-  if not original_name:
-    original_name = f"{bill_id}.pdf" if content_type == 'application/pdf' else f"{bill_id}.img"
-  # Temp filename includes bill_id prefix to allow lookup on commit
-  temp_filename = f"{bill_id}_{original_name}"
-  temp_path = os.path.join(temp_dir, temp_filename)
+def _is_zip(filename: str | None, content_type: str) -> bool:
+  return content_type in _ZIP_TYPES or (filename or "").lower().endswith(".zip")
 
-  # If a file with the same original filename already exists in temp or final bills,
-  # reject the upload to avoid duplicates.
+
+def _expand_zip(path: str) -> list[tuple[str, str, bill_store.StagedUpload]]:
+  """Stage every file in the archive, skipping folders and OS metadata (blocking).
+
+  Entries are decompressed a chunk at a time under the same size limit as uploads, so a
+  zip bomb is cut off rather than inflated into memory. On any error the entries staged
+  so far are discarded.
+  """
+  items = []
   try:
-    existing_temp = os.listdir(temp_dir)
-  except OSError:
-    existing_temp = []
+    with zipfile.ZipFile(path) as archive:
+      for info in archive.infolist():
+        base = os.path.basename(info.filename)
+        if info.is_dir() or not base or base.startswith(".") or info.filename.startswith("__MACOSX/"):
+          continue
+        content_type = mimetypes.guess_type(base)[0] or "application/octet-stream"
+        staged = bill_store.StagedUpload()
+        items.append((base, content_type, staged))
+        with archive.open(info) as src:
+          for chunk in iter(lambda: src.read(bill_store.HASH_CHUNK_BYTES), b""):
+            staged.write(chunk)
+        staged.finish()
+        if len(items) > BATCH_MAX_FILES:
+          break
+  except BaseException:
+    for _, _, staged in items:
+      staged.discard()
+    raise
+  return items
+
+
+def _discard_all(items: list[tuple[str | None, str, bill_store.StagedUpload]]) -> None:
+  for _, _, staged in items:
+    staged.discard()
+
+
+@router.post("/batch")
+async def upload_bills_batch(
+  files: list[UploadFile] = File(...),
+  category: str | None = Form(default=None),
+  force_refresh: bool = Form(default=False),
+  concurrency: int = Form(default=BATCH_DEFAULT_CONCURRENCY),
+) -> StreamingResponse:
+  """Upload many bills (or zip archives of bills) and extract them concurrently.
+
+  Results stream back as NDJSON, one line per file in completion order, each carrying the
+  file's ``index`` in the upload. Every file goes through the same duplicate checks and
+  post-processing as /upload; a failing file yields an error line and does not stop the
+  batch. A final ``{"summary": ...}`` line closes the stream.
+  """
+  items: list[tuple[str | None, str, bill_store.StagedUpload]] = []
   try:
-    existing_final = os.listdir(bills_dir)
-  except OSError:
-    existing_final = []
-
-  def _matches_existing(name: str) -> bool:
-    # check exact name or prefixed with uuid_ pattern
-    if name == original_name:
-      return True
-    if name.endswith(f"_{original_name}"):
-      return True
-    return False
-
-  for fn in existing_temp + existing_final:
-    if _matches_existing(fn):
-      print(f"[bills.upload] Duplicate file detected for original name {original_name} -> existing: {fn}")
-      raise HTTPException(status_code=409, detail=f"A file named '{original_name}' already exists. Please remove it before uploading.")
-
-  if content_type.startswith("image/"):
-    # Save image temporarily
-    file_path = temp_path
-    try:
-      with open(file_path, "wb") as f:
-        f.write(raw_bytes)
-      print(f"[bills.upload] Saved image to temp path {file_path}")
-    except OSError as e:
-      print(f"[bills.upload] Failed to save image to temp path: {e}")
-      file_path = None
-
-    b64 = base64.b64encode(raw_bytes).decode("utf-8")
-    data_url = f"data:{content_type};base64,{b64}"
-    client = OpenAIClient()
-    result = await client.call_gpt4o_vision(extraction_prompt, data_url)
-    extracted_raw = result["content"] or "{}"
-    print(f"[bills.upload] OpenAI content length (image): {len(extracted_raw)}")
+    for upload in files:
+      content_type = upload.content_type or "application/octet-stream"
+      staged = await _ingest(upload)
+      if _is_zip(upload.filename, content_type):
+        try:
+          items.extend(await blocking_io.run_blocking(_expand_zip, staged.path))
+        except zipfile.BadZipFile:
+          raise HTTPException(status_code=400, detail=f"'{upload.filename}' is not a valid zip archive")
+        except bill_store.UploadTooLarge as e:
+          raise HTTPException(status_code=413, detail=f"A file in '{upload.filename}' is too large. {e}")
+        finally:
+          await blocking_io.run_blocking(staged.discard)
+      else:
+        items.append((upload.filename, content_type, staged))
+      if len(items) > BATCH_MAX_FILES:
+        raise HTTPException(status_code=413, detail=f"A batch may contain at most {BATCH_MAX_FILES} files")
+    if not items:
+      raise HTTPException(status_code=400, detail="No files to process")
+  except BaseException:
+    await blocking_io.run_blocking(_discard_all, items)
+    raise
+
+  workers = max(1, min(concurrency, BATCH_MAX_CONCURRENCY))
+  limit = asyncio.Semaphore(workers)
+  log.info("Processing batch", files=len(items), concurrency=workers)
+
+  async def process(index: int, filename: str | None, content_type: str, staged: bill_store.StagedUpload) -> dict:
+    async with limit:
+      try:
+        result = await _upload_one(staged, filename, content_type, category, force_refresh)
+        return {"index": index, "filename": filename, "status": "ok", **result}
+      except HTTPException as e:
+        return {"index": index, "filename": filename, "status": "error", "status_code": e.status_code, "detail": e.detail}
+      except Exception as e:
+        log.warning("Batch file failed", filename=filename, error=str(e))
+        return {"index": index, "filename": filename, "status": "error", "status_code": 502, "detail": str(e)}
+
+  async def stream():
+    started = time.perf_counter()
+    tasks = [asyncio.ensure_future(process(i, *item)) for i, item in enumerate(items)]
+    ok = 0
     try:
-      extracted_json = json.loads(extracted_raw)
-    except json.JSONDecodeError:
-      print("[bills.upload] Failed to parse JSON from OpenAI content (image), wrapping as raw.")
-      extracted_json = {"raw": extracted_raw}
-    print(f"[bills.upload] extracted_json keys (image): {list(extracted_json.keys())}")
-    print(f"[bills.upload] extracted_json (image): {extracted_json}")
-    
-    # Post-process: Compute stoneCost if not extracted (for diamond bills)
-    extracted_json = _compute_missing_stonecost(extracted_json)
-    
-    return JSONResponse({
-      "bill_id": bill_id,
-      "file_path": file_path,
-      "extracted": extracted_json,
-    })
+      for next_done in asyncio.as_completed(tasks):
+        line = await next_done
+        ok += line["status"] == "ok"
+        yield json.dumps(line) + "\n"
+    finally:
+      # Client went away: do not keep spending model calls on a batch nobody reads.
+      for task in tasks:
+        task.cancel()
+      # Files whose task never started are still staged.
+      await blocking_io.run_blocking(_discard_all, items)
+    elapsed = time.perf_counter() - started
+    yield json.dumps({"summary": {
+      "files": len(items),
+      "ok": ok,
+      "failed": len(items) - ok,
+      "elapsed_s": round(elapsed, 3),
+      "files_per_sec": round(len(items) / elapsed, 2) if elapsed > 0 else None,
+    }}) + "\n"
+
+  return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+
+@router.post("/jobs", status_code=202)
+async def create_extraction_job(
+  file: UploadFile = File(...),
+  category: str | None = Form(default=None),
+  force_refresh: bool = Form(default=False),
+) -> JSONResponse:
+  """Store the bill and queue its extraction; poll GET /bills/jobs/{job_id} for the result."""
+  content_type = file.content_type or "application/octet-stream"
+  if not _is_supported(content_type):
+    raise HTTPException(status_code=400, detail="Only image or PDF files are supported")
 
-  if content_type == "application/pdf":
-    png_bytes = pdf_first_page_to_png_bytes(raw_bytes)
-    if not png_bytes:
-      print("[bills.upload] pdf_first_page_to_png_bytes returned no data")
-      raise HTTPException(status_code=400, detail="Unable to render first page of PDF")
-    print(f"[bills.upload] Rendered first page PNG length: {len(png_bytes)}")
-
-    # Save PDF temporarily
-    file_path = temp_path
-    try:
-      with open(file_path, "wb") as f:
-        f.write(raw_bytes)
-      print(f"[bills.upload] Saved PDF to temp path {file_path}")
-    except OSError as e:
-      print(f"[bills.upload] Failed to save PDF to temp path: {e}")
-      file_path = None
-
-    b64 = base64.b64encode(png_bytes).decode("utf-8")
-    data_url = "data:image/png;base64," + b64
-    client = OpenAIClient()
-    result = await client.call_gpt4o_vision(extraction_prompt, data_url)
-    extracted_raw = result["content"] or "{}"
-    print(f"[bills.upload] OpenAI content length (pdf): {len(extracted_raw)}")
-    try:
-      extracted_json = json.loads(extracted_raw)
-    except json.JSONDecodeError:
-      print("[bills.upload] Failed to parse JSON from OpenAI content (pdf), wrapping as raw.")
-      extracted_json = {"raw": extracted_raw}
-    print(f"[bills.upload] extracted_json keys (pdf): {list(extracted_json.keys())}")
-    print(f"[bills.upload] extracted_json (pdf): {extracted_json}")
-    
-    # Post-process: Compute stoneCost if not extracted (for diamond bills)
-    extracted_json = _compute_missing_stonecost(extracted_json)
-    
-    return JSONResponse({
-      "bill_id": bill_id,
-      "file_path": file_path,
-      "extracted": extracted_json,
-    })
-
-  print("[bills.upload] Reached unsupported content type branch")
-  raise HTTPException(status_code=400, detail="Unsupported content type")
+  staged = await _ingest(file)
+  try:
+    bill_id = str(uuid.uuid4())
+    original_name = _original_name(file.filename, bill_id, content_type)
+    await _reject_duplicate(staged.sha256, original_name)
+    if await _save_temp(bill_id, original_name, staged, content_type) is None:
+      raise HTTPException(status_code=500, detail="Failed to store uploaded bill")
+  finally:
+    await blocking_io.run_blocking(staged.discard)
+
+  job = await blocking_io.run_blocking(job_store.create_job, bill_id, category, force_refresh)
+  job_queue.notify()
+  log.info("Queued extraction job", job_id=job["job_id"], bill_id=bill_id)
+  return JSONResponse(_job_view(job), status_code=202, headers={"Location": f"/bills/jobs/{job['job_id']}"})
+
+
+@router.get("/jobs/{job_id}")
+async def get_extraction_job(job_id: str) -> dict:
+  job = await blocking_io.run_blocking(job_store.get_job, job_id)
+  if not job:
+    raise HTTPException(status_code=404, detail="Job not found")
+  return _job_view(job)
+
+
+@router.post("/{bill_id}/extract")
+async def extract_stored_bill(
+  bill_id: str,
+  category: str | None = Query(default=None),
+  force_refresh: bool = Query(default=False),
+) -> dict:
+  """Extract an already uploaded bill again.
+
+  Goes through the extraction cache like an upload, so an unchanged bill, prompt and model
+  are served from it; ``force_refresh`` calls the model regardless and refreshes the entry.
+  """
+  try:
+    result = await _extract_stored(bill_id, category, force_refresh)
+  except ValueError as e:
+    raise HTTPException(status_code=400, detail=str(e))
+  if result is None:
+    raise HTTPException(status_code=404, detail="Bill not found")
+  return result
@@ -0,0 +1,70 @@
+import datetime as dt
+import hashlib
+import time
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Callable, Dict
+
+from fastapi import HTTPException, Request, Response
+
+from ..services import blocking_io, metrics, versions
+
+
+def _matches(if_none_match: str, etag: str) -> bool:
+  # Weak comparison (RFC 9110 13.1.2): compression may change the bytes, not the meaning.
+  opaque = etag.removeprefix("W/")
+  return any(tag.strip() == "*" or tag.strip().removeprefix("W/") == opaque for tag in if_none_match.split(","))
+
+
+def _not_modified_since(if_modified_since: str, last_modified: float) -> bool:
+  try:
+    since = parsedate_to_datetime(if_modified_since)
+  except (TypeError, ValueError):
+    return False
+  return since.timestamp() >= int(last_modified)
+
+
+def conditional(*resources: str) -> Callable:
+  """Dependency adding ETag / Last-Modified to a GET and answering revalidations with 304.
+
+  The validators come from the data_versions rows of ``resources`` (bumped by triggers in
+  every writer's transaction, see ``versions``), the path and the query string, so they
+  agree across workers and a matching ``If-None-Match`` (or, failing that,
+  ``If-Modified-Since``) is answered before the endpoint runs: no query beyond the shared,
+  at most once a second, versions read, and no serialization. The versions are read
+  before the endpoint does, so a write racing the request leaves the response with an
+  older tag and the next poll refetches.
+
+  Returns the headers, for endpoints that build their own ``Response``.
+  """
+
+  async def dependency(request: Request, response: Response) -> Dict[str, str]:
+    snapshot = versions.peek()
+    if snapshot is None:
+      snapshot = await blocking_io.run_blocking(versions.current)
+    seen = [snapshot.get(resource, versions.UNWRITTEN) for resource in resources]
+    # Today's rows (and "no rate yet" answers) turn over at midnight without a write.
+    last_modified = max([ts for _, ts in seen] + [time.mktime(dt.date.today().timetuple())])
+    key = "|".join((
+      request.url.path,
+      request.url.query,
+      ",".join(f"{v}@{ts!r}" for v, ts in seen),
+      dt.date.today().isoformat(),
+    ))
+    etag = f'W/"{hashlib.blake2b(key.encode(), digest_size=8).hexdigest()}"'
+    headers = {
+      "ETag": etag,
+      "Last-Modified": formatdate(last_modified, usegmt=True),
+      "Cache-Control": "no-cache",
+    }
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+      fresh = _matches(if_none_match, etag)
+    else:
+      fresh = _not_modified_since(request.headers.get("if-modified-since", ""), last_modified)
+    if fresh:
+      metrics.increment("http.not_modified")
+      raise HTTPException(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return headers
+
+  return dependency
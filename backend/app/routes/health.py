@@ -1,5 +1,7 @@
 from fastapi import APIRouter
 
+from ..services import blocking_io, db, extraction_cache, job_queue, job_store, metrics, openai_client, rate_store, temp_sweeper
+
 
 router = APIRouter()
 
@@ -7,3 +9,36 @@ router = APIRouter()
 @router.get("/")
 async def health_check() -> dict:
   return {"status": "ok"}
+
+
+def _db_backed_stats() -> dict:
+  return {
+    "extraction_cache": extraction_cache.stats(),
+    "job_states": job_store.counts(),
+  }
+
+
+@router.get("/stats")
+async def health_stats() -> dict:
+  """Internal counters used to size pools and caches."""
+  db_backed = await blocking_io.run_blocking(_db_backed_stats)
+  return {
+    "db_pool": db.pool_stats(),
+    "rate_cache": rate_store.cache_stats(),
+    "rate_index": rate_store.index_stats(),
+    "rate_fetches": rate_store.rate_fetches.stats(),
+    "extraction_cache": db_backed["extraction_cache"],
+    "extraction_jobs": {**job_queue.stats(), "states": db_backed["job_states"]},
+    "openai": {**openai_client.concurrency_stats(), **metrics.snapshot("openai.")},
+    "upstreams": metrics.snapshot("upstream."),
+    "pdf_render": metrics.snapshot("pdf."),
+    "preprocess": metrics.snapshot("preprocess."),
+    "bills": metrics.snapshot("bills."),
+    "temp_bills": temp_sweeper.stats(),
+  }
+
+
+@router.get("/metrics")
+async def health_metrics(prefix: str = "") -> dict:
+  """Every latency histogram (tracing spans included) and counter, optionally filtered by name prefix."""
+  return metrics.snapshot(prefix)
@@ -1,16 +1,22 @@
-from typing import List, Optional
+import codecs
+import csv
+import json
+import os
+import time
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
 
-from fastapi import APIRouter, HTTPException
-from pydantic import BaseModel
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import Response
+from pydantic import BaseModel, ValidationError
 from datetime import date
 
-from ..services import investment_store
-import os
-import shutil
-from fastapi import HTTPException
+from ..services import bill_store, blocking_io, investment_store, tracing
+from .conditional import conditional
+from .params import check_dates
 
 
 router = APIRouter()
+log = tracing.get_logger("investments")
 
 
 class InvestmentIn(BaseModel):
@@ -46,66 +52,96 @@ class InvestmentOut(BaseModel):
   metadata: Optional[dict] = None
 
 
+MAX_PAGE_SIZE = 1000
+
+# Bulk import: rows are validated as they stream in and written in chunks of this size,
+# one transaction per chunk.
+BULK_CHUNK_SIZE = int(os.getenv("INVESTMENTS_BULK_CHUNK_SIZE", "1000"))
+BULK_MAX_ERRORS = 1000
+
+
+def _list_investments_json(filters: dict) -> tuple:
+  records, next_cursor = investment_store.list_investments_page(**filters)
+  return json.dumps(records).encode("utf-8"), next_cursor
+
+
 @router.get("/")
-async def list_investments():
-  records = investment_store.list_investments()
-  # Convert dates to strings for JSON serialization
-  results = []
-  for r in records:
-    item = dict(r)
-    if item.get('date') is not None:
-      item['date'] = item['date'].isoformat() if hasattr(item['date'], 'isoformat') else str(item['date'])
-    results.append(item)
-  return results
+async def list_investments(
+  request: Request,
+  limit: Optional[int] = Query(default=None, ge=1, le=MAX_PAGE_SIZE),
+  cursor: Optional[str] = None,
+  category: Optional[str] = None,
+  vendor: Optional[str] = None,
+  date_from: Optional[str] = Query(default=None, alias="from"),
+  date_to: Optional[str] = Query(default=None, alias="to"),
+  purity: Optional[int] = None,
+  validators: Dict[str, str] = Depends(conditional("investments")),
+):
+  """List investments, newest first.
 
+  Without ``limit`` every matching row is returned (legacy behaviour). With ``limit`` the
+  body holds one page and, if more rows exist, the ``X-Next-Cursor`` header (and a
+  ``Link: rel="next"`` header) carries the cursor for the following page.
+  """
+  check_dates(date_from, date_to)
+  filters = {
+    "limit": limit,
+    "cursor": cursor,
+    "category": category,
+    "vendor": vendor,
+    "date_from": date_from,
+    "date_to": date_to,
+    "purity_karat": purity,
+  }
+  # Rows are loaded and encoded on the I/O executor, so neither the query nor
+  # FastAPI's per-value encoder walk runs on the event loop.
+  try:
+    body, next_cursor = await blocking_io.run_blocking(_list_investments_json, filters)
+  except ValueError as e:
+    raise HTTPException(status_code=400, detail=str(e))
 
-@router.post("/")
-async def create_investment(payload: InvestmentIn):
-  print(f"[investments.create] Received payload: {payload}")
-  
+  headers = dict(validators)
+  if next_cursor:
+    headers["X-Next-Cursor"] = next_cursor
+    headers["Link"] = f'<{request.url.include_query_params(cursor=next_cursor)}>; rel="next"'
+  return Response(content=body, media_type="application/json", headers=headers)
+
+
+def _commit_temp_bill(bill_id: str) -> None:
+  """Move a previously uploaded temp bill into the final bills directory (blocking)."""
+  try:
+    bill_store.commit_bill(bill_id)
+  except FileExistsError:
+    # Conflict: do not overwrite final file
+    bill = bill_store.get_bill(bill_id)
+    name = bill["original_name"] if bill else bill_id
+    raise HTTPException(status_code=400, detail=f"A file named {name} already exists")
+  except OSError as e:
+    log.error("Failed to move bill file", bill_id=bill_id, error=str(e))
+    raise HTTPException(status_code=500, detail="Failed to save uploaded bill file")
+
+
+def _clean_payload(payload: InvestmentIn) -> Dict[str, Any]:
   # Normalize empty strings to None for optional fields to avoid 422 issues
   clean_payload = payload.model_dump()
   for key, value in list(clean_payload.items()):
     if value == "":
       clean_payload[key] = None
+  return clean_payload
+
 
-  print(f"[investments.create] Cleaned payload: {clean_payload}")
+@router.post("/")
+async def create_investment(payload: InvestmentIn):
+  clean_payload = _clean_payload(payload)
+  # Whole payloads only at DEBUG.
+  log.debug("Cleaned investment payload", payload=clean_payload)
   # If a bill was uploaded earlier, move it from temp to final bills directory now that user confirmed save
   bill_id = clean_payload.get('bill_id')
   if bill_id:
-    base_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'files'))
-    temp_dir = os.path.join(base_dir, 'temp_bills')
-    final_dir = os.path.join(base_dir, 'bills')
-    try:
-      os.makedirs(final_dir, exist_ok=True)
-    except OSError:
-      pass
-
-    # Look for a temp file that starts with bill_id_
-    found = None
-    if os.path.isdir(temp_dir):
-      for fname in os.listdir(temp_dir):
-        if fname.startswith(f"{bill_id}_"):
-          found = fname
-          break
-
-    if found:
-      src = os.path.join(temp_dir, found)
-      # Original name is after the first underscore
-      original_name = found.split('_', 1)[1] if '_' in found else found
-      dest = os.path.join(final_dir, original_name)
-      if os.path.exists(dest):
-        # Conflict: do not overwrite final file
-        raise HTTPException(status_code=400, detail=f"A file named {original_name} already exists")
-      try:
-        shutil.move(src, dest)
-        print(f"[investments.create] Moved bill from {src} to {dest}")
-      except OSError as e:
-        print(f"[investments.create] Failed to move bill file: {e}")
-        raise HTTPException(status_code=500, detail="Failed to save uploaded bill file")
-  
-  stored = investment_store.create_investment(clean_payload)
-  print(f"[investments.create] Stored successfully with id: {stored.get('id')}")
+    await blocking_io.run_blocking(_commit_temp_bill, bill_id)
+
+  stored = await blocking_io.run_blocking(investment_store.create_investment, clean_payload)
+  log.info("Stored investment", id=stored.get("id"), bill_id=bill_id, category=clean_payload.get("category"))
   
   # Convert date to string for JSON serialization
   result = dict(stored)
@@ -115,9 +151,163 @@ async def create_investment(payload: InvestmentIn):
   return result
 
 
-@router.get("/{investment_id}")
+async def _iter_lines(request: Request) -> AsyncIterator[str]:
+  """Decode the request body as UTF-8 and yield it line by line while it streams in."""
+  decoder = codecs.getincrementaldecoder("utf-8-sig")()
+  pending = ""
+  async for chunk in request.stream():
+    pending += decoder.decode(chunk)
+    *lines, pending = pending.split("\n")
+    for line in lines:
+      yield line.rstrip("\r")
+  pending += decoder.decode(b"", final=True)
+  if pending:
+    yield pending.rstrip("\r")
+
+
+async def _iter_ndjson(request: Request) -> AsyncIterator[Tuple[int, Any, Optional[str]]]:
+  row = 0
+  async for line in _iter_lines(request):
+    if not line.strip():
+      continue
+    row += 1
+    try:
+      yield row, json.loads(line), None
+    except json.JSONDecodeError as e:
+      yield row, None, f"Invalid JSON: {e}"
+
+
+async def _iter_csv(request: Request) -> AsyncIterator[Tuple[int, Any, Optional[str]]]:
+  """Yield one dict per CSV record; the first record is the header.
+
+  Quoted fields may contain newlines, so physical lines are joined until the quotes balance.
+  """
+  header: Optional[List[str]] = None
+  row = 0
+  record = ""
+  async for line in _iter_lines(request):
+    record = f"{record}\n{line}" if record else line
+    if record.count('"') % 2:
+      continue
+    text, record = record, ""
+    if not text.strip():
+      continue
+    fields = next(csv.reader([text]))
+    if header is None:
+      header = [f.strip() for f in fields]
+      continue
+    row += 1
+    if len(fields) != len(header):
+      yield row, None, f"Expected {len(header)} columns, got {len(fields)}"
+      continue
+    item = {k: (v if v != "" else None) for k, v in zip(header, fields)}
+    if item.get("metadata"):
+      try:
+        item["metadata"] = json.loads(item["metadata"])
+      except json.JSONDecodeError as e:
+        yield row, None, f"Invalid metadata JSON: {e}"
+        continue
+    yield row, item, None
+  if record:
+    yield row + 1, None, "Unterminated quoted field"
+
+
+async def _iter_json_array(request: Request) -> AsyncIterator[Tuple[int, Any, Optional[str]]]:
+  try:
+    items = json.loads(await request.body())
+  except (json.JSONDecodeError, UnicodeDecodeError) as e:
+    raise HTTPException(status_code=400, detail=f"Invalid JSON body: {e}")
+  if not isinstance(items, list):
+    raise HTTPException(status_code=400, detail="Expected a JSON array of investments")
+  for i, item in enumerate(items, start=1):
+    yield i, item, None
+
+
+_BULK_READERS = {
+  "application/json": _iter_json_array,
+  "application/x-ndjson": _iter_ndjson,
+  "application/jsonl": _iter_ndjson,
+  "application/jsonlines": _iter_ndjson,
+  "text/csv": _iter_csv,
+}
+
+
+def _validation_errors(e: ValidationError) -> List[str]:
+  return [f"{'.'.join(str(p) for p in err['loc']) or 'row'}: {err['msg']}" for err in e.errors()]
+
+
+@router.post("/bulk")
+async def bulk_create_investments(request: Request):
+  """Import many investments from a JSON array, NDJSON or CSV body.
+
+  Rows are validated against ``InvestmentIn`` as they arrive and written in chunks of
+  ``BULK_CHUNK_SIZE`` per transaction. Invalid rows are reported (1-based row numbers)
+  without aborting the rest. Uploaded bills are not moved out of temp storage.
+  """
+  content_type = request.headers.get("content-type", "application/json").split(";")[0].strip().lower()
+  reader = _BULK_READERS.get(content_type)
+  if reader is None:
+    raise HTTPException(
+      status_code=415,
+      detail=f"Unsupported content type '{content_type}', expected one of {', '.join(_BULK_READERS)}",
+    )
+
+  started = time.perf_counter()
+  received = 0
+  inserted = 0
+  failed = 0
+  errors: List[Dict[str, Any]] = []
+  chunk: List[Dict[str, Any]] = []
+  chunk_rows: List[int] = []
+
+  def record_error(row: int, messages: List[str]) -> None:
+    nonlocal failed
+    failed += 1
+    if len(errors) < BULK_MAX_ERRORS:
+      errors.append({"row": row, "errors": messages})
+
+  async def flush() -> None:
+    nonlocal inserted
+    ids, db_errors = await blocking_io.run_blocking(investment_store.create_investments, chunk)
+    inserted += len(ids)
+    for index, message in db_errors:
+      record_error(chunk_rows[index], [message])
+    chunk.clear()
+    chunk_rows.clear()
+
+  async for row, item, error in reader(request):
+    received += 1
+    if error:
+      record_error(row, [error])
+      continue
+    try:
+      payload = InvestmentIn.model_validate(item)
+    except ValidationError as e:
+      record_error(row, _validation_errors(e))
+      continue
+    chunk.append(_clean_payload(payload))
+    chunk_rows.append(row)
+    if len(chunk) >= BULK_CHUNK_SIZE:
+      await flush()
+  if chunk:
+    await flush()
+
+  elapsed = time.perf_counter() - started
+  log.info("Imported investments", inserted=inserted, received=received, elapsed_s=round(elapsed, 2))
+  return {
+    "received": received,
+    "inserted": inserted,
+    "failed": failed,
+    "errors": errors,
+    "errors_truncated": failed > len(errors),
+    "elapsed_s": round(elapsed, 3),
+    "rows_per_sec": round(inserted / elapsed, 1) if elapsed > 0 else None,
+  }
+
+
+@router.get("/{investment_id}", dependencies=[Depends(conditional("investments"))])
 async def get_investment(investment_id: str):
-  inv = investment_store.get_investment(investment_id)
+  inv = await blocking_io.run_blocking(investment_store.get_investment, investment_id)
   if not inv:
     raise HTTPException(status_code=404, detail="Investment not found")
   
@@ -129,7 +319,7 @@ async def get_investment(investment_id: str):
 
 @router.delete("/{investment_id}")
 async def delete_investment(investment_id: str):
-  deleted = investment_store.delete_investment(investment_id)
+  deleted = await blocking_io.run_blocking(investment_store.delete_investment, investment_id)
   if not deleted:
     raise HTTPException(status_code=404, detail="Investment not found")
   return {"deleted": True, "id": investment_id}
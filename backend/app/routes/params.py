@@ -0,0 +1,14 @@
+import datetime as dt
+from typing import Optional
+
+from fastapi import HTTPException
+
+
+def check_dates(*values: Optional[str]) -> None:
+  """400 unless every given value is a YYYY-MM-DD date; None and empty values are skipped."""
+  for value in values:
+    if value:
+      try:
+        dt.date.fromisoformat(value)
+      except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid date format, expected YYYY-MM-DD")
@@ -0,0 +1,43 @@
+from typing import Literal, Optional
+
+from fastapi import APIRouter, HTTPException, Query
+
+from ..services import blocking_io, portfolio_history, valuation, xirr
+from .params import check_dates
+
+
+router = APIRouter()
+
+
+@router.get("/valuation")
+async def portfolio_valuation(include_holdings: bool = False):
+  """Current market value, gain/loss and allocation per category, marked to the latest stored rates."""
+  try:
+    return await blocking_io.run_blocking(valuation.compute_valuation, include_holdings)
+  except Exception as e:
+    raise HTTPException(status_code=500, detail=f"Failed to compute portfolio valuation: {e}")
+
+
+@router.get("/xirr")
+async def portfolio_xirr(
+  group_by: Optional[Literal["category", "vendor", "purity"]] = None,
+  include_holdings: bool = False,
+):
+  """Whole-portfolio XIRR, optionally per group and per holding, using current market value as the exit flow."""
+  try:
+    return await blocking_io.run_blocking(xirr.compute_xirr, group_by, include_holdings)
+  except Exception as e:
+    raise HTTPException(status_code=500, detail=f"Failed to compute XIRR: {e}")
+
+
+@router.get("/history")
+async def portfolio_history_series(
+  date_from: Optional[str] = Query(default=None, alias="from"),
+  date_to: Optional[str] = Query(default=None, alias="to"),
+):
+  """Daily invested amount and market value, served from the materialized portfolio_daily_value table."""
+  check_dates(date_from, date_to)
+  try:
+    return await blocking_io.run_blocking(portfolio_history.get_history, date_from, date_to)
+  except Exception as e:
+    raise HTTPException(status_code=500, detail=f"Failed to fetch portfolio history: {e}")
@@ -1,32 +1,74 @@
 import datetime as dt
+import io
+from typing import Any, Dict, Literal, Optional
 
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
 
-from ..services import rate_store
+from ..services import blocking_io, rate_backfill, rate_store
 from ..services.goodreturns_scraper import fetch_goodreturns_gold_rates
+from .conditional import conditional
+from .params import check_dates
 
 
 router = APIRouter()
 
+MAX_HISTORY_LIMIT = 5000
+
+_RATE_BY_DATE = {
+  "gold": rate_store.get_rate_by_date,
+  "silver": rate_store.get_silver_rate_by_date,
+  "platinum": rate_store.get_platinum_rate_by_date,
+}
+
+
+async def _rate_for_date(metal: str, date: str):
+  # Cache hits are answered on the event loop; only misses go to the I/O executor.
+  hit, row = rate_store.cached_rate(metal, date)
+  if hit:
+    return row
+  return await blocking_io.run_blocking(_RATE_BY_DATE[metal], date)
+
+
+def _bucket_row(metal: str, bucket: Dict[str, Any]) -> Dict[str, Any]:
+  """A week or month bucket in the per-metal field names of the daily history."""
+  row = {"date": bucket["date"], "from": bucket["from"], "to": bucket["to"], "days": bucket["days"]}
+  if metal == "gold":
+    for karat in rate_store.GOLD_KARATS:
+      row[f"inr_per_gram_{karat}k"] = bucket["inr_per_gram"].get(f"{karat}K")
+  else:
+    row["inr_per_gram"] = bucket["inr_per_gram"].get(rate_store.BASE_PURITY[metal])
+  return row
+
+
+async def _history_buckets(metal: str, resolution: str, date_from: Optional[str], date_to: Optional[str], limit: Optional[int]):
+  buckets = await blocking_io.run_blocking(rate_store.rate_buckets, metal, resolution, date_from, date_to, True, limit)
+  return [_bucket_row(metal, b) for b in buckets]
+
+
+async def _scrape_and_store_gold():
+  rates = await fetch_goodreturns_gold_rates()
+  return await blocking_io.run_blocking(
+    rate_store.upsert_daily_rate,
+    rates["date"],
+    rates["inr_per_gram_24k"],
+    rates["inr_per_gram_22k"],
+    rates["inr_per_gram_18k"],
+    rates["inr_per_gram_14k"],
+    rates["inr_per_gram_9k"],
+    rates["source"],
+    rates["captured_at_ist"],
+  )
+
 
-@router.get("/gold/today")
+@router.get("/gold/today", dependencies=[Depends(conditional("rates.gold"))])
 async def gold_today():
   try:
     # cache-per-day in sqlite; scrape if missing
     today = __import__("datetime").date.today().isoformat()
-    today_row = rate_store.get_rate_by_date(today)
+    today_row = await _rate_for_date("gold", today)
     if not today_row or today_row.get("inr_per_gram_24k") is None:
-      rates = await fetch_goodreturns_gold_rates()
-      today_row = rate_store.upsert_daily_rate(
-        rates["date"],
-        rates["inr_per_gram_24k"],
-        rates["inr_per_gram_22k"],
-        rates["inr_per_gram_18k"],
-        rates["inr_per_gram_14k"],
-        rates["inr_per_gram_9k"],
-        rates["source"],
-        rates["captured_at_ist"],
-      )
+      # Concurrent misses share one scrape + upsert instead of each hitting goodreturns.
+      today_row = await rate_store.rate_fetches.do(("gold", today), _scrape_and_store_gold)
 
     return {
       "date": today_row["date"],
@@ -44,11 +86,11 @@ async def gold_today():
     raise HTTPException(status_code=502, detail=f"Failed to fetch gold rate: {e}")
 
 
-@router.get("/silver/today")
+@router.get("/silver/today", dependencies=[Depends(conditional("rates.silver"))])
 async def silver_today():
   try:
     today = __import__("datetime").date.today().isoformat()
-    today_row = rate_store.get_silver_rate_by_date(today)
+    today_row = await _rate_for_date("silver", today)
     if not today_row or today_row.get("inr_per_gram") is None:
       # no automatic scraper for silver currently — return 404 so caller can post manual override
       raise HTTPException(status_code=404, detail="Silver rate for today not available. Use /rates/silver/today/manual to set it.")
@@ -82,14 +124,23 @@ async def silver_today_manual(payload: dict):
   except Exception:
     raise HTTPException(status_code=400, detail="Invalid 'gram' value")
 
-  row = rate_store.upsert_daily_silver_rate(today, gram, payload.get("source", "manual"), now_ist.isoformat(timespec="seconds"))
+  row = await blocking_io.run_blocking(rate_store.upsert_daily_silver_rate, today, gram, payload.get("source", "manual"), now_ist.isoformat(timespec="seconds"))
   return {"date": row["date"], "captured_at_ist": row.get("captured_at_ist"), "source": row.get("source"), "inr_per_gram": row["inr_per_gram"]}
 
 
-@router.get("/silver/history")
-async def silver_history():
+@router.get("/silver/history", dependencies=[Depends(conditional("rates.silver"))])
+async def silver_history(
+  date_from: Optional[str] = Query(default=None, alias="from"),
+  date_to: Optional[str] = Query(default=None, alias="to"),
+  limit: Optional[int] = Query(default=None, ge=1, le=MAX_HISTORY_LIMIT),
+  resolution: Literal["day", "week", "month"] = "day",
+):
+  """Daily silver rates (latest first), or open/high/low/close/avg per week or month."""
+  check_dates(date_from, date_to)
   try:
-    rows = rate_store.get_all_silver_rates_desc()
+    if resolution != "day":
+      return await _history_buckets("silver", resolution, date_from, date_to, limit)
+    rows = await blocking_io.run_blocking(rate_store.get_all_silver_rates_desc, date_from, date_to, limit)
     return [
       {
         "date": row["date"],
@@ -123,15 +174,15 @@ async def silver_set_for_date(date: str, payload: dict):
     raise HTTPException(status_code=400, detail="Invalid 'gram' value")
 
   now_ist = dt.datetime.now(dt.timezone(dt.timedelta(hours=5, minutes=30)))
-  row = rate_store.upsert_daily_silver_rate(date, gram, payload.get("source", "manual"), now_ist.isoformat(timespec="seconds"))
+  row = await blocking_io.run_blocking(rate_store.upsert_daily_silver_rate, date, gram, payload.get("source", "manual"), now_ist.isoformat(timespec="seconds"))
   return {"date": row["date"], "captured_at_ist": row.get("captured_at_ist"), "source": row.get("source"), "inr_per_gram": row["inr_per_gram"]}
 
 
-@router.get("/platinum/today")
+@router.get("/platinum/today", dependencies=[Depends(conditional("rates.platinum"))])
 async def platinum_today():
   try:
     today = __import__("datetime").date.today().isoformat()
-    today_row = rate_store.get_platinum_rate_by_date(today)
+    today_row = await _rate_for_date("platinum", today)
     if not today_row or today_row.get("inr_per_gram") is None:
       raise HTTPException(status_code=404, detail="Platinum rate for today not available. Use /rates/platinum/today/manual to set it.")
 
@@ -159,14 +210,23 @@ async def platinum_today_manual(payload: dict):
   except Exception:
     raise HTTPException(status_code=400, detail="Invalid 'gram' value")
 
-  row = rate_store.upsert_daily_platinum_rate(today, gram, payload.get("source", "manual"), now_ist.isoformat(timespec="seconds"))
+  row = await blocking_io.run_blocking(rate_store.upsert_daily_platinum_rate, today, gram, payload.get("source", "manual"), now_ist.isoformat(timespec="seconds"))
   return {"date": row["date"], "captured_at_ist": row.get("captured_at_ist"), "source": row.get("source"), "inr_per_gram": row["inr_per_gram"]}
 
 
-@router.get("/platinum/history")
-async def platinum_history():
+@router.get("/platinum/history", dependencies=[Depends(conditional("rates.platinum"))])
+async def platinum_history(
+  date_from: Optional[str] = Query(default=None, alias="from"),
+  date_to: Optional[str] = Query(default=None, alias="to"),
+  limit: Optional[int] = Query(default=None, ge=1, le=MAX_HISTORY_LIMIT),
+  resolution: Literal["day", "week", "month"] = "day",
+):
+  """Daily platinum rates (latest first), or open/high/low/close/avg per week or month."""
+  check_dates(date_from, date_to)
   try:
-    rows = rate_store.get_all_platinum_rates_desc()
+    if resolution != "day":
+      return await _history_buckets("platinum", resolution, date_from, date_to, limit)
+    rows = await blocking_io.run_blocking(rate_store.get_all_platinum_rates_desc, date_from, date_to, limit)
     return [
       {
         "date": row["date"],
@@ -195,7 +255,7 @@ async def platinum_set_for_date(date: str, payload: dict):
     raise HTTPException(status_code=400, detail="Invalid 'gram' value")
 
   now_ist = dt.datetime.now(dt.timezone(dt.timedelta(hours=5, minutes=30)))
-  row = rate_store.upsert_daily_platinum_rate(date, gram, payload.get("source", "manual"), now_ist.isoformat(timespec="seconds"))
+  row = await blocking_io.run_blocking(rate_store.upsert_daily_platinum_rate, date, gram, payload.get("source", "manual"), now_ist.isoformat(timespec="seconds"))
   return {"date": row["date"], "captured_at_ist": row.get("captured_at_ist"), "source": row.get("source"), "inr_per_gram": row["inr_per_gram"]}
 
 
@@ -229,7 +289,8 @@ async def gold_today_manual(payload: dict):
   r14 = float(payload.get("14", 0))
   r9 = float(payload.get("9", 0))
 
-  row = rate_store.upsert_daily_rate(
+  row = await blocking_io.run_blocking(
+    rate_store.upsert_daily_rate,
     today,
     r24,
     r22,
@@ -254,11 +315,24 @@ async def gold_today_manual(payload: dict):
   }
 
 
-@router.get("/gold/history")
-async def gold_history():
-  """Return all historical daily gold rates (latest first)."""
+@router.get("/gold/history", dependencies=[Depends(conditional("rates.gold"))])
+async def gold_history(
+  date_from: Optional[str] = Query(default=None, alias="from"),
+  date_to: Optional[str] = Query(default=None, alias="to"),
+  limit: Optional[int] = Query(default=None, ge=1, le=MAX_HISTORY_LIMIT),
+  resolution: Literal["day", "week", "month"] = "day",
+):
+  """Historical daily gold rates (latest first).
+
+  ``from``/``to`` bound the range and ``limit`` keeps the newest days (or buckets). With
+  ``resolution=week|month`` each row is one bucket, starting at ``date`` and spanning the
+  stored days ``from``..``to``, with ``{open, high, low, close, avg, days}`` per karat.
+  """
+  check_dates(date_from, date_to)
   try:
-    rows = rate_store.get_all_rates_desc()
+    if resolution != "day":
+      return await _history_buckets("gold", resolution, date_from, date_to, limit)
+    rows = await blocking_io.run_blocking(rate_store.get_all_rates_desc, date_from, date_to, limit)
     return [
       {
         "date": row["date"],
@@ -274,3 +348,79 @@ async def gold_history():
     ]
   except Exception as e:
     raise HTTPException(status_code=500, detail=f"Failed to fetch rate history: {e}")
+
+
+MAX_ASOF_DATES = 100_000
+
+
+def _rates_asof(metal: str, purity: Any, dates: list) -> list:
+  rates, rate_dates = rate_store.rates_asof(metal, purity, dates)
+  return [
+    {"date": date, "rate_date": None if rate_date is None else str(rate_date), "inr_per_gram": None if rate != rate else float(rate)}
+    for date, rate, rate_date in zip(dates, rates.tolist(), rate_dates.tolist())
+  ]
+
+
+@router.post("/asof")
+async def rates_asof(payload: dict):
+  """Latest stored rate on or before each of many dates (weekends and holidays fall back).
+
+  Body example:
+  { "metal": "gold", "purity": "22K", "dates": ["2024-03-02", "2024-03-04"] }
+
+  Purity defaults to 24K for gold and the base purity of other metals.
+  """
+  metal = str(payload.get("metal", "")).lower()
+  if metal not in rate_store.METALS:
+    raise HTTPException(status_code=400, detail=f"Invalid metal, expected one of {', '.join(rate_store.METALS)}")
+  dates = payload.get("dates")
+  if not isinstance(dates, list) or not all(isinstance(d, str) for d in dates):
+    raise HTTPException(status_code=400, detail="'dates' must be a list of YYYY-MM-DD strings")
+  if len(dates) > MAX_ASOF_DATES:
+    raise HTTPException(status_code=400, detail=f"At most {MAX_ASOF_DATES} dates per request")
+  check_dates(*dates)
+  purity = payload.get("purity") or rate_store.BASE_PURITY[metal]
+  try:
+    rates = await blocking_io.run_blocking(_rates_asof, metal, purity, dates)
+  except ValueError as e:
+    raise HTTPException(status_code=400, detail=str(e))
+  return {"metal": metal, "purity": rate_store.purity_key(metal, purity), "rates": rates}
+
+
+# Ten years of daily rates for every metal and purity is well under this.
+MAX_BACKFILL_BYTES = 64 * 1024 * 1024
+
+_BACKFILL_FORMATS = {
+  "text/csv": "csv",
+  "application/x-ndjson": "ndjson",
+  "application/jsonl": "ndjson",
+  "application/jsonlines": "ndjson",
+}
+
+
+@router.post("/backfill")
+async def backfill_rates(request: Request, source: str = "backfill"):
+  """Bulk-load historical rates for any metals from a CSV or NDJSON body.
+
+  One rate per row: ``metal, purity, date, inr_per_gram`` (plus optional ``source`` and
+  ``captured_at_ist``). Valid rows are upserted in chunked transactions; invalid ones are
+  skipped and reported by 1-based row number. Returns inserted/updated/unchanged/skipped
+  counts. The same importer runs from the CLI: ``python -m app.services.rate_backfill``.
+  """
+  content_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+  fmt = _BACKFILL_FORMATS.get(content_type)
+  if fmt is None:
+    raise HTTPException(
+      status_code=415,
+      detail=f"Unsupported content type '{content_type}', expected one of {', '.join(_BACKFILL_FORMATS)}",
+    )
+  body = bytearray()
+  async for chunk in request.stream():
+    body += chunk
+    if len(body) > MAX_BACKFILL_BYTES:
+      raise HTTPException(status_code=413, detail=f"Backfill body over {MAX_BACKFILL_BYTES} bytes; split it or use the CLI")
+  try:
+    text = body.decode("utf-8-sig")
+  except UnicodeDecodeError as e:
+    raise HTTPException(status_code=400, detail=f"Body is not UTF-8: {e}")
+  return await blocking_io.run_blocking(rate_backfill.run, io.StringIO(text, newline=""), fmt, source)
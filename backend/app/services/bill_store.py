@@ -0,0 +1,327 @@
+import datetime as dt
+import hashlib
+import os
+import shutil
+import sqlite3
+import threading
+import uuid
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from . import db, job_store, tracing
+
+
+FILES_DIR = os.getenv("BILL_FILES_DIR", os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "files")))
+TEMP_DIR = os.path.join(FILES_DIR, "temp_bills")
+BILLS_DIR = os.path.join(FILES_DIR, "bills")
+# Uploads land here while they are streamed in; kept apart from TEMP_DIR so sync_from_disk
+# never registers a half-written file.
+INCOMING_DIR = os.path.join(FILES_DIR, "incoming")
+
+STATE_TEMP = "temp"
+STATE_COMMITTED = "committed"
+
+HASH_CHUNK_BYTES = 1024 * 1024
+MAX_UPLOAD_BYTES = int(os.getenv("BILL_MAX_UPLOAD_BYTES", str(25 * 1024 * 1024)))
+
+log = tracing.get_logger("bill_store")
+
+# Serializes commits so two saves of the same bill cannot both move the file.
+_commit_lock = threading.Lock()
+
+
+def init_bills_table() -> None:
+  with db.connection() as conn:
+    conn.execute(
+      """
+      CREATE TABLE IF NOT EXISTS bills (
+        bill_id TEXT PRIMARY KEY,
+        sha256 TEXT NOT NULL,
+        original_name TEXT NOT NULL,
+        storage_path TEXT NOT NULL,
+        state TEXT NOT NULL,
+        content_type TEXT,
+        size_bytes INTEGER,
+        created_at TEXT,
+        committed_at TEXT
+      )
+      """
+    )
+    conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_bills_sha256 ON bills(sha256)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_bills_original_name ON bills(original_name)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_bills_storage_path ON bills(storage_path)")
+    conn.commit()
+
+
+def _now_ist() -> str:
+  return dt.datetime.now(dt.timezone(dt.timedelta(hours=5, minutes=30))).isoformat(timespec="seconds")
+
+
+def _relative(path: str) -> str:
+  """Storage paths are kept relative to FILES_DIR so the files directory can be relocated."""
+  return os.path.relpath(path, FILES_DIR)
+
+
+def absolute_path(storage_path: str) -> str:
+  return os.path.join(FILES_DIR, storage_path)
+
+
+def sha256_file(path: str) -> str:
+  digest = hashlib.sha256()
+  with open(path, "rb") as f:
+    for chunk in iter(lambda: f.read(HASH_CHUNK_BYTES), b""):
+      digest.update(chunk)
+  return digest.hexdigest()
+
+
+def get_bill(bill_id: str) -> Optional[Dict[str, Any]]:
+  with db.connection() as conn:
+    row = conn.execute("SELECT * FROM bills WHERE bill_id = ?", (bill_id,)).fetchone()
+    return dict(row) if row else None
+
+
+def _find_duplicate(conn: sqlite3.Connection, sha256: str, original_name: str) -> Optional[Dict[str, Any]]:
+  row = conn.execute("SELECT * FROM bills WHERE sha256 = ?", (sha256,)).fetchone()
+  if row is None:
+    row = conn.execute("SELECT * FROM bills WHERE original_name = ? LIMIT 1", (original_name,)).fetchone()
+  return dict(row) if row else None
+
+
+def find_duplicate(sha256: str, original_name: str) -> Optional[Dict[str, Any]]:
+  """Existing bill with the same content (any name) or the same original name, via index lookups."""
+  with db.connection() as conn:
+    return _find_duplicate(conn, sha256, original_name)
+
+
+class UploadTooLarge(ValueError):
+  def __init__(self, max_bytes: int) -> None:
+    super().__init__(f"Bills are limited to {max_bytes / (1024 * 1024):g} MB")
+    self.max_bytes = max_bytes
+
+
+class StagedUpload:
+  """An upload streamed into INCOMING_DIR, hashed and size-checked chunk by chunk (blocking).
+
+  Once ``finish()`` has run, ``sha256`` and ``size`` describe the file at ``path``.
+  ``register_staged`` moves it into temp storage; ``discard()`` removes it if it is still
+  here and is safe to call at any point.
+  """
+
+  def __init__(self, max_bytes: Optional[int] = None) -> None:
+    os.makedirs(INCOMING_DIR, exist_ok=True)
+    self.path = os.path.join(INCOMING_DIR, uuid.uuid4().hex)
+    self.max_bytes = max_bytes or MAX_UPLOAD_BYTES
+    self.size = 0
+    self.sha256: Optional[str] = None
+    self._digest = hashlib.sha256()
+    self._file = open(self.path, "wb")
+
+  def write(self, chunk: bytes) -> None:
+    self.size += len(chunk)
+    if self.size > self.max_bytes:
+      self.discard()
+      raise UploadTooLarge(self.max_bytes)
+    self._digest.update(chunk)
+    self._file.write(chunk)
+
+  def finish(self) -> "StagedUpload":
+    self._file.close()
+    self.sha256 = self._digest.hexdigest()
+    return self
+
+  def discard(self) -> None:
+    self._file.close()
+    try:
+      os.remove(self.path)
+    except FileNotFoundError:
+      pass
+
+
+def register_staged(bill_id: str, original_name: str, staged: StagedUpload, content_type: Optional[str] = None) -> Tuple[Optional[Dict[str, Any]], Optional[Dict[str, Any]]]:
+  """Register a staged upload and move it into temp storage (blocking).
+
+  Returns ``(bill, None)`` on success or ``(None, existing)`` when a bill with the same
+  content or original name is already registered. The duplicate check and the insert run
+  in one write transaction, and the row is inserted before the file is moved, so
+  concurrent uploads of the same bill (by content or by name) are race-free.
+  """
+  os.makedirs(TEMP_DIR, exist_ok=True)
+  # Temp filename includes bill_id prefix so it stays unique until commit.
+  path = os.path.join(TEMP_DIR, f"{bill_id}_{original_name}")
+  bill = {
+    "bill_id": bill_id,
+    "sha256": staged.sha256,
+    "original_name": original_name,
+    "storage_path": _relative(path),
+    "state": STATE_TEMP,
+    "content_type": content_type,
+    "size_bytes": staged.size,
+    "created_at": _now_ist(),
+    "committed_at": None,
+  }
+  with db.connection() as conn:
+    # IMMEDIATE takes the write lock before the lookup, so a second upload with the same
+    # name (which has no unique index) waits and then sees this one's row.
+    conn.execute("BEGIN IMMEDIATE")
+    existing = _find_duplicate(conn, staged.sha256, original_name)
+    if existing:
+      conn.rollback()
+      return None, existing
+    try:
+      conn.execute(
+        """
+        INSERT INTO bills (bill_id, sha256, original_name, storage_path, state, content_type, size_bytes, created_at)
+        VALUES (:bill_id, :sha256, :original_name, :storage_path, :state, :content_type, :size_bytes, :created_at)
+        """,
+        bill,
+      )
+      conn.commit()
+    except sqlite3.IntegrityError:
+      conn.rollback()
+      return None, _find_duplicate(conn, staged.sha256, original_name)
+
+  try:
+    # Same filesystem (both under FILES_DIR), so this is a rename rather than a copy.
+    os.replace(staged.path, path)
+  except OSError:
+    with db.connection() as conn:
+      conn.execute("DELETE FROM bills WHERE bill_id = ?", (bill_id,))
+      conn.commit()
+    raise
+  return bill, None
+
+
+def commit_bill(bill_id: str) -> Optional[Dict[str, Any]]:
+  """Move a temp bill into the final bills directory (blocking).
+
+  Returns the updated row, or None if ``bill_id`` is not a registered bill. Raises
+  ``FileExistsError`` if a different file already occupies the final name.
+  """
+  with _commit_lock:
+    bill = get_bill(bill_id)
+    if bill is None or bill["state"] != STATE_TEMP:
+      return bill
+    src = absolute_path(bill["storage_path"])
+    if not os.path.exists(src):
+      log.warning("Temp file for bill is missing", bill_id=bill_id, path=src)
+      return bill
+    dest = os.path.join(BILLS_DIR, bill["original_name"])
+    if os.path.exists(dest):
+      raise FileExistsError(dest)
+    os.makedirs(BILLS_DIR, exist_ok=True)
+    shutil.move(src, dest)
+    committed_at = _now_ist()
+    with db.connection() as conn:
+      conn.execute(
+        "UPDATE bills SET state = ?, storage_path = ?, committed_at = ? WHERE bill_id = ?",
+        (STATE_COMMITTED, _relative(dest), committed_at, bill_id),
+      )
+      conn.commit()
+    log.info("Committed bill", bill_id=bill_id, src=src, dest=dest)
+    bill.update(state=STATE_COMMITTED, storage_path=_relative(dest), committed_at=committed_at)
+    return bill
+
+
+def _busy_storage_paths(conn: sqlite3.Connection) -> Set[str]:
+  rows = conn.execute(
+    """
+    SELECT b.storage_path FROM extraction_jobs j JOIN bills b ON b.bill_id = j.bill_id
+    WHERE j.state IN (?, ?) AND b.state = ?
+    """,
+    (job_store.STATE_QUEUED, job_store.STATE_RUNNING, STATE_TEMP),
+  )
+  return {r[0] for r in rows}
+
+
+def busy_temp_paths() -> Set[str]:
+  """Absolute paths of temp bills with a queued or running extraction job (blocking)."""
+  with db.connection() as conn:
+    return {absolute_path(p) for p in _busy_storage_paths(conn)}
+
+
+def remove_temp_files(files: List[Tuple[str, int]]) -> Tuple[int, int]:
+  """Delete temp bill files and their registry rows (blocking); ``files`` is ``[(path, size)]``.
+
+  Runs under the commit lock, so a bill cannot be deleted while it is being committed.
+  Bills with a queued or running extraction job are skipped. Rows are removed too, or a
+  re-upload of the same bill would be rejected as a duplicate of one that no longer
+  exists. Returns (files removed, bytes freed).
+  """
+  removed = freed = 0
+  gone = []
+  with _commit_lock:
+    with db.connection() as conn:
+      busy = _busy_storage_paths(conn)
+    for path, size in files:
+      if _relative(path) in busy:
+        continue
+      try:
+        os.remove(path)
+      except FileNotFoundError:
+        pass
+      except OSError as e:
+        log.warning("Could not remove temp bill", path=path, error=str(e))
+        continue
+      else:
+        removed += 1
+        freed += size
+      gone.append(_relative(path))
+    with db.connection() as conn:
+      conn.executemany(
+        "DELETE FROM bills WHERE storage_path = ? AND state = ?",
+        ((p, STATE_TEMP) for p in gone),
+      )
+      conn.commit()
+  return removed, freed
+
+
+def sync_from_disk() -> int:
+  """Register bill files that predate the registry (one directory scan, run at startup).
+
+  Temp files keep the bill_id from their ``<bill_id>_<name>`` prefix; committed files get
+  a fresh id. Files whose content is already registered are skipped. Returns the number
+  of files registered.
+  """
+  with db.connection() as conn:
+    known = {r[0] for r in conn.execute("SELECT storage_path FROM bills")}
+  found = []
+  for state, directory in ((STATE_TEMP, TEMP_DIR), (STATE_COMMITTED, BILLS_DIR)):
+    try:
+      names = os.listdir(directory)
+    except OSError:
+      continue
+    for name in names:
+      path = os.path.join(directory, name)
+      if _relative(path) in known or not os.path.isfile(path):
+        continue
+      if state == STATE_TEMP and "_" in name:
+        bill_id, original_name = name.split("_", 1)
+      else:
+        bill_id, original_name = str(uuid.uuid4()), name
+      found.append((bill_id, original_name, path, state))
+
+  registered = 0
+  with db.connection() as conn:
+    for bill_id, original_name, path, state in found:
+      try:
+        sha256 = sha256_file(path)
+      except OSError as e:
+        log.warning("Skipping unreadable bill file", path=path, error=str(e))
+        continue
+      cur = conn.execute(
+        """
+        INSERT OR IGNORE INTO bills (bill_id, sha256, original_name, storage_path, state, size_bytes, created_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+        """,
+        (bill_id, sha256, original_name, _relative(path), state, os.path.getsize(path), _now_ist()),
+      )
+      if cur.rowcount:
+        registered += 1
+      else:
+        log.info("Bill file duplicates a registered bill, not registered", path=path)
+    conn.commit()
+  if registered:
+    log.info("Registered existing bill files", count=registered)
+  return registered
+
+
+init_bills_table()
@@ -0,0 +1,39 @@
+import asyncio
+import functools
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Optional, TypeVar
+
+from . import db
+
+
+T = TypeVar("T")
+
+# Sized to the DB pool by default so worker threads never queue on connections.
+MAX_WORKERS = int(os.getenv("BLOCKING_IO_WORKERS", str(db.POOL_SIZE)))
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def get_executor() -> ThreadPoolExecutor:
+  global _executor
+  if _executor is None:
+    with _executor_lock:
+      if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="blocking-io")
+  return _executor
+
+
+async def run_blocking(fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+  """Run a blocking call (SQLite, filesystem) on the bounded I/O executor."""
+  loop = asyncio.get_running_loop()
+  return await loop.run_in_executor(get_executor(), functools.partial(fn, *args, **kwargs))
+
+
+def shutdown() -> None:
+  global _executor
+  if _executor is not None:
+    _executor.shutdown(wait=True)
+    _executor = None
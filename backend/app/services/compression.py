@@ -0,0 +1,140 @@
+import os
+import zlib
+from typing import Any, Dict, Optional
+
+import anyio.to_thread
+from starlette.datastructures import Headers, MutableHeaders
+
+try:
+  import brotli
+except ImportError:  # optional: without it every client that accepts gzip gets gzip
+  brotli = None
+
+
+# Responses smaller than this go out as-is: a rate row is a few hundred bytes, the
+# history and investment lists are tens of kilobytes and compress 5-10x.
+MIN_SIZE = int(os.getenv("COMPRESS_MIN_BYTES", "1024"))
+# Level 6 / quality 4 get most of the size win for a fraction of the CPU of the maximums.
+GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", "6"))
+BROTLI_QUALITY = int(os.getenv("BROTLI_QUALITY", "4"))
+# Bodies at least this large are compressed on a worker thread, off the event loop.
+THREAD_MIN_SIZE = 128 * 1024
+
+# Already-compressed formats (PDF bills are compressed streams) and streams that must not
+# be buffered; a trailing "/*" matches the whole type.
+EXCLUDED_CONTENT_TYPES = (
+  "application/pdf",
+  "application/gzip",
+  "application/x-gzip",
+  "application/zip",
+  "audio/*",
+  "font/woff",
+  "font/woff2",
+  "image/*",
+  "text/event-stream",
+  "video/*",
+)
+
+
+def _accepts(accept_encoding: str, coding: str) -> bool:
+  for part in accept_encoding.split(","):
+    name, _, params = part.strip().partition(";")
+    if name.strip().lower() == coding:
+      q = params.strip().lower()
+      return not (q.startswith("q=") and q[2:].strip() in ("0", "0.0", "0.00", "0.000"))
+  return False
+
+
+def _excluded(content_type: str) -> bool:
+  media_type = content_type.partition(";")[0].strip().lower()
+  major = media_type.partition("/")[0]
+  return any(media_type == t or t == f"{major}/*" for t in EXCLUDED_CONTENT_TYPES)
+
+
+class _Compressor:
+  """Incremental gzip or brotli encoder for one response body."""
+
+  def __init__(self, coding: str) -> None:
+    self.coding = coding
+    if coding == "br":
+      self._br = brotli.Compressor(mode=brotli.MODE_TEXT, quality=BROTLI_QUALITY)
+    else:
+      self._gz = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+  def _compress(self, body: bytes, more_body: bool) -> bytes:
+    if self.coding == "br":
+      return self._br.process(body) + (self._br.flush() if more_body else self._br.finish())
+    return self._gz.compress(body) + self._gz.flush(zlib.Z_SYNC_FLUSH if more_body else zlib.Z_FINISH)
+
+  async def compress(self, body: bytes, more_body: bool) -> bytes:
+    if len(body) >= THREAD_MIN_SIZE:
+      return await anyio.to_thread.run_sync(self._compress, body, more_body)
+    return self._compress(body, more_body)
+
+
+class CompressionMiddleware:
+  """Compresses response bodies with brotli (when the ``brotli`` package is installed and
+  the client accepts ``br``) or gzip.
+
+  A plain ASGI middleware on the public ASGI message interface. The decision is made on
+  the first body message: bodies under MIN_SIZE, excluded content types and responses
+  that already carry a Content-Encoding pass through untouched. Streamed bodies are
+  compressed chunk by chunk with a flush after each.
+  """
+
+  def __init__(self, app: Any) -> None:
+    self.app = app
+
+  async def __call__(self, scope: Dict[str, Any], receive: Any, send: Any) -> None:
+    if scope["type"] != "http":
+      await self.app(scope, receive, send)
+      return
+    accept_encoding = Headers(scope=scope).get("accept-encoding", "")
+    if brotli is not None and _accepts(accept_encoding, "br"):
+      coding = "br"
+    elif _accepts(accept_encoding, "gzip"):
+      coding = "gzip"
+    else:
+      await self.app(scope, receive, send)
+      return
+
+    start: Optional[Dict[str, Any]] = None
+    compressor: Optional[_Compressor] = None
+    passthrough = False
+
+    async def send_compressed(message: Dict[str, Any]) -> None:
+      nonlocal start, compressor, passthrough
+      if message["type"] == "http.response.start":
+        start = message  # held back until the first body decides the headers
+        return
+      if message["type"] != "http.response.body" or passthrough:
+        await send(message)
+        return
+      body = message.get("body", b"")
+      more_body = message.get("more_body", False)
+      if compressor is None:
+        headers = MutableHeaders(raw=start["headers"])
+        if (
+          "content-encoding" in headers
+          or _excluded(headers.get("content-type", ""))
+          or (not more_body and len(body) < MIN_SIZE)
+        ):
+          passthrough = True
+          await send(start)
+          await send(message)
+          return
+        compressor = _Compressor(coding)
+        body = await compressor.compress(body, more_body)
+        headers["Content-Encoding"] = coding
+        headers.add_vary_header("Accept-Encoding")
+        if more_body:
+          del headers["Content-Length"]
+        else:
+          headers["Content-Length"] = str(len(body))
+        await send(start)
+        await send({"type": "http.response.body", "body": body, "more_body": more_body})
+        return
+      body = await compressor.compress(body, more_body)
+      await send({"type": "http.response.body", "body": body, "more_body": more_body})
+
+    await self.app(scope, receive, send_compressed)
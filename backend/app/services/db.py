@@ -0,0 +1,176 @@
+import os
+import queue
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional
+
+
+DB_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "db"))
+DB_PATH = os.getenv("INVESTMENTS_DB_PATH", os.path.join(DB_DIR, "investments.db"))
+
+POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "8"))
+POOL_TIMEOUT_S = float(os.getenv("DB_POOL_TIMEOUT_S", "10"))
+# sqlite3 keeps an LRU of compiled statements per connection; since pooled
+# connections live for the whole process, hot queries are prepared only once.
+STATEMENT_CACHE_SIZE = int(os.getenv("DB_STATEMENT_CACHE_SIZE", "256"))
+
+_PRAGMAS = (
+  "PRAGMA journal_mode=WAL",
+  "PRAGMA synchronous=NORMAL",
+  f"PRAGMA cache_size=-{int(os.getenv('DB_CACHE_SIZE_KIB', '16384'))}",
+  f"PRAGMA mmap_size={int(os.getenv('DB_MMAP_SIZE_BYTES', str(256 * 1024 * 1024)))}",
+  "PRAGMA temp_store=MEMORY",
+  "PRAGMA busy_timeout=5000",
+)
+
+
+def _connect(path: str) -> sqlite3.Connection:
+  conn = sqlite3.connect(
+    path,
+    check_same_thread=False,
+    cached_statements=STATEMENT_CACHE_SIZE,
+  )
+  conn.row_factory = sqlite3.Row
+  for pragma in _PRAGMAS:
+    conn.execute(pragma)
+  return conn
+
+
+class ConnectionPool:
+  """Bounded pool of long-lived SQLite connections.
+
+  Connections are created lazily up to ``size``; once that many exist, callers
+  block (up to ``timeout_s``) until one is released.
+  """
+
+  def __init__(self, path: str, size: int = POOL_SIZE, timeout_s: float = POOL_TIMEOUT_S) -> None:
+    self.path = path
+    self.size = max(1, size)
+    self.timeout_s = timeout_s
+    self._idle: "queue.LifoQueue[sqlite3.Connection]" = queue.LifoQueue()
+    self._lock = threading.Lock()
+    self._created = 0
+    self._in_use = 0
+    self._hits = 0
+    self._misses = 0
+    self._waits = 0
+    self._timeouts = 0
+    self._wait_total_s = 0.0
+    self._wait_max_s = 0.0
+
+  def _acquire(self) -> sqlite3.Connection:
+    try:
+      conn = self._idle.get_nowait()
+      with self._lock:
+        self._hits += 1
+        self._in_use += 1
+      return conn
+    except queue.Empty:
+      pass
+
+    with self._lock:
+      can_create = self._created < self.size
+      if can_create:
+        self._created += 1
+    if can_create:
+      try:
+        conn = _connect(self.path)
+      except Exception:
+        with self._lock:
+          self._created -= 1
+        raise
+      with self._lock:
+        self._misses += 1
+        self._in_use += 1
+      return conn
+
+    started = time.perf_counter()
+    try:
+      conn = self._idle.get(timeout=self.timeout_s)
+    except queue.Empty:
+      with self._lock:
+        self._timeouts += 1
+      raise RuntimeError(f"Timed out after {self.timeout_s}s waiting for a database connection")
+    waited = time.perf_counter() - started
+    with self._lock:
+      self._waits += 1
+      self._wait_total_s += waited
+      self._wait_max_s = max(self._wait_max_s, waited)
+      self._in_use += 1
+    return conn
+
+  def _release(self, conn: sqlite3.Connection) -> None:
+    if conn.in_transaction:
+      conn.rollback()
+    with self._lock:
+      self._in_use -= 1
+    self._idle.put(conn)
+
+  @contextmanager
+  def connection(self) -> Iterator[sqlite3.Connection]:
+    conn = self._acquire()
+    try:
+      yield conn
+    except BaseException:
+      if conn.in_transaction:
+        conn.rollback()
+      raise
+    finally:
+      self._release(conn)
+
+  def close(self) -> None:
+    while True:
+      try:
+        conn = self._idle.get_nowait()
+      except queue.Empty:
+        break
+      conn.close()
+      with self._lock:
+        self._created -= 1
+
+  def stats(self) -> Dict[str, Any]:
+    with self._lock:
+      return {
+        "size": self.size,
+        "created": self._created,
+        "in_use": self._in_use,
+        "idle": self._idle.qsize(),
+        "hits": self._hits,
+        "misses": self._misses,
+        "waits": self._waits,
+        "timeouts": self._timeouts,
+        "wait_total_ms": round(self._wait_total_s * 1000, 3),
+        "wait_max_ms": round(self._wait_max_s * 1000, 3),
+      }
+
+
+_pool: Optional[ConnectionPool] = None
+_pool_lock = threading.Lock()
+
+
+def get_pool() -> ConnectionPool:
+  global _pool
+  if _pool is None:
+    with _pool_lock:
+      if _pool is None:
+        os.makedirs(os.path.dirname(DB_PATH), exist_ok=True)
+        _pool = ConnectionPool(DB_PATH)
+  return _pool
+
+
+@contextmanager
+def connection() -> Iterator[sqlite3.Connection]:
+  """Borrow a pooled connection. Callers commit explicitly; uncommitted work is rolled back on release."""
+  with get_pool().connection() as conn:
+    yield conn
+
+
+def close_pool() -> None:
+  if _pool is not None:
+    _pool.close()
+
+
+def pool_stats() -> Dict[str, Any]:
+  return get_pool().stats()
@@ -0,0 +1,105 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from . import db
+
+
+MAX_ENTRIES = int(os.getenv("EXTRACTION_CACHE_MAX_ENTRIES", "5000"))
+
+_stats_lock = threading.Lock()
+_stats = {"hits": 0, "misses": 0, "stores": 0, "evictions": 0}
+
+
+def init_extraction_cache_table() -> None:
+  with db.connection() as conn:
+    conn.execute(
+      """
+      CREATE TABLE IF NOT EXISTS extraction_cache (
+        image_sha256 TEXT NOT NULL,
+        prompt_sha256 TEXT NOT NULL,
+        model TEXT NOT NULL,
+        extracted TEXT NOT NULL,
+        created_at REAL NOT NULL,
+        last_used_at REAL NOT NULL,
+        hits INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (image_sha256, prompt_sha256, model)
+      )
+      """
+    )
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_extraction_cache_last_used ON extraction_cache(last_used_at)")
+    conn.commit()
+
+
+def _count(key: str, n: int = 1) -> None:
+  with _stats_lock:
+    _stats[key] += n
+
+
+def sha256_hex(data: Any) -> str:
+  if isinstance(data, str):
+    data = data.encode("utf-8")
+  return hashlib.sha256(data).hexdigest()
+
+
+def get(image_sha256: str, prompt_sha256: str, model: str) -> Optional[Dict[str, Any]]:
+  """Cached model output for this image, prompt and model, or None. Marks the entry as used."""
+  with db.connection() as conn:
+    row = conn.execute(
+      "SELECT extracted FROM extraction_cache WHERE image_sha256 = ? AND prompt_sha256 = ? AND model = ?",
+      (image_sha256, prompt_sha256, model),
+    ).fetchone()
+    if row is None:
+      _count("misses")
+      return None
+    conn.execute(
+      """
+      UPDATE extraction_cache SET last_used_at = ?, hits = hits + 1
+      WHERE image_sha256 = ? AND prompt_sha256 = ? AND model = ?
+      """,
+      (time.time(), image_sha256, prompt_sha256, model),
+    )
+    conn.commit()
+  _count("hits")
+  return json.loads(row["extracted"])
+
+
+def put(image_sha256: str, prompt_sha256: str, model: str, extracted: Dict[str, Any]) -> None:
+  """Store (or replace) an entry, then evict least recently used entries beyond MAX_ENTRIES."""
+  now = time.time()
+  with db.connection() as conn:
+    conn.execute(
+      """
+      INSERT INTO extraction_cache (image_sha256, prompt_sha256, model, extracted, created_at, last_used_at)
+      VALUES (?, ?, ?, ?, ?, ?)
+      ON CONFLICT(image_sha256, prompt_sha256, model) DO UPDATE SET
+        extracted=excluded.extracted,
+        created_at=excluded.created_at,
+        last_used_at=excluded.last_used_at,
+        hits=0
+      """,
+      (image_sha256, prompt_sha256, model, json.dumps(extracted), now, now),
+    )
+    excess = conn.execute("SELECT COUNT(*) FROM extraction_cache").fetchone()[0] - MAX_ENTRIES
+    if excess > 0:
+      conn.execute(
+        "DELETE FROM extraction_cache WHERE rowid IN (SELECT rowid FROM extraction_cache ORDER BY last_used_at LIMIT ?)",
+        (excess,),
+      )
+    conn.commit()
+  _count("stores")
+  if excess > 0:
+    _count("evictions", excess)
+
+
+def stats() -> Dict[str, Any]:
+  with db.connection() as conn:
+    entries = conn.execute("SELECT COUNT(*) FROM extraction_cache").fetchone()[0]
+  with _stats_lock:
+    return {"entries": entries, "max_entries": MAX_ENTRIES, **_stats}
+
+
+init_extraction_cache_table()
@@ -3,7 +3,7 @@ import os
 from dataclasses import dataclass
 from typing import Dict, Optional
 
-import httpx
+from . import http_clients
 
 
 @dataclass
@@ -27,13 +27,12 @@ async def fetch_24k_inr_per_gram() -> GoldRates:
   url = "https://api.exchangerate.host/latest"
   params = {"base": "XAU", "symbols": "INR"}
 
-  async with httpx.AsyncClient(timeout=20) as client:
-    r = await client.get(url, params=params)
-    r.raise_for_status()
-    data = r.json()
-    rate_per_ounce = float(data["rates"]["INR"])  # INR per 1 troy ounce gold
-    inr_per_gram = rate_per_ounce / _grams_per_ounce()
-    return GoldRates(date=today, inr_per_gram_24k=inr_per_gram)
+  r = await http_clients.request("exchangerate", "GET", url, params=params)
+  r.raise_for_status()
+  data = r.json()
+  rate_per_ounce = float(data["rates"]["INR"])  # INR per 1 troy ounce gold
+  inr_per_gram = rate_per_ounce / _grams_per_ounce()
+  return GoldRates(date=today, inr_per_gram_24k=inr_per_gram)
 
 
 def convert_24k_to_karat(inr_per_gram_24k: float) -> Dict[int, float]:
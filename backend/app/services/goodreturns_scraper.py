@@ -1,11 +1,12 @@
 import datetime as dt
+import os
 import re
 from typing import Dict
 
-import httpx
+from . import http_clients
 
 
-GOODRETURNS_URL = "https://www.goodreturns.in/gold-rates/"
+GOODRETURNS_URL = os.getenv("GOODRETURNS_URL", "https://www.goodreturns.in/gold-rates/")
 
 
 def _parse_inr(text: str) -> float:
@@ -19,10 +20,9 @@ async def fetch_goodreturns_gold_rates() -> Dict[str, object]:
 
   This is best-effort and may break if the site layout changes.
   """
-  async with httpx.AsyncClient(timeout=20, headers={"User-Agent": "Mozilla/5.0"}) as client:
-    r = await client.get(GOODRETURNS_URL)
-    r.raise_for_status()
-    html = r.text
+  r = await http_clients.request("goodreturns", "GET", GOODRETURNS_URL)
+  r.raise_for_status()
+  html = r.text
 
   # Extremely simple patterns; adjust if Goodreturns changes markup.
   def find_rate(label: str) -> float:
@@ -0,0 +1,149 @@
+import asyncio
+import email.utils
+import os
+import random
+import time
+from typing import Any, Dict, Optional
+
+import httpx
+
+from . import metrics, tracing
+
+
+HTTP2_ENABLED = os.getenv("HTTP2_ENABLED", "true").lower() == "true"
+MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "20"))
+MAX_KEEPALIVE = int(os.getenv("HTTP_MAX_KEEPALIVE", "10"))
+KEEPALIVE_EXPIRY_S = float(os.getenv("HTTP_KEEPALIVE_EXPIRY_S", "60"))
+
+RETRY_ATTEMPTS = int(os.getenv("HTTP_RETRY_ATTEMPTS", "3"))
+RETRY_BASE_S = float(os.getenv("HTTP_RETRY_BASE_S", "0.5"))
+RETRY_MAX_S = float(os.getenv("HTTP_RETRY_MAX_S", "8"))
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+# Transport errors raised before the request reached the server; anything else (a read
+# timeout, a dropped connection) may come after the upstream accepted and billed it.
+UNSENT_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS", "PUT", "DELETE"}
+
+# One long-lived client per upstream, so connections (and TLS sessions) are reused
+# across calls instead of being rebuilt for every request.
+UPSTREAMS: Dict[str, Dict[str, Any]] = {
+  "openai": {"timeout": 60.0},
+  "goodreturns": {"timeout": 20.0, "headers": {"User-Agent": "Mozilla/5.0"}},
+  "exchangerate": {"timeout": 20.0},
+}
+
+_clients: Dict[str, httpx.AsyncClient] = {}
+
+log = tracing.get_logger("http_clients")
+
+
+def _http2_available() -> bool:
+  if not HTTP2_ENABLED:
+    return False
+  try:
+    import h2  # noqa: F401
+  except ImportError:
+    return False
+  return True
+
+
+def _build(name: str) -> httpx.AsyncClient:
+  config = UPSTREAMS[name]
+  return httpx.AsyncClient(
+    timeout=config["timeout"],
+    headers=config.get("headers"),
+    http2=_http2_available(),
+    limits=httpx.Limits(
+      max_connections=MAX_CONNECTIONS,
+      max_keepalive_connections=MAX_KEEPALIVE,
+      keepalive_expiry=KEEPALIVE_EXPIRY_S,
+    ),
+  )
+
+
+def get(name: str) -> httpx.AsyncClient:
+  """The shared client for ``name``; created on first use if startup() has not run (scripts)."""
+  client = _clients.get(name)
+  if client is None or client.is_closed:
+    client = _clients[name] = _build(name)
+  return client
+
+
+async def startup() -> None:
+  for name in UPSTREAMS:
+    get(name)
+  log.info("HTTP clients ready", upstreams=list(UPSTREAMS), http2=_http2_available())
+
+
+async def shutdown() -> None:
+  clients = list(_clients.values())
+  _clients.clear()
+  await asyncio.gather(*(c.aclose() for c in clients), return_exceptions=True)
+
+
+def _retry_after_s(response: httpx.Response) -> Optional[float]:
+  value = response.headers.get("Retry-After")
+  if not value:
+    return None
+  try:
+    return max(0.0, float(value))
+  except ValueError:
+    pass
+  try:
+    when = email.utils.parsedate_to_datetime(value)
+  except (TypeError, ValueError):
+    return None
+  return max(0.0, when.timestamp() - time.time())
+
+
+def _backoff_s(attempt: int) -> float:
+  # Full jitter: spreads retries from many callers instead of having them retry in lockstep.
+  return random.uniform(0, min(RETRY_MAX_S, RETRY_BASE_S * (2 ** attempt)))
+
+
+async def request(
+  name: str,
+  method: str,
+  url: str,
+  *,
+  retries: int = RETRY_ATTEMPTS,
+  idempotent: Optional[bool] = None,
+  **kwargs: Any,
+) -> httpx.Response:
+  """Send a request on the shared ``name`` client, retrying 429/5xx and transport errors.
+
+  Non-idempotent requests (by default anything but GET/HEAD/OPTIONS/PUT/DELETE, e.g.
+  the billed OpenAI POST) are only retried on transport errors that happened before the
+  request was sent (UNSENT_ERRORS), never after a read timeout. Retries use jittered
+  exponential backoff; a ``Retry-After`` header sets the delay instead, and if it asks
+  for longer than HTTP_RETRY_MAX_S the response is returned as-is. Every attempt's
+  latency is recorded in the ``upstream.<name>`` histogram.
+  """
+  if idempotent is None:
+    idempotent = method.upper() in IDEMPOTENT_METHODS
+  client = get(name)
+  for attempt in range(retries + 1):
+    started = time.perf_counter()
+    try:
+      response = await client.request(method, url, **kwargs)
+    except httpx.TransportError as e:
+      metrics.observe(f"upstream.{name}", time.perf_counter() - started)
+      metrics.increment(f"upstream.{name}.errors")
+      if attempt >= retries or not (idempotent or isinstance(e, UNSENT_ERRORS)):
+        raise
+      delay = _backoff_s(attempt)
+      log.warning("Upstream request failed, retrying", upstream=name, method=method, error=type(e).__name__, delay_s=round(delay, 2))
+    else:
+      metrics.observe(f"upstream.{name}", time.perf_counter() - started)
+      metrics.increment(f"upstream.{name}.status_{response.status_code // 100}xx")
+      if response.status_code not in RETRY_STATUSES or attempt >= retries:
+        return response
+      retry_after = _retry_after_s(response)
+      if retry_after is not None and retry_after > RETRY_MAX_S:
+        return response
+      delay = retry_after if retry_after is not None else _backoff_s(attempt)
+      log.warning("Upstream returned a retryable status, retrying", upstream=name, method=method, status=response.status_code, delay_s=round(delay, 2))
+      await response.aclose()
+    metrics.increment(f"upstream.{name}.retries")
+    await asyncio.sleep(delay)
+  raise AssertionError("unreachable")
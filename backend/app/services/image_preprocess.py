@@ -0,0 +1,137 @@
+import asyncio
+import hashlib
+import io
+import json
+import os
+import time
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+from PIL import Image, ImageChops, ImageOps
+
+# Imported by render workers too, so keep this free of DB-touching modules.
+from . import metrics, pdf_service
+
+
+# Each preset trades payload size against legibility of small print. "off" sends the
+# upload (or rendered page) unchanged.
+PRESETS: Dict[str, Optional[Dict[str, Any]]] = {
+  "off": None,
+  "balanced": {"long_edge": 2048, "grayscale": True, "crop": True, "format": "JPEG", "quality": 80},
+  "compact": {"long_edge": 1600, "grayscale": True, "crop": True, "format": "WEBP", "quality": 70},
+  "color": {"long_edge": 2048, "grayscale": False, "crop": True, "format": "JPEG", "quality": 85},
+}
+DEFAULT_PRESET = os.getenv("IMAGE_PREPROCESS_PRESET", "balanced")
+
+# Image bytes, or the path of a stored upload (workers open it themselves).
+Source = Union[bytes, str]
+
+_MIME = {"JPEG": "image/jpeg", "WEBP": "image/webp"}
+# Pixels closer than this (0-255) to the background colour count as margin when cropping.
+_CROP_THRESHOLD = 40
+_CROP_MARGIN = 0.02
+# Skip the crop when the detected content is implausibly small (noise, a stray mark).
+_CROP_MIN_AREA = 0.2
+
+
+def preset(name: Optional[str] = None) -> Tuple[str, Optional[Dict[str, Any]]]:
+  """Resolve a preset name (default IMAGE_PREPROCESS_PRESET); unknown names raise ValueError."""
+  name = name or DEFAULT_PRESET
+  if name not in PRESETS:
+    raise ValueError(f"Unknown image preprocessing preset '{name}' (expected one of {', '.join(PRESETS)})")
+  return name, PRESETS[name]
+
+
+def signature(name: Optional[str] = None) -> str:
+  """Stable hash of a preset's settings; part of the extraction cache key."""
+  name, settings = preset(name)
+  return hashlib.sha256(json.dumps({"preset": name, **(settings or {})}, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def _content_bbox(img: Image.Image) -> Optional[Tuple[int, int, int, int]]:
+  """Bounding box of everything that differs from the border colour, with a small margin."""
+  gray = img.convert("L")
+  # Work on a small copy; the box only needs to be accurate to a few pixels.
+  small = gray.copy()
+  small.thumbnail((512, 512))
+  scale_x = gray.width / small.width
+  scale_y = gray.height / small.height
+  w, h = small.size
+  border = sorted(
+    [small.getpixel((x, 0)) for x in range(w)] + [small.getpixel((x, h - 1)) for x in range(w)]
+    + [small.getpixel((0, y)) for y in range(h)] + [small.getpixel((w - 1, y)) for y in range(h)]
+  )
+  background = Image.new("L", small.size, border[len(border) // 2])
+  mask = ImageChops.difference(small, background).point(lambda p: 255 if p > _CROP_THRESHOLD else 0)
+  box = mask.getbbox()
+  if box is None:
+    return None
+  left, top, right, bottom = box
+  if (right - left) * (bottom - top) < _CROP_MIN_AREA * w * h:
+    return None
+  mx, my = int(w * _CROP_MARGIN), int(h * _CROP_MARGIN)
+  return (
+    int(max(0, left - mx) * scale_x),
+    int(max(0, top - my) * scale_y),
+    int(min(w, right + mx) * scale_x),
+    int(min(h, bottom + my) * scale_y),
+  )
+
+
+def size_of(source: Source) -> int:
+  return os.path.getsize(source) if isinstance(source, str) else len(source)
+
+
+def preprocess_image(source: Source, settings: Dict[str, Any]) -> Tuple[Optional[bytes], Optional[str]]:
+  """Worker: apply ``settings`` to one image. Returns (bytes, mime), or (None, None) to keep the original."""
+  try:
+    with Image.open(source if isinstance(source, str) else io.BytesIO(source)) as img:
+      long_edge = settings["long_edge"]
+      if img.format == "JPEG":
+        # Let libjpeg decode at a reduced scale; far cheaper than decoding 12 MP and resizing.
+        img.draft("L" if settings["grayscale"] else "RGB", (long_edge, long_edge))
+      img = ImageOps.exif_transpose(img)
+      img = img.convert("L" if settings["grayscale"] else "RGB")
+      if settings["crop"]:
+        box = _content_bbox(img)
+        if box:
+          img = img.crop(box)
+      if max(img.size) > long_edge:
+        img.thumbnail((long_edge, long_edge), Image.Resampling.LANCZOS)
+      out = io.BytesIO()
+      img.save(out, format=settings["format"], quality=settings["quality"], optimize=True)
+  except Exception:
+    return None, None
+  encoded = out.getvalue()
+  if len(encoded) >= size_of(source):
+    return None, None
+  return encoded, _MIME[settings["format"]]
+
+
+async def preprocess(images: List[Source], mime: str, name: Optional[str] = None) -> Tuple[List[Tuple[Source, str]], Dict[str, Any]]:
+  """Shrink images for the vision call in the render process pool.
+
+  Returns ``[(source, mime), ...]`` in input order plus a report of the bytes saved. Images
+  that cannot be decoded, or would grow, are passed through unchanged (a path stays a path).
+  """
+  name, settings = preset(name)
+  original = sum(size_of(img) for img in images)
+  if settings is None:
+    out = [(img, mime) for img in images]
+  else:
+    started = time.perf_counter()
+    results = await asyncio.gather(*(pdf_service.run_in_pool(preprocess_image, img, settings) for img in images))
+    out = [(data, new_mime) if data is not None else (img, mime) for img, (data, new_mime) in zip(images, results)]
+    metrics.observe("preprocess.duration", time.perf_counter() - started)
+  sent = sum(size_of(data) for data, _ in out)
+  metrics.increment("preprocess.bytes_in", original)
+  metrics.increment("preprocess.bytes_out", sent)
+  return out, {
+    "preset": name,
+    "original_bytes": original,
+    "sent_bytes": sent,
+    "bytes_saved": original - sent,
+  }
+
+
+# Fail at import (i.e. app startup) on a misconfigured IMAGE_PREPROCESS_PRESET.
+preset(DEFAULT_PRESET)
@@ -1,24 +1,15 @@
+import base64
 import json
-import os
 import sqlite3
 import uuid
-import json
 from datetime import date
-from typing import Any, Dict, List, Optional
-
-
-DB_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "db"))
-DB_PATH = os.path.join(DB_DIR, "investments.db")
+from typing import Any, Dict, List, Optional, Tuple
 
-
-def _ensure_db() -> None:
-  os.makedirs(DB_DIR, exist_ok=True)
+from . import db, portfolio_history, valuation, versions
 
 
 def init_db() -> None:
-  _ensure_db()
-  conn = sqlite3.connect(DB_PATH)
-  try:
+  with db.connection() as conn:
     conn.execute(
       """
       CREATE TABLE IF NOT EXISTS investments (
@@ -43,12 +34,21 @@ def init_db() -> None:
       conn.execute("ALTER TABLE investments ADD COLUMN hallmark_charges REAL")
     except sqlite3.OperationalError:
       pass  # Column already exists
+    # Secondary indexes implicitly end with rowid, so "filter = ? AND rowid < ? ORDER BY
+    # rowid DESC" is a single range scan for keyset pagination.
+    for name, cols in [
+      ("idx_investments_category", "category"),
+      ("idx_investments_vendor", "vendor"),
+      ("idx_investments_purity", "purity_karat"),
+      ("idx_investments_date", "date"),
+      ("idx_investments_bill_id", "bill_id"),
+    ]:
+      conn.execute(f"CREATE INDEX IF NOT EXISTS {name} ON investments({cols})")
+    versions.track(conn, "investments", "'investments'")
     conn.commit()
-  finally:
-    conn.close()
 
 
-def _row_to_dict(row: sqlite3.Row) -> Dict[str, Any]:
+def _row_to_dict(row: sqlite3.Row, iso_dates: bool = False) -> Dict[str, Any]:
   metadata_val = row["metadata"]
   try:
     metadata = json.loads(metadata_val) if metadata_val else None
@@ -69,7 +69,7 @@ def _row_to_dict(row: sqlite3.Row) -> Dict[str, Any]:
     "category": row["category"],
     "name": row["name"],
     "vendor": row["vendor"],
-    "date": parsed_date,
+    "date": parsed_date.isoformat() if iso_dates and parsed_date else parsed_date,
     "total_amount": row["total_amount"],
     "weight_grams": row["weight_grams"],
     "purity_karat": row["purity_karat"],
@@ -81,79 +81,190 @@ def _row_to_dict(row: sqlite3.Row) -> Dict[str, Any]:
 
 
 def list_investments() -> List[Dict[str, Any]]:
-  conn = sqlite3.connect(DB_PATH)
-  conn.row_factory = sqlite3.Row
-  try:
+  with db.connection() as conn:
     rows = conn.execute("SELECT * FROM investments ORDER BY rowid DESC").fetchall()
     return [_row_to_dict(r) for r in rows]
-  finally:
-    conn.close()
 
 
-def get_investment(investment_id: str) -> Optional[Dict[str, Any]]:
-  conn = sqlite3.connect(DB_PATH)
-  conn.row_factory = sqlite3.Row
+def encode_cursor(rowid: int) -> str:
+  return base64.urlsafe_b64encode(str(rowid).encode("ascii")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> int:
   try:
+    padded = cursor + "=" * (-len(cursor) % 4)
+    return int(base64.urlsafe_b64decode(padded.encode("ascii")).decode("ascii"))
+  except (ValueError, UnicodeError):
+    raise ValueError("Invalid cursor")
+
+
+def list_investments_page(
+  limit: Optional[int] = None,
+  cursor: Optional[str] = None,
+  category: Optional[str] = None,
+  vendor: Optional[str] = None,
+  date_from: Optional[str] = None,
+  date_to: Optional[str] = None,
+  purity_karat: Optional[int] = None,
+) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+  """Newest-first page of investments with JSON-ready (ISO string) dates.
+
+  Pagination is keyset-based on rowid: ``cursor`` is the opaque value returned as the
+  second element of the previous call, and is None once the last page is reached.
+  """
+  clauses = []
+  params: List[Any] = []
+  if cursor:
+    clauses.append("rowid < ?")
+    params.append(decode_cursor(cursor))
+  for col, val in (("category", category), ("vendor", vendor), ("purity_karat", purity_karat)):
+    if val is not None:
+      clauses.append(f"{col} = ?")
+      params.append(val)
+  if date_from:
+    clauses.append("date >= ?")
+    params.append(date_from)
+  if date_to:
+    clauses.append("date <= ?")
+    params.append(date_to)
+
+  sql = "SELECT rowid AS _rowid, * FROM investments"
+  if clauses:
+    sql += " WHERE " + " AND ".join(clauses)
+  sql += " ORDER BY rowid DESC"
+  if limit is not None:
+    # Fetch one extra row to learn whether another page exists.
+    sql += " LIMIT ?"
+    params.append(limit + 1)
+
+  with db.connection() as conn:
+    rows = conn.execute(sql, params).fetchall()
+
+  next_cursor = None
+  if limit is not None and len(rows) > limit:
+    rows = rows[:limit]
+    next_cursor = encode_cursor(rows[-1]["_rowid"])
+  return [_row_to_dict(r, iso_dates=True) for r in rows], next_cursor
+
+
+def get_investment(investment_id: str) -> Optional[Dict[str, Any]]:
+  with db.connection() as conn:
     row = conn.execute("SELECT * FROM investments WHERE id = ?", (investment_id,)).fetchone()
     return _row_to_dict(row) if row else None
-  finally:
-    conn.close()
 
 
 def delete_investment(investment_id: str) -> bool:
-  conn = sqlite3.connect(DB_PATH)
-  try:
+  with portfolio_history.lock, db.connection() as conn:
+    removed = valuation.load_holdings(conn, [investment_id])
     cur = conn.execute("DELETE FROM investments WHERE id = ?", (investment_id,))
+    if cur.rowcount > 0:
+      portfolio_history.apply_holdings(conn, removed, -1)
     conn.commit()
-    return cur.rowcount > 0
-  finally:
-    conn.close()
+  if cur.rowcount > 0:
+    versions.expire()
+  return cur.rowcount > 0
 
 
-def create_investment(payload: Dict[str, Any]) -> Dict[str, Any]:
-  inv_id = str(uuid.uuid4())
+_INSERT_COLUMNS = (
+  "id", "bill_id", "category", "name", "vendor", "date", "total_amount",
+  "weight_grams", "purity_karat", "gold_rate_per_gram", "making_charges", "hallmark_charges", "metadata",
+)
+
+_INSERT_SQL = """
+  INSERT INTO investments (
+    id, bill_id, category, name, vendor, date, total_amount,
+    weight_grams, purity_karat, gold_rate_per_gram, making_charges, hallmark_charges, metadata
+  ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+
+def _insert_params(inv_id: str, payload: Dict[str, Any]) -> tuple:
   metadata_json = json.dumps(payload.get("metadata")) if payload.get("metadata") is not None else None
   date_val = payload.get("date")
   if isinstance(date_val, date):
     date_str = date_val.isoformat()
   else:
     date_str = date_val if date_val else None
+  return (
+    inv_id,
+    payload.get("bill_id"),
+    payload.get("category"),
+    payload.get("name"),
+    payload.get("vendor"),
+    date_str,
+    payload.get("total_amount"),
+    payload.get("weight_grams"),
+    payload.get("purity_karat"),
+    payload.get("gold_rate_per_gram"),
+    payload.get("making_charges"),
+    payload.get("hallmark_charges"),
+    metadata_json,
+  )
 
-  conn = sqlite3.connect(DB_PATH)
-  try:
-    conn.execute(
-      """
-      INSERT INTO investments (
-        id, bill_id, category, name, vendor, date, total_amount,
-        weight_grams, purity_karat, gold_rate_per_gram, making_charges, hallmark_charges, metadata
-      ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-      """,
-      (
-        inv_id,
-        payload.get("bill_id"),
-        payload.get("category"),
-        payload.get("name"),
-        payload.get("vendor"),
-        date_str,
-        payload.get("total_amount"),
-        payload.get("weight_grams"),
-        payload.get("purity_karat"),
-        payload.get("gold_rate_per_gram"),
-        payload.get("making_charges"),
-        payload.get("hallmark_charges"),
-        metadata_json,
-      ),
-    )
+
+def _stored_view(params: tuple) -> Dict[str, Any]:
+  """The dict get_investment would return for a row inserted with ``params``."""
+  row = dict(zip(_INSERT_COLUMNS, params))
+  parsed_date: Optional[date] = None
+  if row["date"]:
+    try:
+      parsed_date = date.fromisoformat(row["date"])
+    except ValueError:
+      parsed_date = None
+  row["date"] = parsed_date
+  row["metadata"] = json.loads(row["metadata"]) if row["metadata"] else None
+  return row
+
+
+def create_investment(payload: Dict[str, Any]) -> Dict[str, Any]:
+  inv_id = str(uuid.uuid4())
+  params = _insert_params(inv_id, payload)
+
+  with portfolio_history.lock, db.connection() as conn:
+    conn.execute(_INSERT_SQL, params)
+    portfolio_history.apply_holdings(conn, valuation.load_holdings(conn, [inv_id]), +1)
     conn.commit()
-  finally:
-    conn.close()
-
-  # Return freshly stored object
-  stored = get_investment(inv_id)
-  return stored if stored else {
-    "id": inv_id,
-    **payload,
-  }
+  versions.expire()
+
+  # The stored row is exactly what we inserted; no need to read it back.
+  return _stored_view(params)
+
+
+def create_investments(payloads: List[Dict[str, Any]]) -> Tuple[List[str], List[Tuple[int, str]]]:
+  """Insert a chunk of investments in one transaction with ``executemany``.
+
+  Returns the new ids and ``(index, error)`` pairs for rows the database rejected. If the
+  batch insert fails, the chunk is retried row by row so one bad row does not abort the rest.
+  """
+  params = [_insert_params(str(uuid.uuid4()), p) for p in payloads]
+  if not params:
+    return [], []
+
+  with portfolio_history.lock, db.connection() as conn:
+    try:
+      conn.executemany(_INSERT_SQL, params)
+      inserted = [p[0] for p in params]
+      errors: List[Tuple[int, str]] = []
+    except sqlite3.DatabaseError:
+      conn.rollback()
+      conn.execute("BEGIN")
+      inserted = []
+      errors = []
+      for i, p in enumerate(params):
+        conn.execute("SAVEPOINT bulk_row")
+        try:
+          conn.execute(_INSERT_SQL, p)
+          conn.execute("RELEASE SAVEPOINT bulk_row")
+          inserted.append(p[0])
+        except sqlite3.DatabaseError as e:
+          conn.execute("ROLLBACK TO SAVEPOINT bulk_row")
+          conn.execute("RELEASE SAVEPOINT bulk_row")
+          errors.append((i, str(e)))
+    portfolio_history.apply_holdings(conn, valuation.load_holdings(conn, inserted), +1)
+    conn.commit()
+  if inserted:
+    versions.expire()
+  return inserted, errors
 
 
 # Initialize DB on import
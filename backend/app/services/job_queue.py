@@ -0,0 +1,93 @@
+import asyncio
+import os
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from . import blocking_io, job_store, tracing
+
+
+WORKERS = int(os.getenv("EXTRACTION_JOB_WORKERS", "4"))
+# Workers are woken as soon as a job is submitted in this process; the poll interval only
+# matters for jobs queued by another process or left over from a restart.
+IDLE_POLL_S = float(os.getenv("EXTRACTION_JOB_POLL_S", "2"))
+
+Handler = Callable[[Dict[str, Any]], Awaitable[Dict[str, Any]]]
+
+_handler: Optional[Handler] = None
+_tasks: List["asyncio.Task[None]"] = []
+_wakeup: Optional[asyncio.Event] = None
+_stats = {"succeeded": 0, "failed": 0, "errors": 0, "busy": 0}
+
+log = tracing.get_logger("job_queue")
+
+
+async def _worker(index: int) -> None:
+  assert _handler is not None and _wakeup is not None
+  while True:
+    _wakeup.clear()
+    try:
+      job = await blocking_io.run_blocking(job_store.claim_next)
+    except Exception:
+      # e.g. "database is locked": back off and try again rather than lose the worker.
+      _stats["errors"] += 1
+      log.exception("Claiming a job failed", worker=index)
+      await asyncio.sleep(IDLE_POLL_S)
+      continue
+    if job is None:
+      try:
+        await asyncio.wait_for(_wakeup.wait(), timeout=IDLE_POLL_S)
+      except asyncio.TimeoutError:
+        pass
+      continue
+
+    _stats["busy"] += 1
+    # The job id doubles as the trace id, so a job's log lines and spans can be found from it.
+    with tracing.trace(job["job_id"]):
+      try:
+        try:
+          result = await _handler(job)
+        except asyncio.CancelledError:
+          # Left in the running state; requeue_interrupted() picks it up on the next start.
+          raise
+        except Exception as e:
+          _stats["failed"] += 1
+          log.warning("Job failed", worker=index, job_id=job["job_id"], error=str(e) or type(e).__name__)
+          await blocking_io.run_blocking(job_store.fail_job, job["job_id"], str(e) or type(e).__name__)
+        else:
+          _stats["succeeded"] += 1
+          await blocking_io.run_blocking(job_store.complete_job, job["job_id"], result)
+      except Exception:
+        # The outcome could not be stored; the job stays running until the next restart
+        # requeues it, and this worker carries on.
+        _stats["errors"] += 1
+        log.exception("Recording a job outcome failed", worker=index, job_id=job["job_id"])
+      finally:
+        _stats["busy"] -= 1
+
+
+async def start(handler: Handler, workers: int = WORKERS) -> None:
+  """Requeue jobs interrupted by the last shutdown and start ``workers`` worker tasks."""
+  global _handler, _wakeup
+  _handler = handler
+  _wakeup = asyncio.Event()
+  requeued = await blocking_io.run_blocking(job_store.requeue_interrupted)
+  if requeued:
+    log.info("Requeued interrupted jobs", count=requeued)
+  for i in range(max(1, workers)):
+    _tasks.append(asyncio.create_task(_worker(i)))
+
+
+async def stop() -> None:
+  for task in _tasks:
+    task.cancel()
+  await asyncio.gather(*_tasks, return_exceptions=True)
+  _tasks.clear()
+
+
+def notify() -> None:
+  """Wake idle workers after a job was queued."""
+  if _wakeup is not None:
+    _wakeup.set()
+
+
+def stats() -> Dict[str, Any]:
+  return {"workers": len(_tasks), **_stats}
@@ -0,0 +1,130 @@
+import datetime as dt
+import json
+import uuid
+from typing import Any, Dict, Optional
+
+from . import db
+
+
+STATE_QUEUED = "queued"
+STATE_RUNNING = "running"
+STATE_SUCCEEDED = "succeeded"
+STATE_FAILED = "failed"
+
+
+def init_jobs_table() -> None:
+  with db.connection() as conn:
+    conn.execute(
+      """
+      CREATE TABLE IF NOT EXISTS extraction_jobs (
+        job_id TEXT PRIMARY KEY,
+        bill_id TEXT NOT NULL,
+        category TEXT,
+        force_refresh INTEGER NOT NULL DEFAULT 0,
+        state TEXT NOT NULL,
+        result TEXT,
+        error TEXT,
+        attempts INTEGER NOT NULL DEFAULT 0,
+        created_at TEXT NOT NULL,
+        started_at TEXT,
+        finished_at TEXT
+      )
+      """
+    )
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_extraction_jobs_state ON extraction_jobs(state, created_at)")
+    conn.commit()
+
+
+def _now_ist() -> str:
+  return dt.datetime.now(dt.timezone(dt.timedelta(hours=5, minutes=30))).isoformat(timespec="milliseconds")
+
+
+def _row_to_dict(row) -> Dict[str, Any]:
+  job = dict(row)
+  job["force_refresh"] = bool(job["force_refresh"])
+  job["result"] = json.loads(job["result"]) if job["result"] else None
+  return job
+
+
+def create_job(bill_id: str, category: Optional[str], force_refresh: bool = False) -> Dict[str, Any]:
+  job_id = str(uuid.uuid4())
+  with db.connection() as conn:
+    conn.execute(
+      """
+      INSERT INTO extraction_jobs (job_id, bill_id, category, force_refresh, state, created_at)
+      VALUES (?, ?, ?, ?, ?, ?)
+      """,
+      (job_id, bill_id, category, int(force_refresh), STATE_QUEUED, _now_ist()),
+    )
+    conn.commit()
+  return get_job(job_id)
+
+
+def get_job(job_id: str) -> Optional[Dict[str, Any]]:
+  with db.connection() as conn:
+    row = conn.execute("SELECT * FROM extraction_jobs WHERE job_id = ?", (job_id,)).fetchone()
+    return _row_to_dict(row) if row else None
+
+
+def claim_next() -> Optional[Dict[str, Any]]:
+  """Mark the oldest queued job as running and return it, or None if the queue is empty.
+
+  The conditional UPDATE makes the claim atomic even with several workers (or processes)
+  racing for the same row; a lost race just moves on to the next candidate.
+  """
+  with db.connection() as conn:
+    while True:
+      row = conn.execute(
+        "SELECT job_id FROM extraction_jobs WHERE state = ? ORDER BY created_at LIMIT 1",
+        (STATE_QUEUED,),
+      ).fetchone()
+      if row is None:
+        return None
+      cur = conn.execute(
+        """
+        UPDATE extraction_jobs SET state = ?, started_at = ?, attempts = attempts + 1
+        WHERE job_id = ? AND state = ?
+        """,
+        (STATE_RUNNING, _now_ist(), row["job_id"], STATE_QUEUED),
+      )
+      conn.commit()
+      if cur.rowcount:
+        claimed = conn.execute("SELECT * FROM extraction_jobs WHERE job_id = ?", (row["job_id"],)).fetchone()
+        return _row_to_dict(claimed)
+
+
+def _finish(job_id: str, state: str, result: Optional[Dict[str, Any]], error: Optional[str]) -> None:
+  with db.connection() as conn:
+    conn.execute(
+      "UPDATE extraction_jobs SET state = ?, result = ?, error = ?, finished_at = ? WHERE job_id = ?",
+      (state, json.dumps(result) if result is not None else None, error, _now_ist(), job_id),
+    )
+    conn.commit()
+
+
+def complete_job(job_id: str, result: Dict[str, Any]) -> None:
+  _finish(job_id, STATE_SUCCEEDED, result, None)
+
+
+def fail_job(job_id: str, error: str) -> None:
+  _finish(job_id, STATE_FAILED, None, error)
+
+
+def requeue_interrupted() -> int:
+  """Put jobs that were running when the process stopped back in the queue (run at startup)."""
+  with db.connection() as conn:
+    cur = conn.execute(
+      "UPDATE extraction_jobs SET state = ?, started_at = NULL WHERE state = ?",
+      (STATE_QUEUED, STATE_RUNNING),
+    )
+    conn.commit()
+    return cur.rowcount
+
+
+def counts() -> Dict[str, int]:
+  with db.connection() as conn:
+    rows = conn.execute("SELECT state, COUNT(*) FROM extraction_jobs GROUP BY state").fetchall()
+  return {state: n for state, n in rows}
+
+
+init_jobs_table()
@@ -0,0 +1,100 @@
+import bisect
+import threading
+from typing import Any, Dict, List, Optional, Sequence
+
+
+# Upper bounds in milliseconds; observations above the last bound land in the overflow bucket.
+DEFAULT_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000, 60000)
+
+
+class Histogram:
+  """Fixed-bucket latency histogram; cheap to update from any thread."""
+
+  def __init__(self, buckets_ms: Sequence[float] = DEFAULT_BUCKETS_MS) -> None:
+    self.bounds = list(buckets_ms)
+    self._counts = [0] * (len(self.bounds) + 1)
+    self._lock = threading.Lock()
+    self._count = 0
+    self._sum_ms = 0.0
+    self._max_ms = 0.0
+
+  def observe(self, seconds: float) -> None:
+    ms = seconds * 1000.0
+    idx = bisect.bisect_left(self.bounds, ms)
+    with self._lock:
+      self._counts[idx] += 1
+      self._count += 1
+      self._sum_ms += ms
+      self._max_ms = max(self._max_ms, ms)
+
+  def _quantile(self, counts: List[int], total: int, q: float) -> Optional[float]:
+    """Estimate by linear interpolation inside the bucket holding the q-th observation."""
+    if total == 0:
+      return None
+    rank = q * total
+    seen = 0
+    for i, n in enumerate(counts):
+      if n and seen + n >= rank:
+        lower = self.bounds[i - 1] if i > 0 else 0.0
+        upper = self.bounds[i] if i < len(self.bounds) else self._max_ms
+        return round(min(lower + (upper - lower) * (rank - seen) / n, self._max_ms), 3)
+      seen += n
+    return round(self._max_ms, 3)
+
+  def snapshot(self) -> Dict[str, Any]:
+    with self._lock:
+      counts = list(self._counts)
+      total = self._count
+      sum_ms = self._sum_ms
+      max_ms = self._max_ms
+    labels = [f"le_{b:g}ms" for b in self.bounds] + ["overflow"]
+    return {
+      "count": total,
+      "mean_ms": round(sum_ms / total, 3) if total else None,
+      "p50_ms": self._quantile(counts, total, 0.50),
+      "p90_ms": self._quantile(counts, total, 0.90),
+      "p99_ms": self._quantile(counts, total, 0.99),
+      "max_ms": round(max_ms, 3),
+      "buckets": {label: n for label, n in zip(labels, counts) if n},
+    }
+
+
+_registry_lock = threading.Lock()
+_histograms: Dict[str, Histogram] = {}
+_counters: Dict[str, int] = {}
+
+
+def histogram(name: str) -> Histogram:
+  h = _histograms.get(name)
+  if h is None:
+    with _registry_lock:
+      h = _histograms.setdefault(name, Histogram())
+  return h
+
+
+def observe(name: str, seconds: float) -> None:
+  histogram(name).observe(seconds)
+
+
+def increment(name: str, n: int = 1) -> None:
+  with _registry_lock:
+    _counters[name] = _counters.get(name, 0) + n
+
+
+def snapshot(prefix: str = "") -> Dict[str, Any]:
+  """Histograms and counters whose names start with ``prefix``."""
+  with _registry_lock:
+    histograms = {k: v for k, v in _histograms.items() if k.startswith(prefix)}
+    counters = {k: v for k, v in _counters.items() if k.startswith(prefix)}
+  return {
+    "histograms": {k: h.snapshot() for k, h in sorted(histograms.items())},
+    "counters": dict(sorted(counters.items())),
+  }
+
+
+def reset(prefix: str = "") -> None:
+  """Drop histograms and counters whose names start with ``prefix`` (e.g. after a warm-up)."""
+  with _registry_lock:
+    for registry in (_histograms, _counters):
+      for name in [k for k in registry if k.startswith(prefix)]:
+        del registry[name]
@@ -1,24 +1,149 @@
+import asyncio
+import base64
+import json
 import os
-from typing import Any, Dict
+import uuid
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Union
 
-import httpx
+from . import blocking_io, http_clients, tracing
+
+
+MODEL = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
+BASE_URL = os.getenv("OPENAI_BASE_URL", "https://api.openai.com/v1").rstrip("/")
+# Process-wide cap on in-flight vision calls, shared by /bills/upload and the job workers.
+MAX_CONCURRENCY = int(os.getenv("OPENAI_MAX_CONCURRENCY", "4"))
+
+_semaphore: Optional[asyncio.Semaphore] = None
+_waiting = 0
+_in_flight = 0
+
+
+def _get_semaphore() -> asyncio.Semaphore:
+  global _semaphore
+  if _semaphore is None:
+    _semaphore = asyncio.Semaphore(max(1, MAX_CONCURRENCY))
+  return _semaphore
+
+
+def concurrency_stats() -> Dict[str, Any]:
+  return {"max_concurrency": MAX_CONCURRENCY, "in_flight": _in_flight, "waiting": _waiting}
+
+
+# Read size when streaming a file into a request body; a multiple of 3 so each chunk
+# base64-encodes without padding and the pieces concatenate into one valid encoding.
+_B64_READ_BYTES = 3 * 256 * 1024
+
+
+class ImageFile:
+  """A stored image passed by path (blocking to construct: stats the file).
+
+  Used in place of a data URL; its base64 is streamed into the request body a chunk at a
+  time, so a large upload is never held in memory as one encoded string.
+  """
+
+  def __init__(self, path: str, mime: str) -> None:
+    self.path = path
+    self.prefix = f"data:{mime};base64,".encode("ascii")
+    self.length = len(self.prefix) + 4 * ((os.path.getsize(path) + 2) // 3)
+
+
+class _StreamedBody:
+  """JSON request body with ImageFile contents streamed in; re-iterable, so retries work."""
+
+  def __init__(self, parts: List[Union[bytes, ImageFile]]) -> None:
+    self._parts = parts
+    self.length = sum(len(p) if isinstance(p, bytes) else p.length for p in parts)
+
+  async def __aiter__(self) -> AsyncIterator[bytes]:
+    for part in self._parts:
+      if isinstance(part, bytes):
+        yield part
+        continue
+      yield part.prefix
+      f = await blocking_io.run_blocking(open, part.path, "rb")
+      try:
+        while chunk := await blocking_io.run_blocking(f.read, _B64_READ_BYTES):
+          yield base64.b64encode(chunk)
+      finally:
+        f.close()
+
+
+def _encode_body(payload: Dict[str, Any]) -> Union[bytes, _StreamedBody]:
+  files: Dict[str, ImageFile] = {}
+  token = uuid.uuid4().hex
+
+  def placeholder(obj: Any) -> str:
+    if not isinstance(obj, ImageFile):
+      raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+    marker = f"@image-file-{token}-{len(files)}@"
+    files[marker] = obj
+    return marker
+
+  text = json.dumps(payload, default=placeholder)
+  if not files:
+    return text.encode("utf-8")
+  parts: List[Union[bytes, ImageFile]] = []
+  for marker, image in files.items():
+    head, text = text.split(marker, 1)
+    parts += [head.encode("utf-8"), image]
+  parts.append(text.encode("utf-8"))
+  return _StreamedBody(parts)
 
 
 class OpenAIClient:
-  def __init__(self) -> None:
+  def __init__(self, base_url: Optional[str] = None) -> None:
+    """``base_url`` defaults to OPENAI_BASE_URL; point it at any OpenAI-compatible server
+    (e.g. benchmarks/openai_stub.py) to run without real API calls."""
     api_key = os.getenv("OPENAI_API_KEY")
     if not api_key:
       raise RuntimeError("OPENAI_API_KEY is not set in environment")
     self._api_key = api_key
-    self._base_url = "https://api.openai.com/v1"
+    self._base_url = (base_url or BASE_URL).rstrip("/")
+    self.model = MODEL
 
-  async def call_gpt4o_vision(self, prompt: str, image_data_url: str) -> Dict[str, Any]:
+  async def call_gpt4o_vision(
+    self,
+    prompt: str,
+    image_data_urls: Union[str, List[Union[str, ImageFile]], Callable[[], Awaitable[List[Union[str, ImageFile]]]]],
+  ) -> Dict[str, Any]:
     """Call GPT-4o-mini in vision mode and return raw response + content string.
 
     The prompt MUST instruct the model to return only a single JSON object.
+    Pass several data URLs (e.g. every page of a PDF) to send them as one message, in order;
+    an ImageFile may stand in for any of them.
+    At most MAX_CONCURRENCY calls are in flight per process; extra callers wait their turn.
+    Passing an async callable instead defers building the (large) data URLs until the
+    caller holds a slot, so queued callers do not each keep an encoded payload in memory.
+
+    Traced as ``openai.queue_wait`` (for a slot), ``openai.encode`` (data URLs and JSON
+    body; streamed ImageFile contents are encoded while they are sent, so they count
+    towards ``openai.call`` instead) and ``openai.call``.
     """
-    payload = {
-      "model": "gpt-4o-mini",
+    global _waiting, _in_flight
+    _waiting += 1
+    try:
+      with tracing.span("openai.queue_wait"):
+        await _get_semaphore().acquire()
+    finally:
+      _waiting -= 1
+    _in_flight += 1
+    try:
+      with tracing.span("openai.encode") as span:
+        if callable(image_data_urls):
+          image_data_urls = await image_data_urls()
+        elif isinstance(image_data_urls, str):
+          image_data_urls = [image_data_urls]
+        body = _encode_body(self._payload(prompt, image_data_urls))
+        span["bytes"] = body.length if isinstance(body, _StreamedBody) else len(body)
+      with tracing.span("openai.call", model=self.model):
+        return await self._post(body, self._headers())
+    finally:
+      _in_flight -= 1
+      _get_semaphore().release()
+
+  def _payload(self, prompt: str, image_data_urls: List[Union[str, ImageFile]]) -> Dict[str, Any]:
+    return {
+      "model": self.model,
       "messages": [
         {
           "role": "system",
@@ -31,7 +156,7 @@ class OpenAIClient:
           "role": "user",
           "content": [
             {"type": "text", "text": prompt},
-            {"type": "image_url", "image_url": {"url": image_data_url}},
+            *({"type": "image_url", "image_url": {"url": url}} for url in image_data_urls),
           ],
         },
       ],
@@ -39,25 +164,43 @@ class OpenAIClient:
       "max_completion_tokens": 1200,
     }
 
-    headers = {
+  def _headers(self) -> Dict[str, str]:
+    return {
       "Authorization": f"Bearer {self._api_key}",
       "Content-Type": "application/json",
     }
 
-    async with httpx.AsyncClient(timeout=60) as client:
-      resp = await client.post(f"{self._base_url}/chat/completions", json=payload, headers=headers)
-      resp.raise_for_status()
-      data = resp.json()
-      content = data.get("choices", [{}])[0].get("message", {}).get("content", "")
-
-      # Strip common markdown fences if the model still wrapped the JSON.
-      text = content.strip()
-      if text.startswith("```json"):
-        text = text[len("```json"):]
-      elif text.startswith("```"):
-        text = text[3:]
-      if text.endswith("```"):
-        text = text[:-3]
-      text = text.strip()
-
-      return {"raw": data, "content": text}
+  async def _post(self, body: Union[bytes, _StreamedBody], headers: Dict[str, str]) -> Dict[str, Any]:
+    if isinstance(body, _StreamedBody):
+      # Without an explicit length httpx would fall back to chunked transfer encoding.
+      headers = {**headers, "Content-Length": str(body.length)}
+    # Billed per call: never resent once the upstream may have received it.
+    resp = await http_clients.request(
+      "openai", "POST", f"{self._base_url}/chat/completions", idempotent=False, content=body, headers=headers
+    )
+    resp.raise_for_status()
+    data = resp.json()
+    content = data.get("choices", [{}])[0].get("message", {}).get("content", "")
+
+    # Strip common markdown fences if the model still wrapped the JSON.
+    text = content.strip()
+    if text.startswith("```json"):
+      text = text[len("```json"):]
+    elif text.startswith("```"):
+      text = text[3:]
+    if text.endswith("```"):
+      text = text[:-3]
+    text = text.strip()
+
+    return {"raw": data, "content": text}
+
+
+_client: Optional[OpenAIClient] = None
+
+
+def get_client() -> OpenAIClient:
+  """Process-wide client; raises if OPENAI_API_KEY is not set."""
+  global _client
+  if _client is None:
+    _client = OpenAIClient()
+  return _client
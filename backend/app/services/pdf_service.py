@@ -1,19 +1,135 @@
-from typing import Optional
+import asyncio
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, List, Optional, Tuple, TypeVar, Union
 
 import fitz  # PyMuPDF
 
+from . import metrics, tracing
 
-def pdf_first_page_to_png_bytes(pdf_bytes: bytes) -> Optional[bytes]:
-  """Render the first page of a PDF (from bytes) to PNG bytes.
 
-  Returns None if the PDF has no pages or cannot be rendered.
-  """
+T = TypeVar("T")
+# PDF bytes, or the path of a stored PDF (cheaper to hand to a worker than the bytes).
+Source = Union[bytes, str]
+
+RENDER_DPI = int(os.getenv("PDF_RENDER_DPI", "200"))
+# Bills rarely run past two pages; the cap bounds render time and the size of the vision request.
+MAX_PAGES = int(os.getenv("PDF_MAX_PAGES", "4"))
+RENDER_WORKERS = int(os.getenv("PDF_RENDER_WORKERS", str(min(4, os.cpu_count() or 1))))
+# spawn rather than fork by default: the server process already runs threads (executors,
+# DB pool). Spawned workers re-import __main__, so entry-point scripts need a main guard.
+START_METHOD = os.getenv("PDF_RENDER_START_METHOD", "spawn")
+
+_executor: Optional[ProcessPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+log = tracing.get_logger("pdf_service")
+
+
+def _open(source: Source) -> fitz.Document:
+  if isinstance(source, str):
+    return fitz.open(source, filetype="pdf")
+  return fitz.open(stream=source, filetype="pdf")
+
+
+def _render_page(source: Source, index: int, dpi: int) -> Optional[bytes]:
+  """Worker: one page to PNG bytes, or None if it cannot be rendered."""
   try:
-    with fitz.open(stream=pdf_bytes, filetype="pdf") as doc:
-      if doc.page_count == 0:
-        return None
-      page = doc.load_page(0)
-      pix = page.get_pixmap(dpi=200)
-      return pix.tobytes("png")
+    with _open(source) as doc:
+      return doc.load_page(index).get_pixmap(dpi=dpi).tobytes("png")
   except Exception:
     return None
+
+
+def _render_first_page(source: Source, dpi: int) -> Tuple[int, Optional[bytes]]:
+  """Worker: the page count and the first page, so single-page bills need one round trip."""
+  try:
+    with _open(source) as doc:
+      if doc.page_count == 0:
+        return 0, None
+      return doc.page_count, doc.load_page(0).get_pixmap(dpi=dpi).tobytes("png")
+  except Exception:
+    return 0, None
+
+
+def _noop() -> None:
+  return None
+
+
+def get_executor() -> ProcessPoolExecutor:
+  global _executor
+  if _executor is None:
+    with _executor_lock:
+      if _executor is None:
+        _executor = ProcessPoolExecutor(
+          max_workers=max(1, RENDER_WORKERS),
+          mp_context=multiprocessing.get_context(START_METHOD),
+        )
+  return _executor
+
+
+def _reset_executor(broken: ProcessPoolExecutor) -> None:
+  global _executor
+  with _executor_lock:
+    if _executor is broken:
+      _executor = None
+  broken.shutdown(wait=False, cancel_futures=True)
+
+
+async def startup() -> None:
+  """Start the render workers up front so the first PDF upload does not pay for process spawn."""
+  loop = asyncio.get_running_loop()
+  executor = get_executor()
+  await asyncio.gather(*(loop.run_in_executor(executor, _noop) for _ in range(max(1, RENDER_WORKERS))))
+  log.info("Render workers ready", workers=max(1, RENDER_WORKERS))
+
+
+def shutdown() -> None:
+  global _executor
+  if _executor is not None:
+    _executor.shutdown(wait=True, cancel_futures=True)
+    _executor = None
+
+
+async def run_in_pool(fn: Callable[..., T], *args: Any) -> T:
+  """Run a CPU-bound, picklable call in the render process pool."""
+  loop = asyncio.get_running_loop()
+  executor = get_executor()
+  try:
+    return await loop.run_in_executor(executor, fn, *args)
+  except BrokenProcessPool:
+    # A worker died (e.g. killed by the OOM killer); the next call gets a fresh pool.
+    _reset_executor(executor)
+    raise
+
+
+async def render_pages(source: Source, max_pages: int = MAX_PAGES, dpi: int = RENDER_DPI) -> Tuple[List[bytes], int]:
+  """Render up to ``max_pages`` pages of a PDF (bytes or a file path) to PNG bytes, in page order.
+
+  Rasterization runs in the render process pool: page 1 first (which also yields the
+  page count), then the remaining pages in parallel. Returns ``(pages, page_count)``;
+  ``pages`` is empty if the PDF has no pages or page 1 cannot be rendered, and later
+  pages that fail are skipped. A PDF longer than ``max_pages`` is truncated, which is
+  logged and counted in ``pdf.truncated``.
+  """
+  with tracing.span("pdf.render") as span:
+    page_count, first = await run_in_pool(_render_first_page, source, dpi)
+    span["page_count"] = page_count
+    if first is None:
+      return [], page_count
+    rest = await asyncio.gather(*(
+      run_in_pool(_render_page, source, i, dpi)
+      for i in range(1, min(page_count, max(1, max_pages)))
+    ))
+    pages = [first] + [png for png in rest if png]
+    span["pages"] = len(pages)
+  metrics.increment("pdf.pages", len(pages))
+  if page_count > len(pages):
+    metrics.increment("pdf.pages_skipped", page_count - len(pages))
+  if page_count > max(1, max_pages):
+    metrics.increment("pdf.truncated")
+    log.warning("PDF truncated to the page cap", page_count=page_count, max_pages=max(1, max_pages))
+  return pages, page_count
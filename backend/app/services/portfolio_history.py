@@ -0,0 +1,277 @@
+import datetime as dt
+import sqlite3
+import threading
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from . import db, rate_store, valuation
+
+
+# Serializes every write to portfolio_daily_value together with the holdings/rates write
+# that triggered it, so an incremental delta and a per-date recompute can never interleave.
+lock = threading.RLock()
+
+HOLDINGS_CHUNK = 2048
+
+
+def init_portfolio_history_table() -> None:
+  with db.connection() as conn:
+    conn.execute(
+      """
+      CREATE TABLE IF NOT EXISTS portfolio_daily_value (
+        date TEXT PRIMARY KEY,
+        invested REAL NOT NULL,
+        market_value REAL NOT NULL,
+        holdings INTEGER NOT NULL,
+        updated_at TEXT
+      )
+      """
+    )
+    conn.commit()
+
+
+@dataclass
+class RateSeries:
+  """Every stored rate row per metal, sorted by date, for as-of lookups."""
+
+  gold_dates: np.ndarray
+  gold_by_karat: np.ndarray  # (rows, 25)
+  silver_dates: np.ndarray
+  silver: np.ndarray
+  platinum_dates: np.ndarray
+  platinum: np.ndarray
+
+  def axis(self) -> np.ndarray:
+    """Dates the history is materialized for: any day with a stored rate for any metal."""
+    return np.union1d(np.union1d(self.gold_dates, self.silver_dates), self.platinum_dates)
+
+  def dates_for(self, metal: str) -> np.ndarray:
+    return getattr(self, f"{metal}_dates")
+
+  def on(self, dates: np.ndarray):
+    """Latest rate on or before each date: gold (D, 25), silver (D,), platinum (D,)."""
+    def asof(row_dates: np.ndarray, values: np.ndarray) -> np.ndarray:
+      idx = np.searchsorted(row_dates, dates, side="right") - 1
+      nan_shape = (len(dates),) + values.shape[1:]
+      if len(row_dates) == 0:
+        return np.full(nan_shape, np.nan)
+      picked = values[np.clip(idx, 0, None)]
+      missing = idx < 0
+      if missing.any():
+        picked = picked.copy()
+        picked[missing] = np.nan
+      return picked
+
+    return (
+      asof(self.gold_dates, self.gold_by_karat),
+      asof(self.silver_dates, self.silver),
+      asof(self.platinum_dates, self.platinum),
+    )
+
+
+def _to_days(values: Sequence[str]) -> np.ndarray:
+  return np.array(values, dtype="datetime64[D]") if len(values) else np.empty(0, dtype="datetime64[D]")
+
+
+def load_rate_series(conn: sqlite3.Connection) -> RateSeries:
+  rows = conn.execute(
+    """
+    SELECT metal, purity, date, inr_per_gram FROM metal_rates
+    WHERE metal IN ('gold', 'silver', 'platinum')
+    ORDER BY metal, date
+    """
+  )
+  gold: Dict[str, Dict[str, float]] = {}
+  single: Dict[str, Dict[str, float]] = {"silver": {}, "platinum": {}}
+  for r in rows:
+    if r["metal"] == "gold":
+      gold.setdefault(r["date"], {})[r["purity"]] = r["inr_per_gram"]
+    elif r["purity"] == rate_store.BASE_PURITY[r["metal"]]:
+      single[r["metal"]][r["date"]] = r["inr_per_gram"]
+  gold_tables = [valuation.gold_rate_table(rates) for rates in gold.values()]
+  return RateSeries(
+    gold_dates=_to_days(list(gold)),
+    gold_by_karat=np.array(gold_tables) if gold_tables else np.empty((0, 25)),
+    silver_dates=_to_days(list(single["silver"])),
+    silver=np.array([valuation.as_rate(v) for v in single["silver"].values()], dtype=np.float64),
+    platinum_dates=_to_days(list(single["platinum"])),
+    platinum=np.array([valuation.as_rate(v) for v in single["platinum"].values()], dtype=np.float64),
+  )
+
+
+def value_on_dates(holdings: valuation.Holdings, dates: np.ndarray, series: RateSeries):
+  """Invested amount, market value and holding count of ``holdings`` on each date.
+
+  A holding counts from its purchase date onwards; undated holdings are excluded.
+  Work is chunked over holdings so memory stays bounded at HOLDINGS_CHUNK × len(dates).
+  """
+  invested = np.zeros(len(dates))
+  market = np.zeros(len(dates))
+  count = np.zeros(len(dates), dtype=np.int64)
+  if len(holdings) == 0 or len(dates) == 0:
+    return invested, market, count
+
+  gold, silver, platinum = series.on(dates)
+  purchase = valuation.holding_dates(holdings)
+  for start in range(0, len(holdings), HOLDINGS_CHUNK):
+    part = _slice(holdings, slice(start, start + HOLDINGS_CHUNK))
+    # NaT compares False, so undated holdings never count.
+    held = purchase[start:start + HOLDINGS_CHUNK][:, None] <= dates[None, :]
+    if not held.any():
+      continue
+    rate = valuation.holding_rates(part, gold, silver, platinum)
+    values = valuation.mark_with_rates(part, rate)["market_value"]
+    market += np.where(held, values, 0.0).sum(axis=0)
+    invested += np.where(held, part.total_amount[:, None], 0.0).sum(axis=0)
+    count += held.sum(axis=0)
+  return invested, market, count
+
+
+def _slice(holdings: valuation.Holdings, sl: slice) -> valuation.Holdings:
+  return valuation.Holdings(**{k: v[sl] for k, v in vars(holdings).items()})
+
+
+def _now_ist() -> str:
+  return dt.datetime.now(dt.timezone(dt.timedelta(hours=5, minutes=30))).isoformat(timespec="seconds")
+
+
+def _iso(dates: np.ndarray) -> List[str]:
+  return [str(d) for d in dates.astype("datetime64[D]")]
+
+
+def apply_holdings(conn: sqlite3.Connection, holdings: valuation.Holdings, sign: int) -> int:
+  """Add (sign=+1) or remove (sign=-1) holdings' contribution from every affected date.
+
+  Only dates on or after the earliest purchase date are touched. Returns the number of
+  dates updated. Call while holding ``lock``, inside the transaction that changed the rows.
+  """
+  purchase = valuation.holding_dates(holdings)
+  purchase = purchase[~np.isnat(purchase)]
+  if len(purchase) == 0:
+    return 0
+  series = load_rate_series(conn)
+  axis = series.axis()
+  affected = axis[axis >= purchase.min()]
+  if len(affected) == 0:
+    return 0
+  invested, market, count = value_on_dates(holdings, affected, series)
+  now = _now_ist()
+  conn.executemany(
+    """
+    UPDATE portfolio_daily_value
+    SET invested = invested + ?, market_value = market_value + ?, holdings = holdings + ?, updated_at = ?
+    WHERE date = ?
+    """,
+    [
+      (sign * float(invested[i]), sign * float(market[i]), sign * int(count[i]), now, d)
+      for i, d in enumerate(_iso(affected))
+    ],
+  )
+  return len(affected)
+
+
+def _recompute(conn: sqlite3.Connection, dates: np.ndarray, series: RateSeries) -> int:
+  if len(dates) == 0:
+    return 0
+  holdings = valuation.load_holdings(conn)
+  invested, market, count = value_on_dates(holdings, dates, series)
+  now = _now_ist()
+  conn.executemany(
+    """
+    INSERT INTO portfolio_daily_value (date, invested, market_value, holdings, updated_at)
+    VALUES (?, ?, ?, ?, ?)
+    ON CONFLICT(date) DO UPDATE SET
+      invested=excluded.invested,
+      market_value=excluded.market_value,
+      holdings=excluded.holdings,
+      updated_at=excluded.updated_at
+    """,
+    [(d, float(invested[i]), float(market[i]), int(count[i]), now) for i, d in enumerate(_iso(dates))],
+  )
+  return len(dates)
+
+
+def refresh_for_rate(conn: sqlite3.Connection, metal: str, date: str) -> int:
+  """Recompute the dates whose as-of ``metal`` rate is the row written for ``date``.
+
+  That is ``date`` itself plus following axis dates up to (excluding) the next stored row
+  for the same metal. Call while holding ``lock``, inside the rate write's transaction.
+  """
+  return refresh_for_rates(conn, {metal: (date, date)})
+
+
+def refresh_for_rates(conn: sqlite3.Connection, written: Dict[str, Tuple[str, str]]) -> int:
+  """Bulk form of ``refresh_for_rate``: ``written`` maps a metal to the first and last
+  dates written for it, and every axis date from the first up to the metal's next stored
+  row after the last is recomputed, in one pass."""
+  series = load_rate_series(conn)
+  axis = series.axis()
+  mask = np.zeros(len(axis), dtype=bool)
+  for metal, (first, last) in written.items():
+    if metal not in valuation.METALS:
+      continue  # no holding is valued in it
+    metal_dates = series.dates_for(metal)
+    later = metal_dates[metal_dates > np.datetime64(last, "D")]
+    affected = axis >= np.datetime64(first, "D")
+    if len(later):
+      affected &= axis < later[0]
+    mask |= affected
+  return _recompute(conn, axis[mask], series)
+
+
+def rebuild(conn: Optional[sqlite3.Connection] = None) -> int:
+  """Full recomputation over every axis date. Only used to (re)seed the table."""
+  if conn is None:
+    with lock, db.connection() as pooled:
+      n = rebuild(pooled)
+      pooled.commit()
+      return n
+  series = load_rate_series(conn)
+  axis = series.axis()
+  conn.execute("DELETE FROM portfolio_daily_value")
+  return _recompute(conn, axis, series)
+
+
+def ensure_built() -> int:
+  """Seed the table if it does not cover every rate date (first run or after a migration)."""
+  with lock, db.connection() as conn:
+    axis = load_rate_series(conn).axis()
+    stored = conn.execute("SELECT COUNT(*) FROM portfolio_daily_value").fetchone()[0]
+    if stored == len(axis):
+      return 0
+    n = rebuild(conn)
+    conn.commit()
+    return n
+
+
+def get_history(date_from: Optional[str] = None, date_to: Optional[str] = None) -> List[Dict[str, Any]]:
+  """Materialized daily series, oldest first. Never recomputes."""
+  clauses = []
+  params: List[Any] = []
+  if date_from:
+    clauses.append("date >= ?")
+    params.append(date_from)
+  if date_to:
+    clauses.append("date <= ?")
+    params.append(date_to)
+  where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+  with db.connection() as conn:
+    rows = conn.execute(
+      f"SELECT date, invested, market_value, holdings FROM portfolio_daily_value {where} ORDER BY date",
+      params,
+    ).fetchall()
+  return [
+    {
+      "date": r["date"],
+      "invested": round(r["invested"], 2),
+      "market_value": round(r["market_value"], 2),
+      "gain": round(r["market_value"] - r["invested"], 2),
+      "holdings": r["holdings"],
+    }
+    for r in rows
+  ]
+
+
+init_portfolio_history_table()
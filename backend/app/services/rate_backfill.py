@@ -0,0 +1,155 @@
+"""Bulk import of historical metal rates from CSV or NDJSON.
+
+One rate per row, in the columns (or keys) ``metal, purity, date, inr_per_gram`` plus
+optional ``source`` and ``captured_at_ist``; ``purity`` defaults to the metal's base
+purity (24K for gold). Rows are validated as they are read and upserted in chunks of
+``RATE_BACKFILL_CHUNK_SIZE``, one transaction per chunk. Used by ``POST /rates/backfill``
+and from the command line:
+
+  python -m app.services.rate_backfill rates.csv
+  python -m app.services.rate_backfill --format ndjson --source rbi - < rates.ndjson
+
+Writes from the command line need no server restart: they bump the data_versions rows
+that running servers' rate cache, as-of index and HTTP validators check, so those pick
+the new rates up within DATA_VERSION_CHECK_S.
+"""
+import argparse
+import csv
+import datetime as dt
+import json
+import math
+import os
+import sys
+import time
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from . import rate_store, tracing, versions
+
+
+CHUNK_SIZE = int(os.getenv("RATE_BACKFILL_CHUNK_SIZE", "5000"))
+MAX_ERRORS = 1000
+FORMATS = ("csv", "ndjson")
+
+log = tracing.get_logger("rate_backfill")
+
+
+def _iter_ndjson(lines: Iterable[str]) -> Iterator[Tuple[int, Any, Optional[str]]]:
+  row = 0
+  for line in lines:
+    if not line.strip():
+      continue
+    row += 1
+    try:
+      yield row, json.loads(line), None
+    except json.JSONDecodeError as e:
+      yield row, None, f"Invalid JSON: {e}"
+
+
+def _iter_csv(lines: Iterable[str]) -> Iterator[Tuple[int, Any, Optional[str]]]:
+  """One dict per CSV record after the header row."""
+  reader = csv.DictReader(lines, restkey="_extra")
+  if reader.fieldnames:
+    reader.fieldnames = [f.strip() for f in reader.fieldnames]
+  for row, item in enumerate(reader, start=1):
+    if "_extra" in item or None in item.values():
+      yield row, None, f"Expected {len(reader.fieldnames)} columns"
+      continue
+    yield row, {k: (v.strip() or None) for k, v in item.items()}, None
+
+
+_READERS = {"csv": _iter_csv, "ndjson": _iter_ndjson}
+
+
+def parse_row(item: Any, default_source: str, captured_at_ist: str, today: str) -> rate_store.RateRow:
+  """Validate one input record; raises ValueError with a message naming the bad field."""
+  if not isinstance(item, dict):
+    raise ValueError("Expected an object")
+  metal = str(item.get("metal") or "").strip().lower()
+  if metal not in rate_store.METALS:
+    raise ValueError(f"metal: expected one of {', '.join(rate_store.METALS)}")
+  purity = rate_store.purity_key(metal, item.get("purity") or rate_store.BASE_PURITY[metal])
+  date = str(item.get("date") or "")
+  try:
+    date = dt.date.fromisoformat(date).isoformat()
+  except ValueError:
+    raise ValueError("date: expected YYYY-MM-DD")
+  if date > today:
+    raise ValueError("date: in the future")
+  try:
+    value = float(item.get("inr_per_gram"))
+  except (TypeError, ValueError):
+    raise ValueError("inr_per_gram: expected a number")
+  if not math.isfinite(value) or value <= 0:
+    raise ValueError("inr_per_gram: expected a positive number")
+  source = str(item.get("source") or default_source)
+  return metal, purity, date, value, source, str(item.get("captured_at_ist") or captured_at_ist)
+
+
+def run(lines: Iterable[str], fmt: str, source: str = "backfill", chunk_size: int = CHUNK_SIZE) -> Dict[str, Any]:
+  """Import every record in ``lines`` (blocking) and return the counts and row errors."""
+  if fmt not in _READERS:
+    raise ValueError(f"Unsupported format '{fmt}', expected one of {', '.join(FORMATS)}")
+  started = time.perf_counter()
+  now_ist = dt.datetime.now(dt.timezone(dt.timedelta(hours=5, minutes=30))).isoformat(timespec="seconds")
+  today = dt.date.today().isoformat()
+  counts = {"received": 0, "inserted": 0, "updated": 0, "unchanged": 0, "skipped": 0}
+  errors: List[Dict[str, Any]] = []
+  chunk: List[rate_store.RateRow] = []
+
+  def flush() -> None:
+    for key, n in rate_store.bulk_upsert_rates(chunk).items():
+      counts[key] += n
+    chunk.clear()
+
+  for row, item, error in _READERS[fmt](lines):
+    counts["received"] += 1
+    if error is None:
+      try:
+        chunk.append(parse_row(item, source, now_ist, today))
+      except ValueError as e:
+        error = str(e)
+    if error is not None:
+      counts["skipped"] += 1
+      if len(errors) < MAX_ERRORS:
+        errors.append({"row": row, "error": error})
+      continue
+    if len(chunk) >= chunk_size:
+      flush()
+  if chunk:
+    flush()
+
+  elapsed = time.perf_counter() - started
+  written = counts["inserted"] + counts["updated"]
+  log.info("Backfilled rates", **counts, elapsed_s=round(elapsed, 2))
+  return {
+    **counts,
+    "errors": errors,
+    "errors_truncated": counts["skipped"] > len(errors),
+    "elapsed_s": round(elapsed, 3),
+    "rows_per_sec": round(written / elapsed, 1) if elapsed > 0 else None,
+  }
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+  parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+  parser.add_argument("path", help="CSV or NDJSON file, or - for stdin")
+  parser.add_argument("--format", choices=FORMATS, help="default: from the file extension (.csv, else ndjson)")
+  parser.add_argument("--source", default="backfill", help="source for rows that do not name one")
+  parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+  args = parser.parse_args(argv)
+  from . import investment_store  # noqa: F401  (creates the holdings table the portfolio refresh reads)
+
+  fmt = args.format or ("csv" if args.path.lower().endswith(".csv") else "ndjson")
+  if args.path == "-":
+    report = run(sys.stdin, fmt, args.source, args.chunk_size)
+  else:
+    with open(args.path, newline="", encoding="utf-8-sig") as f:
+      report = run(f, fmt, args.source, args.chunk_size)
+  print(json.dumps(report, indent=2))
+  print(f"Running servers pick these rates up within {versions.DATA_VERSION_CHECK_S:g}s.", file=sys.stderr)
+  if report["skipped"]:
+    sys.exit(1)
+
+
+if __name__ == "__main__":
+  main()
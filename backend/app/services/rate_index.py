@@ -0,0 +1,150 @@
+import threading
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+
+from . import db, versions
+
+
+_NO_DATES = np.empty(0, dtype="datetime64[D]")
+_NO_RATES = np.empty(0, dtype=np.float64)
+
+
+def to_days(dates: Any) -> np.ndarray:
+  """ISO strings, ``datetime.date`` objects or datetime64 values as a datetime64[D] array."""
+  days = np.asarray(dates, dtype="datetime64[D]")
+  return days.reshape(-1) if days.ndim == 0 else days
+
+
+class RateIndex:
+  """Sorted (dates, rates) arrays per (metal, purity) for batched as-of lookups.
+
+  Loaded from metal_rates in one primary-key-ordered scan on first use, and again once
+  the rates' data_versions rows have moved past the ones read with it: upserts in this
+  process are applied in place, anything else (the backfill CLI, another worker) is
+  picked up within DATA_VERSION_CHECK_S. Missing and non-positive rates are left out, so
+  an as-of lookup falls back to the previous day with a usable rate. Series are
+  replaced, never mutated, so a lookup only needs the lock to pick up the current arrays.
+  """
+
+  def __init__(self) -> None:
+    self._series: Dict[Tuple[str, str], Tuple[np.ndarray, np.ndarray]] = {}
+    # data_versions rows ("rates.<metal>") the series reflect; None until loaded.
+    self._loaded_versions: Optional[Dict[str, versions.Version]] = None
+    self._lock = threading.Lock()
+    self._loads = 0
+    self._updates = 0
+    self._lookups = 0
+    self._dates_looked_up = 0
+
+  def _load_locked(self) -> None:
+    with db.connection() as conn:
+      # Versions first: a write landing between the two reads only costs another reload.
+      loaded_versions = versions.read_all(conn, "rates.")
+      rows = conn.execute(
+        "SELECT metal, purity, date, inr_per_gram FROM metal_rates WHERE inr_per_gram > 0 ORDER BY metal, purity, date"
+      ).fetchall()
+    grouped: Dict[Tuple[str, str], Tuple[list, list]] = {}
+    for metal, purity, date, rate in rows:
+      dates, rates = grouped.setdefault((metal, purity), ([], []))
+      dates.append(date)
+      rates.append(rate)
+    self._series = {
+      key: (np.array(dates, dtype="datetime64[D]"), np.array(rates, dtype=np.float64))
+      for key, (dates, rates) in grouped.items()
+    }
+    self._loaded_versions = loaded_versions
+    self._loads += 1
+
+  def _stale_locked(self, snapshot: Dict[str, versions.Version]) -> bool:
+    if self._loaded_versions is None:
+      return True
+    # The snapshot may be older than the load, so only a newer version counts.
+    return any(
+      version > self._loaded_versions.get(resource, versions.UNWRITTEN)[0]
+      for resource, (version, _) in snapshot.items()
+      if resource.startswith("rates.")
+    )
+
+  def _current(self, metal: str, purity: str) -> Tuple[np.ndarray, np.ndarray]:
+    snapshot = versions.current()
+    with self._lock:
+      if self._stale_locked(snapshot):
+        # Loading under the lock means an upsert committed mid-load is applied after it.
+        self._load_locked()
+      return self._series.get((metal, purity), (_NO_DATES, _NO_RATES))
+
+  def asof(self, metal: str, purity: str, dates: Any) -> Tuple[np.ndarray, np.ndarray]:
+    """Latest stored rate on or before each date, and the date it was stored for.
+
+    Returns ``(rates, rate_dates)`` aligned with ``dates``; NaN / NaT where nothing is
+    stored on or before a date. One binary search per date over the in-memory series.
+    """
+    days = to_days(dates)
+    series_dates, series_rates = self._current(metal, purity)
+    idx = np.searchsorted(series_dates, days, side="right") - 1
+    found = idx >= 0
+    safe = np.clip(idx, 0, None)
+    rates = np.full(days.shape, np.nan)
+    rate_dates = np.full(days.shape, np.datetime64("NaT"), dtype="datetime64[D]")
+    if len(series_dates):
+      rates[found] = series_rates[safe[found]]
+      rate_dates[found] = series_dates[safe[found]]
+    with self._lock:
+      self._lookups += 1
+      self._dates_looked_up += days.size
+    return rates, rate_dates
+
+  def apply(self, day: Dict[str, Any], db_version: versions.Version, changes: int) -> None:
+    """Fold one committed day (``{"metal", "date", "inr_per_gram": {purity: rate}}``) in.
+
+    ``db_version`` is the metal's data_versions row read in the write transaction and
+    ``changes`` the rows that write touched (each bumps the version once); if anything
+    else moved the version since the load, the index is dropped and reloaded instead.
+    """
+    date = np.datetime64(day["date"], "D")
+    resource = f"rates.{day['metal']}"
+    with self._lock:
+      if self._loaded_versions is None:
+        return  # the first lookup loads everything, this day included
+      if self._loaded_versions.get(resource, versions.UNWRITTEN)[0] != db_version[0] - changes:
+        self._series = {}
+        self._loaded_versions = None
+        return
+      for purity, rate in day["inr_per_gram"].items():
+        key = (day["metal"], purity)
+        dates, rates = self._series.get(key, (_NO_DATES, _NO_RATES))
+        i = int(np.searchsorted(dates, date))
+        exists = i < len(dates) and dates[i] == date
+        usable = rate is not None and rate > 0
+        if exists and usable:
+          rates = rates.copy()
+          rates[i] = rate
+        elif exists:
+          dates, rates = np.delete(dates, i), np.delete(rates, i)
+        elif usable:
+          dates, rates = np.insert(dates, i, date), np.insert(rates, i, rate)
+        self._series[key] = (dates, rates)
+      self._loaded_versions[resource] = db_version
+      self._updates += 1
+
+  def invalidate(self) -> None:
+    with self._lock:
+      self._series = {}
+      self._loaded_versions = None
+
+  def stats(self) -> Dict[str, Any]:
+    with self._lock:
+      return {
+        "loaded": self._loaded_versions is not None,
+        "series": len(self._series),
+        "points": sum(len(dates) for dates, _ in self._series.values()),
+        "loads": self._loads,
+        "updates": self._updates,
+        "lookups": self._lookups,
+        "dates_looked_up": self._dates_looked_up,
+      }
+
+
+index = RateIndex()
+
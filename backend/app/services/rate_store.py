@@ -1,75 +1,573 @@
 import datetime as dt
 import os
 import sqlite3
-from typing import Any, Dict, Optional
-
-
-DB_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "db"))
-DB_PATH = os.path.join(DB_DIR, "investments.db")
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from . import db, rate_index, tracing, versions
+from .singleflight import SingleFlight
+
+
+RATE_CACHE_SIZE = int(os.getenv("RATE_CACHE_SIZE", "1024"))
+# Staleness is bounded by the data_versions check (a write from any process drops the
+# metal's entries within DATA_VERSION_CHECK_S), so the TTLs only age out entries nobody
+# reads. Rows for past dates practically never change; today's row and "no row yet"
+# answers are what the scheduler or a manual override will replace.
+RATE_CACHE_TTL_TODAY_S = float(os.getenv("RATE_CACHE_TTL_TODAY_S", "300"))
+RATE_CACHE_TTL_PAST_S = float(os.getenv("RATE_CACHE_TTL_PAST_S", "86400"))
+RATE_CACHE_TTL_MISSING_S = float(os.getenv("RATE_CACHE_TTL_MISSING_S", "30"))
+
+LATEST = "latest"
+METALS = ("gold", "silver", "platinum")
+
+log = tracing.get_logger("rate_store")
+
+
+def _copy(day: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+  return {**day, "inr_per_gram": dict(day["inr_per_gram"])} if day is not None else None
+
+
+class RateCache:
+  """Bounded LRU of stored rate days keyed by (metal, date), including "no row" answers.
+
+  ``date`` may also be ``LATEST`` for the newest day of a metal. Entries are only valid
+  for the metal's data_versions row they were read at: ``sync`` drops a metal's entries
+  once that row moves, whichever process wrote. Fills from a read are dropped if a write
+  or a sync touched the same metal while the read was in flight, so a slow reader can
+  never overwrite a fresher value.
+  """
+
+  def __init__(self, max_size: int = RATE_CACHE_SIZE) -> None:
+    self.max_size = max(1, max_size)
+    self._entries: "OrderedDict[Tuple[str, str], Tuple[float, Optional[Dict[str, Any]]]]" = OrderedDict()
+    self._versions: Dict[str, int] = {}
+    self._db_versions: Dict[str, versions.Version] = {}
+    self._lock = threading.Lock()
+    self._hits = 0
+    self._misses = 0
+    self._expired = 0
+    self._evictions = 0
+    self._writes = 0
+    self._invalidations = 0
+
+  @staticmethod
+  def _ttl(date: str, row: Optional[Dict[str, Any]]) -> float:
+    if row is None:
+      return RATE_CACHE_TTL_MISSING_S
+    if date == LATEST or date >= dt.date.today().isoformat():
+      return RATE_CACHE_TTL_TODAY_S
+    return RATE_CACHE_TTL_PAST_S
+
+  def get(self, metal: str, date: str) -> Tuple[bool, Optional[Dict[str, Any]]]:
+    """``(hit, row)``; a hit with ``row=None`` means the row is known not to exist."""
+    key = (metal, date)
+    with self._lock:
+      entry = self._entries.get(key)
+      if entry is not None:
+        expires_at, row = entry
+        if expires_at > time.monotonic():
+          self._entries.move_to_end(key)
+          self._hits += 1
+          return True, _copy(row)
+        del self._entries[key]
+        self._expired += 1
+      self._misses += 1
+      return False, None
+
+  def _drop_metal_locked(self, metal: str) -> None:
+    for key in [key for key in self._entries if key[0] == metal]:
+      del self._entries[key]
+    self._versions[metal] = self._versions.get(metal, 0) + 1
+
+  def sync(self, snapshot: Dict[str, versions.Version]) -> None:
+    """Drop the entries of every metal whose data_versions row differs from the one they
+    were read at (see ``versions.current``)."""
+    with self._lock:
+      for metal in {r.removeprefix("rates.") for r in snapshot if r.startswith("rates.")} | set(self._db_versions):
+        seen = snapshot.get(f"rates.{metal}", versions.UNWRITTEN)
+        if self._db_versions.get(metal) != seen:
+          if metal in self._db_versions:
+            self._drop_metal_locked(metal)
+            self._invalidations += 1
+          self._db_versions[metal] = seen
+
+  def version(self, metal: str) -> int:
+    with self._lock:
+      return self._versions.get(metal, 0)
+
+  def _put_locked(self, metal: str, date: str, row: Optional[Dict[str, Any]]) -> None:
+    key = (metal, date)
+    self._entries[key] = (time.monotonic() + self._ttl(date, row), _copy(row))
+    self._entries.move_to_end(key)
+    while len(self._entries) > self.max_size:
+      self._entries.popitem(last=False)
+      self._evictions += 1
+
+  def fill(self, metal: str, date: str, row: Optional[Dict[str, Any]], version: int) -> None:
+    """Cache a value read from the database at ``version`` (see ``version()``)."""
+    with self._lock:
+      if self._versions.get(metal, 0) == version:
+        self._put_locked(metal, date, row)
+
+  def write_through(self, metal: str, row: Dict[str, Any], db_version: versions.Version) -> None:
+    """Record a committed upsert: drop the metal's entries (a write from another process
+    may be folded into the same version) and store the row as of ``db_version``."""
+    with self._lock:
+      self._drop_metal_locked(metal)
+      self._db_versions[metal] = db_version
+      self._writes += 1
+      self._put_locked(metal, row["date"], row)
+
+  def clear(self) -> None:
+    with self._lock:
+      self._entries.clear()
+      for metal in list(self._versions):
+        self._versions[metal] += 1
+
+  def stats(self) -> Dict[str, Any]:
+    with self._lock:
+      lookups = self._hits + self._misses
+      return {
+        "size": len(self._entries),
+        "max_size": self.max_size,
+        "hits": self._hits,
+        "misses": self._misses,
+        "hit_ratio": round(self._hits / lookups, 4) if lookups else None,
+        "expired": self._expired,
+        "evictions": self._evictions,
+        "writes": self._writes,
+        "invalidations": self._invalidations,
+      }
+
+
+cache = RateCache()
+
+# Upstream scrapes for a missing (metal, date) row are coalesced so a burst of requests
+# triggers one fetch; a failed fetch is not retried for RATE_FETCH_FAILURE_TTL_S.
+RATE_FETCH_TIMEOUT_S = float(os.getenv("RATE_FETCH_TIMEOUT_S", "25"))
+RATE_FETCH_FAILURE_TTL_S = float(os.getenv("RATE_FETCH_FAILURE_TTL_S", "60"))
+
+rate_fetches = SingleFlight(RATE_FETCH_TIMEOUT_S, RATE_FETCH_FAILURE_TTL_S)
+
+
+def cache_stats() -> Dict[str, Any]:
+  return cache.stats()
+
+
+def index_stats() -> Dict[str, Any]:
+  return rate_index.index.stats()
+
+
+def cached_rate(metal: str, date: str) -> Tuple[bool, Optional[Dict[str, Any]]]:
+  """Non-blocking cache lookup, safe to call on the event loop; the row is in the
+  per-metal shape of ``get_rate_by_date`` and friends. A miss whenever the data_versions
+  snapshot is due for a re-read, which only the blocking path does."""
+  snapshot = versions.peek()
+  if snapshot is None:
+    return False, None
+  cache.sync(snapshot)
+  hit, day = cache.get(metal, date)
+  return hit, _legacy_row(metal, day)
+
+
+def _metal(metal: str) -> str:
+  name = str(metal).strip().lower()
+  if not name.isalpha():
+    raise ValueError(f"Invalid metal '{metal}'")
+  return name
+
+
+def purity_key(metal: str, purity: Any) -> str:
+  """Canonical purity label: gold karats as "22K" (from 22, "22", "22k" or "22KT"), any
+  other metal's fineness as given, e.g. "999" or "950"."""
+  text = str(purity).strip().upper()
+  if _metal(metal) == "gold":
+    digits = text.removesuffix("KT").removesuffix("K")
+    if not digits.isdigit() or not 1 <= int(digits) <= 24:
+      raise ValueError(f"Invalid gold purity '{purity}' (expected a karat from 1 to 24)")
+    return f"{int(digits)}K"
+  if not text or len(text) > 16:
+    raise ValueError(f"Invalid {metal} purity '{purity}'")
+  return text
+
+
+def karat_of(purity: str) -> int:
+  """Karat of a canonical gold purity label ("22K" -> 22)."""
+  return int(purity[:-1])
+
+
+_COLUMNS = "metal, purity, date, inr_per_gram, source, captured_at_ist"
+
+
+def _days(rows: Iterable[sqlite3.Row]) -> List[Dict[str, Any]]:
+  """Group purity rows (ordered by metal, then date) into one dict per metal and date."""
+  days: List[Dict[str, Any]] = []
+  for row in rows:
+    day = days[-1] if days else None
+    if day is None or day["metal"] != row["metal"] or day["date"] != row["date"]:
+      day = {
+        "metal": row["metal"],
+        "date": row["date"],
+        "source": row["source"],
+        "captured_at_ist": row["captured_at_ist"],
+        "inr_per_gram": {},
+      }
+      days.append(day)
+    day["inr_per_gram"][row["purity"]] = row["inr_per_gram"]
+  return days
+
+
+def _cached_day(metal: str, date: str, sql: str, params: tuple) -> Optional[Dict[str, Any]]:
+  cache.sync(versions.current())
+  hit, day = cache.get(metal, date)
+  if hit:
+    return day
+  version = cache.version(metal)
+  with db.connection() as conn:
+    days = _days(conn.execute(sql, params))
+  day = days[0] if days else None
+  cache.fill(metal, date, day, version)
+  return day
+
+
+@contextmanager
+def _rate_write(metal: str, date: str) -> Iterator[sqlite3.Connection]:
+  """Connection for a rate upsert; the materialized portfolio history is refreshed and
+  committed in the same transaction."""
+  from . import portfolio_history  # lazy: portfolio_history -> valuation -> rate_store
+
+  with portfolio_history.lock, db.connection() as conn:
+    yield conn
+    portfolio_history.refresh_for_rate(conn, metal, date)
+    conn.commit()
 
 
-def init_rates_table() -> None:
-  os.makedirs(DB_DIR, exist_ok=True)
-  conn = sqlite3.connect(DB_PATH)
-  try:
+def init_metal_rates_table() -> None:
+  with db.connection() as conn:
+    # Clustered on the primary key, so one metal and purity's history is a contiguous
+    # range; the (metal, date) index serves whole-day and latest-day lookups.
     conn.execute(
       """
-      CREATE TABLE IF NOT EXISTS daily_gold_rates (
-        date TEXT PRIMARY KEY,
-        inr_per_gram_24k REAL,
-        inr_per_gram_22k REAL,
-        inr_per_gram_18k REAL,
-        inr_per_gram_14k REAL,
-        inr_per_gram_9k REAL,
+      CREATE TABLE IF NOT EXISTS metal_rates (
+        metal TEXT NOT NULL,
+        purity TEXT NOT NULL,
+        date TEXT NOT NULL,
+        inr_per_gram REAL,
         source TEXT,
-        captured_at_ist TEXT
-      )
+        captured_at_ist TEXT,
+        PRIMARY KEY (metal, purity, date)
+      ) WITHOUT ROWID
       """
     )
-    # Back-compat: add columns if the table existed previously.
-    for col, typ in [
-      ("inr_per_gram_22k", "REAL"),
-      ("inr_per_gram_18k", "REAL"),
-      ("inr_per_gram_14k", "REAL"),
-      ("inr_per_gram_9k", "REAL"),
-      ("source", "TEXT"),
-      ("captured_at_ist", "TEXT"),
-    ]:
-      try:
-        conn.execute(f"ALTER TABLE daily_gold_rates ADD COLUMN {col} {typ}")
-      except sqlite3.OperationalError:
-        pass
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_metal_rates_metal_date ON metal_rates(metal, date)")
+    versions.track(conn, "metal_rates", "'rates.' || {row}.metal")
+    _migrate_legacy_tables(conn)
     conn.commit()
-  finally:
-    conn.close()
 
 
-def init_silver_rates_table() -> None:
-  os.makedirs(DB_DIR, exist_ok=True)
-  conn = sqlite3.connect(DB_PATH)
-  try:
-    conn.execute(
-      """
-      CREATE TABLE IF NOT EXISTS daily_silver_rates (
-        date TEXT PRIMARY KEY,
-        inr_per_gram REAL,
-        source TEXT,
-        captured_at_ist TEXT
+# Purity a metal's single headline rate is stored under: the silver and platinum routes
+# (and the tables they used to write) quote one INR/gram figure per day.
+BASE_PURITY = {"gold": "24K", "silver": "999", "platinum": "950"}
+# Karats the gold routes read and write, one column each in the old daily_gold_rates.
+GOLD_KARATS = (24, 22, 18, 14, 9)
+
+_LEGACY_TABLES = {
+  "daily_gold_rates": ("gold", [(f"{k}K", f"inr_per_gram_{k}k") for k in GOLD_KARATS]),
+  "daily_silver_rates": ("silver", [(BASE_PURITY["silver"], "inr_per_gram")]),
+  "daily_platinum_rates": ("platinum", [(BASE_PURITY["platinum"], "inr_per_gram")]),
+}
+
+
+def _migrate_legacy_tables(conn: sqlite3.Connection) -> None:
+  """One-time copy of the per-metal daily_*_rates tables into metal_rates.
+
+  Each legacy table is renamed to ``<name>_migrated`` afterwards (kept, not dropped), so
+  the copy runs once and the old data stays around until someone removes it.
+  """
+  tables = {r[0] for r in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+  for table, (metal, columns) in _LEGACY_TABLES.items():
+    if table not in tables or f"{table}_migrated" in tables:
+      continue
+    present = {r[1] for r in conn.execute(f"PRAGMA table_info({table})")}
+    source = "source" if "source" in present else "NULL"
+    captured = "captured_at_ist" if "captured_at_ist" in present else "NULL"
+    copied = 0
+    for purity, column in columns:
+      if column in present:
+        copied += conn.execute(
+          f"""
+          INSERT OR IGNORE INTO metal_rates ({_COLUMNS})
+          SELECT ?, ?, date, {column}, {source}, {captured} FROM {table} WHERE {column} IS NOT NULL
+          """,
+          (metal, purity),
+        ).rowcount
+    conn.execute(f"ALTER TABLE {table} RENAME TO {table}_migrated")
+    log.info("Migrated legacy rate table", table=table, metal=metal, rows=copied)
+
+
+_UPSERT_SQL = f"""
+  INSERT INTO metal_rates ({_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?)
+  ON CONFLICT(metal, purity, date) DO UPDATE SET
+    inr_per_gram=excluded.inr_per_gram,
+    source=excluded.source,
+    captured_at_ist=excluded.captured_at_ist
+"""
+
+# (metal, purity, date, inr_per_gram, source, captured_at_ist), already validated.
+RateRow = Tuple[str, str, str, float, str, str]
+
+
+def upsert_rates(metal: str, date: str, rates: Dict[Any, Optional[float]], source: str, captured_at_ist: str) -> Dict[str, Any]:
+  """Store ``{purity: INR/gram}`` for one metal and date (blocking); ``None`` values are skipped.
+
+  Other purities already stored for that day are kept. Returns the whole stored day:
+  ``{"metal", "date", "source", "captured_at_ist", "inr_per_gram": {purity: rate}}``.
+  """
+  metal = _metal(metal)
+  values = [(purity_key(metal, p), float(v)) for p, v in rates.items() if v is not None]
+  with _rate_write(metal, date) as conn:
+    changes = conn.executemany(_UPSERT_SQL, [(metal, purity, date, value, source, captured_at_ist) for purity, value in values]).rowcount
+    days = _days(conn.execute(f"SELECT {_COLUMNS} FROM metal_rates WHERE metal = ? AND date = ?", (metal, date)))
+    # Read under the write lock, so it covers every commit before ours as well.
+    db_version = versions.read(conn, f"rates.{metal}")
+  day = days[0] if days else {"metal": metal, "date": date, "source": source, "captured_at_ist": captured_at_ist, "inr_per_gram": {}}
+  cache.write_through(metal, day, db_version)
+  rate_index.index.apply(day, db_version, changes)
+  versions.expire()
+  return day
+
+
+def bulk_upsert_rates(rows: Sequence[RateRow]) -> Dict[str, int]:
+  """Upsert a chunk of rows, any metals, in one transaction with ``executemany`` (blocking).
+
+  Rows already stored with the same rate and source are not rewritten. Returns counts of
+  rows ``inserted``, ``updated`` and ``unchanged``. The portfolio history is refreshed
+  once for the chunk, and the rate cache and as-of index are reset afterwards rather
+  than patched row by row.
+  """
+  from . import portfolio_history  # lazy: portfolio_history -> valuation -> rate_store
+
+  counts = {"inserted": 0, "updated": 0, "unchanged": 0}
+  dates_by_metal: Dict[str, List[str]] = {}
+  for row in rows:
+    dates_by_metal.setdefault(row[0], []).append(row[2])
+  with portfolio_history.lock, db.connection() as conn:
+    stored: Dict[Tuple[str, str, str], Tuple[float, str]] = {}
+    for metal, dates in dates_by_metal.items():
+      for r in conn.execute(
+        "SELECT purity, date, inr_per_gram, source FROM metal_rates WHERE metal = ? AND date BETWEEN ? AND ?",
+        (metal, min(dates), max(dates)),
+      ):
+        stored[(metal, r["purity"], r["date"])] = (r["inr_per_gram"], r["source"])
+    writes = []
+    for row in rows:
+      key = (row[0], row[1], row[2])
+      previous = stored.get(key)
+      if previous == (row[3], row[4]):
+        counts["unchanged"] += 1
+        continue
+      counts["inserted" if previous is None else "updated"] += 1
+      stored[key] = (row[3], row[4])
+      writes.append(row)
+    if writes:
+      conn.executemany(_UPSERT_SQL, writes)
+      written: Dict[str, Tuple[str, str]] = {}
+      for metal, _, date, *_ in writes:
+        first, last = written.get(metal, (date, date))
+        written[metal] = (min(first, date), max(last, date))
+      portfolio_history.refresh_for_rates(conn, written)
+    conn.commit()
+  if writes:
+    cache.clear()
+    rate_index.index.invalidate()
+    versions.expire()
+  return counts
+
+
+def rates_asof(metal: str, purity: Any, dates: Any) -> Tuple[np.ndarray, np.ndarray]:
+  """Batched as-of lookup: for each of ``dates``, the latest ``metal``/``purity`` rate stored
+  on or before it and that rate's date (NaN / NaT if none). Served from the in-memory
+  index, not one query per date (blocking only for the first load)."""
+  metal = _metal(metal)
+  return rate_index.index.asof(metal, purity_key(metal, purity), dates)
+
+
+def get_rates(metal: str, date: str) -> Optional[Dict[str, Any]]:
+  """Every purity stored for ``metal`` on ``date`` (blocking on a cache miss)."""
+  metal = _metal(metal)
+  return _cached_day(metal, date, f"SELECT {_COLUMNS} FROM metal_rates WHERE metal = ? AND date = ?", (metal, date))
+
+
+def get_latest(metal: str) -> Optional[Dict[str, Any]]:
+  metal = _metal(metal)
+  return _cached_day(
+    metal,
+    LATEST,
+    f"""
+    SELECT {_COLUMNS} FROM metal_rates
+    WHERE metal = ? AND date = (SELECT MAX(date) FROM metal_rates WHERE metal = ?)
+    """,
+    (metal, metal),
+  )
+
+
+def latest_rates(metals: Sequence[str] = METALS) -> Dict[str, Optional[Dict[str, Any]]]:
+  """Latest stored day for each metal: cached days are used, the rest come from one query."""
+  latest: Dict[str, Optional[Dict[str, Any]]] = {}
+  pending = {}
+  cache.sync(versions.current())
+  for metal in map(_metal, metals):
+    hit, day = cache.get(metal, LATEST)
+    if hit:
+      latest[metal] = day
+    else:
+      pending[metal] = cache.version(metal)
+  if pending:
+    placeholders = ", ".join("?" for _ in pending)
+    with db.connection() as conn:
+      rows = conn.execute(
+        f"""
+        SELECT {", ".join(f"r.{c.strip()}" for c in _COLUMNS.split(","))}
+        FROM metal_rates r
+        JOIN (SELECT metal, MAX(date) AS date FROM metal_rates WHERE metal IN ({placeholders}) GROUP BY metal) l
+          ON r.metal = l.metal AND r.date = l.date
+        ORDER BY r.metal
+        """,
+        list(pending),
       )
-      """
+      found = {day["metal"]: day for day in _days(rows)}
+    for metal, version in pending.items():
+      latest[metal] = found.get(metal)
+      cache.fill(metal, LATEST, latest[metal], version)
+  return latest
+
+
+def _filters(metals: Optional[Sequence[str]], date_from: Optional[str], date_to: Optional[str]) -> Tuple[List[str], List[Any]]:
+  clauses = []
+  params: List[Any] = []
+  if metals is not None:
+    metals = [_metal(m) for m in metals]
+    clauses.append(f"metal IN ({', '.join('?' for _ in metals)})")
+    params += metals
+  if date_from:
+    clauses.append("date >= ?")
+    params.append(date_from)
+  if date_to:
+    clauses.append("date <= ?")
+    params.append(date_to)
+  return clauses, params
+
+
+def rate_history(
+  metals: Optional[Sequence[str]] = None,
+  date_from: Optional[str] = None,
+  date_to: Optional[str] = None,
+  descending: bool = False,
+  limit: Optional[int] = None,
+) -> List[Dict[str, Any]]:
+  """Stored days for ``metals`` (default: all) in one indexed scan, grouped by metal then date.
+
+  ``limit`` keeps the first ``limit`` dates in the requested order (the newest ones when
+  ``descending``), picked from the (metal, date) index before any row is read.
+  """
+  clauses, params = _filters(metals, date_from, date_to)
+  order = "DESC" if descending else ""
+  if limit is not None:
+    inner = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+    clauses.append(f"date IN (SELECT DISTINCT date FROM metal_rates {inner} ORDER BY date {order} LIMIT ?)")
+    params = params * 2 + [limit]
+  where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+  with db.connection() as conn:
+    return _days(conn.execute(f"SELECT {_COLUMNS} FROM metal_rates {where} ORDER BY metal, date {order}", params))
+
+
+RESOLUTIONS = ("day", "week", "month")
+# First day of the bucket a date falls in; weeks start on Monday.
+_BUCKET_SQL = {
+  "day": "date",
+  "week": "date(date, '-' || ((CAST(strftime('%w', date) AS INTEGER) + 6) % 7) || ' days')",
+  "month": "substr(date, 1, 7) || '-01'",
+}
+
+
+def rate_buckets(
+  metal: str,
+  resolution: str,
+  date_from: Optional[str] = None,
+  date_to: Optional[str] = None,
+  descending: bool = False,
+  limit: Optional[int] = None,
+) -> List[Dict[str, Any]]:
+  """Per-purity open/high/low/close/avg of ``metal`` per day, week or month, aggregated in SQL.
+
+  Each bucket is ``{"metal", "date" (bucket start), "from", "to", "days", "inr_per_gram":
+  {purity: {"open", "high", "low", "close", "avg", "days"}}}``; ``from``/``to`` are the first
+  and last stored dates inside it. Missing or non-positive rates are left out. ``limit``
+  keeps the first ``limit`` buckets in the requested order.
+  """
+  if resolution not in _BUCKET_SQL:
+    raise ValueError(f"Invalid resolution '{resolution}' (expected one of {', '.join(RESOLUTIONS)})")
+  clauses, params = _filters([metal], date_from, date_to)
+  order = "DESC" if descending else ""
+  keep = ""
+  if limit is not None:
+    keep = f"WHERE bucket IN (SELECT DISTINCT bucket FROM r ORDER BY bucket {order} LIMIT ?)"
+    params.append(limit)
+  sql = f"""
+    WITH r AS (
+      SELECT purity, date, inr_per_gram AS v, {_BUCKET_SQL[resolution]} AS bucket
+      FROM metal_rates WHERE {' AND '.join(clauses)} AND inr_per_gram > 0
+    ), w AS (
+      SELECT bucket, purity, date, v,
+        FIRST_VALUE(v) OVER (PARTITION BY bucket, purity ORDER BY date) AS open,
+        FIRST_VALUE(v) OVER (PARTITION BY bucket, purity ORDER BY date DESC) AS close
+      FROM r {keep}
     )
-    for col, typ in [
-      ("inr_per_gram", "REAL"),
-      ("source", "TEXT"),
-      ("captured_at_ist", "TEXT"),
-    ]:
-      try:
-        conn.execute(f"ALTER TABLE daily_silver_rates ADD COLUMN {col} {typ}")
-      except sqlite3.OperationalError:
-        pass
-    conn.commit()
-  finally:
-    conn.close()
+    SELECT bucket, purity, MIN(date) AS first, MAX(date) AS last, COUNT(*) AS days,
+      MAX(open) AS open, MAX(v) AS high, MIN(v) AS low, MAX(close) AS close, AVG(v) AS avg
+    FROM w GROUP BY bucket, purity ORDER BY bucket {order}, purity
+  """
+  buckets: List[Dict[str, Any]] = []
+  with db.connection() as conn:
+    for row in conn.execute(sql, params):
+      if not buckets or buckets[-1]["date"] != row["bucket"]:
+        buckets.append({"metal": _metal(metal), "date": row["bucket"], "from": row["first"], "to": row["last"], "days": 0, "inr_per_gram": {}})
+      bucket = buckets[-1]
+      bucket["from"] = min(bucket["from"], row["first"])
+      bucket["to"] = max(bucket["to"], row["last"])
+      bucket["days"] = max(bucket["days"], row["days"])
+      bucket["inr_per_gram"][row["purity"]] = {
+        "open": row["open"],
+        "high": row["high"],
+        "low": row["low"],
+        "close": row["close"],
+        "avg": round(row["avg"], 2),
+        "days": row["days"],
+      }
+  return buckets
+
+
+# Per-metal wrappers in the shapes the /rates routes (and the scheduler) were written
+# against: gold as one inr_per_gram_<k>k field per karat, silver and platinum as a single
+# inr_per_gram at their base purity.
+
+def _legacy_row(metal: str, day: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+  if day is None:
+    return None
+  row: Dict[str, Any] = {"date": day["date"]}
+  if metal == "gold":
+    for karat in GOLD_KARATS:
+      row[f"inr_per_gram_{karat}k"] = day["inr_per_gram"].get(f"{karat}K")
+  else:
+    row["inr_per_gram"] = day["inr_per_gram"].get(BASE_PURITY[metal])
+  row["source"] = day["source"]
+  row["captured_at_ist"] = day["captured_at_ist"]
+  return row
 
 
 def upsert_daily_rate(
@@ -82,74 +580,16 @@ def upsert_daily_rate(
   source: str,
   captured_at_ist: str,
 ) -> Dict[str, Any]:
-  conn = sqlite3.connect(DB_PATH)
-  try:
-    conn.execute(
-      """
-      INSERT INTO daily_gold_rates (
-        date,
-        inr_per_gram_24k,
-        inr_per_gram_22k,
-        inr_per_gram_18k,
-        inr_per_gram_14k,
-        inr_per_gram_9k,
-        source,
-        captured_at_ist
-      )
-      VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-      ON CONFLICT(date) DO UPDATE SET
-        inr_per_gram_24k=excluded.inr_per_gram_24k,
-        inr_per_gram_22k=excluded.inr_per_gram_22k,
-        inr_per_gram_18k=excluded.inr_per_gram_18k,
-        inr_per_gram_14k=excluded.inr_per_gram_14k,
-        inr_per_gram_9k=excluded.inr_per_gram_9k,
-        source=excluded.source,
-        captured_at_ist=excluded.captured_at_ist
-      """,
-      (
-        date,
-        float(inr_per_gram_24k),
-        float(inr_per_gram_22k),
-        float(inr_per_gram_18k),
-        float(inr_per_gram_14k),
-        float(inr_per_gram_9k),
-        source,
-        captured_at_ist,
-      ),
-    )
-    conn.commit()
-  finally:
-    conn.close()
-  return {
-    "date": date,
-    "inr_per_gram_24k": float(inr_per_gram_24k),
-    "inr_per_gram_22k": float(inr_per_gram_22k),
-    "inr_per_gram_18k": float(inr_per_gram_18k),
-    "inr_per_gram_14k": float(inr_per_gram_14k),
-    "inr_per_gram_9k": float(inr_per_gram_9k),
-    "source": source,
-    "captured_at_ist": captured_at_ist,
-  }
+  rates = dict(zip(GOLD_KARATS, (inr_per_gram_24k, inr_per_gram_22k, inr_per_gram_18k, inr_per_gram_14k, inr_per_gram_9k)))
+  return _legacy_row("gold", upsert_rates("gold", date, rates, source, captured_at_ist))
 
 
 def get_rate_by_date(date: str) -> Optional[Dict[str, Any]]:
-  conn = sqlite3.connect(DB_PATH)
-  conn.row_factory = sqlite3.Row
-  try:
-    row = conn.execute("SELECT * FROM daily_gold_rates WHERE date = ?", (date,)).fetchone()
-    return dict(row) if row else None
-  finally:
-    conn.close()
+  return _legacy_row("gold", get_rates("gold", date))
 
 
 def get_latest_rate() -> Optional[Dict[str, Any]]:
-  conn = sqlite3.connect(DB_PATH)
-  conn.row_factory = sqlite3.Row
-  try:
-    row = conn.execute("SELECT * FROM daily_gold_rates ORDER BY date DESC LIMIT 1").fetchone()
-    return dict(row) if row else None
-  finally:
-    conn.close()
+  return _legacy_row("gold", get_latest("gold"))
 
 
 def get_or_fetch_today(fetch_fn) -> Dict[str, Any]:
@@ -172,141 +612,37 @@ def get_or_fetch_today(fetch_fn) -> Dict[str, Any]:
   )
 
 
-def get_all_rates_desc():
-  """Return all daily rates in descending order by date."""
-  conn = sqlite3.connect(DB_PATH)
-  conn.row_factory = sqlite3.Row
-  try:
-    rows = conn.execute("SELECT * FROM daily_gold_rates ORDER BY date DESC").fetchall()
-    return [dict(row) for row in rows]
-  finally:
-    conn.close()
-
-
-def upsert_daily_silver_rate(date: str, inr_per_gram: float, source: str, captured_at_ist: str):
-  conn = sqlite3.connect(DB_PATH)
-  try:
-    conn.execute(
-      """
-      INSERT INTO daily_silver_rates (
-        date, inr_per_gram, source, captured_at_ist
-      ) VALUES (?, ?, ?, ?)
-      ON CONFLICT(date) DO UPDATE SET
-        inr_per_gram=excluded.inr_per_gram,
-        source=excluded.source,
-        captured_at_ist=excluded.captured_at_ist
-      """,
-      (date, float(inr_per_gram), source, captured_at_ist),
-    )
-    conn.commit()
-  finally:
-    conn.close()
-  return {
-    "date": date,
-    "inr_per_gram": float(inr_per_gram),
-    "source": source,
-    "captured_at_ist": captured_at_ist,
-  }
+def _legacy_history(metal: str, date_from: Optional[str], date_to: Optional[str], limit: Optional[int]) -> List[Dict[str, Any]]:
+  return [_legacy_row(metal, day) for day in rate_history([metal], date_from, date_to, descending=True, limit=limit)]
 
 
-def get_silver_rate_by_date(date: str):
-  conn = sqlite3.connect(DB_PATH)
-  conn.row_factory = sqlite3.Row
-  try:
-    row = conn.execute("SELECT * FROM daily_silver_rates WHERE date = ?", (date,)).fetchone()
-    return dict(row) if row else None
-  finally:
-    conn.close()
+def get_all_rates_desc(date_from: Optional[str] = None, date_to: Optional[str] = None, limit: Optional[int] = None):
+  """Return daily rates in descending order by date, optionally for a range and the newest ``limit`` days."""
+  return _legacy_history("gold", date_from, date_to, limit)
 
 
-def get_all_silver_rates_desc():
-  conn = sqlite3.connect(DB_PATH)
-  conn.row_factory = sqlite3.Row
-  try:
-    rows = conn.execute("SELECT * FROM daily_silver_rates ORDER BY date DESC").fetchall()
-    return [dict(row) for row in rows]
-  finally:
-    conn.close()
+def upsert_daily_silver_rate(date: str, inr_per_gram: float, source: str, captured_at_ist: str):
+  return _legacy_row("silver", upsert_rates("silver", date, {BASE_PURITY["silver"]: inr_per_gram}, source, captured_at_ist))
 
 
-init_silver_rates_table()
+def get_silver_rate_by_date(date: str):
+  return _legacy_row("silver", get_rates("silver", date))
 
 
-def init_platinum_rates_table() -> None:
-  os.makedirs(DB_DIR, exist_ok=True)
-  conn = sqlite3.connect(DB_PATH)
-  try:
-    conn.execute(
-      """
-      CREATE TABLE IF NOT EXISTS daily_platinum_rates (
-        date TEXT PRIMARY KEY,
-        inr_per_gram REAL,
-        source TEXT,
-        captured_at_ist TEXT
-      )
-      """
-    )
-    for col, typ in [
-      ("inr_per_gram", "REAL"),
-      ("source", "TEXT"),
-      ("captured_at_ist", "TEXT"),
-    ]:
-      try:
-        conn.execute(f"ALTER TABLE daily_platinum_rates ADD COLUMN {col} {typ}")
-      except sqlite3.OperationalError:
-        pass
-    conn.commit()
-  finally:
-    conn.close()
+def get_all_silver_rates_desc(date_from: Optional[str] = None, date_to: Optional[str] = None, limit: Optional[int] = None):
+  return _legacy_history("silver", date_from, date_to, limit)
 
 
 def upsert_daily_platinum_rate(date: str, inr_per_gram: float, source: str, captured_at_ist: str):
-  conn = sqlite3.connect(DB_PATH)
-  try:
-    conn.execute(
-      """
-      INSERT INTO daily_platinum_rates (
-        date, inr_per_gram, source, captured_at_ist
-      ) VALUES (?, ?, ?, ?)
-      ON CONFLICT(date) DO UPDATE SET
-        inr_per_gram=excluded.inr_per_gram,
-        source=excluded.source,
-        captured_at_ist=excluded.captured_at_ist
-      """,
-      (date, float(inr_per_gram), source, captured_at_ist),
-    )
-    conn.commit()
-  finally:
-    conn.close()
-  return {
-    "date": date,
-    "inr_per_gram": float(inr_per_gram),
-    "source": source,
-    "captured_at_ist": captured_at_ist,
-  }
+  return _legacy_row("platinum", upsert_rates("platinum", date, {BASE_PURITY["platinum"]: inr_per_gram}, source, captured_at_ist))
 
 
 def get_platinum_rate_by_date(date: str):
-  conn = sqlite3.connect(DB_PATH)
-  conn.row_factory = sqlite3.Row
-  try:
-    row = conn.execute("SELECT * FROM daily_platinum_rates WHERE date = ?", (date,)).fetchone()
-    return dict(row) if row else None
-  finally:
-    conn.close()
-
-
-def get_all_platinum_rates_desc():
-  conn = sqlite3.connect(DB_PATH)
-  conn.row_factory = sqlite3.Row
-  try:
-    rows = conn.execute("SELECT * FROM daily_platinum_rates ORDER BY date DESC").fetchall()
-    return [dict(row) for row in rows]
-  finally:
-    conn.close()
+  return _legacy_row("platinum", get_rates("platinum", date))
 
 
-init_platinum_rates_table()
+def get_all_platinum_rates_desc(date_from: Optional[str] = None, date_to: Optional[str] = None, limit: Optional[int] = None):
+  return _legacy_history("platinum", date_from, date_to, limit)
 
 
-init_rates_table()
+init_metal_rates_table()
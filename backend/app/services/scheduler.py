@@ -2,15 +2,18 @@ import asyncio
 import datetime as dt
 
 from .goodreturns_scraper import fetch_goodreturns_gold_rates
-from . import rate_store
+from . import blocking_io, rate_store, tracing
 
 
 IST = dt.timezone(dt.timedelta(hours=5, minutes=30))
 
+log = tracing.get_logger("scheduler")
+
 
 async def _run_once() -> None:
   rates = await fetch_goodreturns_gold_rates()
-  rate_store.upsert_daily_rate(
+  await blocking_io.run_blocking(
+    rate_store.upsert_daily_rate,
     rates["date"],
     rates["inr_per_gram_24k"],
     rates["inr_per_gram_22k"],
@@ -36,6 +39,6 @@ async def run_daily_1030_job() -> None:
     await asyncio.sleep(wait_s)
     try:
       await _run_once()
-      print("[scheduler] stored daily gold rates snapshot")
+      log.info("Stored daily gold rates snapshot")
     except Exception as e:
-      print(f"[scheduler] failed to store daily gold rates: {e}")
+      log.warning("Failed to store daily gold rates", error=str(e))
@@ -0,0 +1,102 @@
+import asyncio
+import threading
+import time
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+
+class RecentFailure(RuntimeError):
+  """Raised without calling upstream while a key's last failure is still negatively cached."""
+
+  def __init__(self, key: Hashable, retry_in_s: float, cause: BaseException) -> None:
+    super().__init__(f"{cause} (cached failure for {key}, retry in {retry_in_s:.0f}s)")
+    self.key = key
+    self.retry_in_s = retry_in_s
+    self.cause = cause
+
+
+class SingleFlight:
+  """Coalesce concurrent async calls per key into one in-flight call.
+
+  The first caller for a key starts ``fn``; callers arriving while it runs await the same
+  task. The shared call is bounded by ``timeout_s`` and is shielded, so a caller that is
+  cancelled (e.g. a disconnected client) does not cancel it for everyone else. Failures
+  are remembered for ``failure_ttl_s``; during that window callers get ``RecentFailure``
+  immediately instead of hitting upstream again.
+  """
+
+  def __init__(self, timeout_s: float, failure_ttl_s: float) -> None:
+    self.timeout_s = timeout_s
+    self.failure_ttl_s = failure_ttl_s
+    self._inflight: Dict[Hashable, "asyncio.Task[Any]"] = {}
+    self._failures: Dict[Hashable, Tuple[float, BaseException]] = {}
+    self._lock = threading.Lock()
+    self._calls = 0
+    self._upstream = 0
+    self._coalesced = 0
+    self._failed = 0
+    self._timeouts = 0
+    self._negative_hits = 0
+
+  async def _run(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+    try:
+      return await asyncio.wait_for(fn(), timeout=self.timeout_s)
+    except asyncio.TimeoutError:
+      with self._lock:
+        self._timeouts += 1
+      raise TimeoutError(f"Upstream call for {key} timed out after {self.timeout_s}s")
+
+  def _settle(self, key: Hashable, task: "asyncio.Task[Any]") -> None:
+    with self._lock:
+      if self._inflight.get(key) is task:
+        del self._inflight[key]
+      if task.cancelled():
+        return
+      exc = task.exception()
+      if exc is not None:
+        self._failed += 1
+        if self.failure_ttl_s > 0:
+          self._failures[key] = (time.monotonic() + self.failure_ttl_s, exc)
+      else:
+        self._failures.pop(key, None)
+
+  async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+    with self._lock:
+      self._calls += 1
+      failure = self._failures.get(key)
+      if failure is not None:
+        expires_at, exc = failure
+        remaining = expires_at - time.monotonic()
+        if remaining > 0:
+          self._negative_hits += 1
+          raise RecentFailure(key, remaining, exc)
+        del self._failures[key]
+      task = self._inflight.get(key)
+      if task is None:
+        self._upstream += 1
+        task = asyncio.ensure_future(self._run(key, fn))
+        task.add_done_callback(lambda t: self._settle(key, t))
+        self._inflight[key] = task
+      else:
+        self._coalesced += 1
+    return await asyncio.shield(task)
+
+  def forget(self, key: Optional[Hashable] = None) -> None:
+    """Drop negatively cached failures (all of them, or only ``key``)."""
+    with self._lock:
+      if key is None:
+        self._failures.clear()
+      else:
+        self._failures.pop(key, None)
+
+  def stats(self) -> Dict[str, Any]:
+    with self._lock:
+      return {
+        "calls": self._calls,
+        "upstream_calls": self._upstream,
+        "coalesced": self._coalesced,
+        "failures": self._failed,
+        "timeouts": self._timeouts,
+        "negative_hits": self._negative_hits,
+        "in_flight": len(self._inflight),
+        "cached_failures": len(self._failures),
+      }
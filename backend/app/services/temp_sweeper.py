@@ -0,0 +1,183 @@
+import asyncio
+import os
+import time
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from . import bill_store, blocking_io, tracing
+
+
+# Uploads nobody saved as an investment expire after this long.
+TTL_S = float(os.getenv("TEMP_BILL_TTL_S", str(2 * 24 * 3600)))
+# Cap on the total size of temp bills; oldest are evicted first once it is exceeded.
+QUOTA_BYTES = int(os.getenv("TEMP_BILL_QUOTA_BYTES", str(2 * 1024 ** 3)))
+# The quota never evicts a bill younger than this: it may still be mid-extraction or on
+# the user's review screen.
+MIN_AGE_S = float(os.getenv("TEMP_BILL_MIN_AGE_S", "900"))
+# Staged uploads are renamed away within seconds; anything older was left by a crash.
+INCOMING_TTL_S = float(os.getenv("TEMP_BILL_INCOMING_TTL_S", "3600"))
+INTERVAL_S = float(os.getenv("TEMP_SWEEP_INTERVAL_S", "900"))
+# Directory entries read (and files deleted) per executor call, so a sweep over 100k
+# files is many short jobs rather than one long one. Each delete batch is one commit,
+# and commits that touch thousands of rows pay for a WAL checkpoint, so batches stay
+# in the thousands.
+BATCH_SIZE = int(os.getenv("TEMP_SWEEP_BATCH", "5000"))
+
+Entry = Tuple[str, int, float]  # (path, size, mtime)
+
+log = tracing.get_logger("temp_sweeper")
+
+_stats: Dict[str, Any] = {
+  "runs": 0,
+  "failures": 0,
+  "expired": 0,
+  "evicted": 0,
+  "incoming_removed": 0,
+  "bytes_freed": 0,
+  "last_run_at": None,
+  "last": None,
+}
+
+
+def _scandir(directory: str) -> Optional[Iterator[os.DirEntry]]:
+  try:
+    return os.scandir(directory)
+  except FileNotFoundError:
+    return None
+
+
+def _next_batch(it: Iterator[os.DirEntry], size: int) -> List[Entry]:
+  """Up to ``size`` regular files from the scandir iterator (blocking)."""
+  batch: List[Entry] = []
+  for entry in it:
+    try:
+      if entry.is_file(follow_symlinks=False):
+        st = entry.stat(follow_symlinks=False)
+        batch.append((entry.path, st.st_size, st.st_mtime))
+    except OSError:
+      continue
+    if len(batch) >= size:
+      break
+  return batch
+
+
+async def _scan(directory: str):
+  """Yield batches of (path, size, mtime) for the files in ``directory``."""
+  it = await blocking_io.run_blocking(_scandir, directory)
+  if it is None:
+    return
+  try:
+    while batch := await blocking_io.run_blocking(_next_batch, it, BATCH_SIZE):
+      yield batch
+  finally:
+    it.close()
+
+
+def _remove_incoming(entries: List[Entry]) -> int:
+  removed = 0
+  for path, _, _ in entries:
+    try:
+      os.remove(path)
+      removed += 1
+    except OSError:
+      pass
+  return removed
+
+
+async def _remove_temp(entries: List[Entry]) -> Tuple[int, int]:
+  removed = freed = 0
+  for i in range(0, len(entries), BATCH_SIZE):
+    chunk = [(path, size) for path, size, _ in entries[i:i + BATCH_SIZE]]
+    n, b = await blocking_io.run_blocking(bill_store.remove_temp_files, chunk)
+    removed += n
+    freed += b
+  return removed, freed
+
+
+async def sweep() -> Dict[str, Any]:
+  """One pass: expire temp bills older than TTL_S, then evict oldest-first down to QUOTA_BYTES.
+
+  Bills with a queued or running extraction job are left alone, however old. Also clears
+  staged uploads abandoned in the incoming directory. Returns this pass's statistics
+  (also kept for /health/stats).
+  """
+  started = time.perf_counter()
+  now = time.time()
+  scanned = 0
+  expired = expired_bytes = 0
+  kept: List[Entry] = []
+  # remove_temp_files re-checks under its lock; this keeps busy bills out of the quota
+  # victims so eviction moves on to the next oldest instead.
+  busy = await blocking_io.run_blocking(bill_store.busy_temp_paths)
+  async for batch in _scan(bill_store.TEMP_DIR):
+    scanned += len(batch)
+    stale = [e for e in batch if now - e[2] > TTL_S and e[0] not in busy]
+    kept.extend(e for e in batch if now - e[2] <= TTL_S or e[0] in busy)
+    if stale:
+      n, b = await _remove_temp(stale)
+      expired += n
+      expired_bytes += b
+
+  total = sum(size for _, size, _ in kept)
+  evicted = evicted_bytes = 0
+  if total > QUOTA_BYTES:
+    kept.sort(key=lambda e: e[2])
+    victims = []
+    over = total - QUOTA_BYTES
+    for entry in kept:
+      if over <= 0 or now - entry[2] < MIN_AGE_S:
+        break
+      if entry[0] in busy:
+        continue
+      victims.append(entry)
+      over -= entry[1]
+    evicted, evicted_bytes = await _remove_temp(victims)
+    total -= evicted_bytes
+    if over > 0:
+      log.warning("Temp bills still over quota; the rest are too young to evict or have extraction jobs pending", over_bytes=over, min_age_s=MIN_AGE_S)
+
+  incoming_removed = 0
+  async for batch in _scan(bill_store.INCOMING_DIR):
+    stale = [e for e in batch if now - e[2] > INCOMING_TTL_S]
+    if stale:
+      incoming_removed += await blocking_io.run_blocking(_remove_incoming, stale)
+
+  result = {
+    "scanned": scanned,
+    "expired": expired,
+    "evicted": evicted,
+    "incoming_removed": incoming_removed,
+    "bytes_freed": expired_bytes + evicted_bytes,
+    "temp_files": scanned - expired - evicted,
+    "temp_bytes": total,
+    "duration_s": round(time.perf_counter() - started, 3),
+  }
+  _stats["runs"] += 1
+  _stats["expired"] += expired
+  _stats["evicted"] += evicted
+  _stats["incoming_removed"] += incoming_removed
+  _stats["bytes_freed"] += result["bytes_freed"]
+  _stats["last_run_at"] = now
+  _stats["last"] = result
+  if expired or evicted or incoming_removed:
+    log.info("Swept temp bills", **result)
+  return result
+
+
+async def run_forever() -> None:
+  """Sweep at startup and then every TEMP_SWEEP_INTERVAL_S."""
+  while True:
+    try:
+      await sweep()
+    except Exception:
+      _stats["failures"] += 1
+      log.exception("Sweep failed")
+    await asyncio.sleep(INTERVAL_S)
+
+
+def stats() -> Dict[str, Any]:
+  return {
+    "ttl_s": TTL_S,
+    "quota_bytes": QUOTA_BYTES,
+    "interval_s": INTERVAL_S,
+    **_stats,
+  }
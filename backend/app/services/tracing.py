@@ -0,0 +1,151 @@
+import contextvars
+import datetime as dt
+import json
+import logging
+import os
+import sys
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional
+
+from . import metrics
+
+
+# INFO in production; DEBUG also logs whole payloads (uploaded investments, extracted bills).
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+# "json" (one object per line, for log shippers) or "text" (for reading in a terminal).
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json").lower()
+# Level of the per-span log lines; WARNING keeps spans in the histograms only.
+TRACE_LOG_LEVEL = os.getenv("TRACE_LOG_LEVEL", LOG_LEVEL).upper()
+
+_trace_id: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("trace_id", default=None)
+_span: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("span", default=None)
+
+
+class _JsonFormatter(logging.Formatter):
+  def format(self, record: logging.LogRecord) -> str:
+    entry: Dict[str, Any] = {
+      "ts": dt.datetime.fromtimestamp(record.created, dt.timezone.utc).isoformat(timespec="milliseconds"),
+      "level": record.levelname.lower(),
+      "logger": record.name,
+      "msg": record.getMessage(),
+    }
+    trace_id = getattr(record, "trace_id", None)
+    if trace_id:
+      entry["trace_id"] = trace_id
+    entry.update(getattr(record, "fields", {}))
+    if record.exc_info:
+      entry["exc"] = self.formatException(record.exc_info)
+    return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class _TextFormatter(logging.Formatter):
+  def format(self, record: logging.LogRecord) -> str:
+    fields = " ".join(f"{k}={v}" for k, v in getattr(record, "fields", {}).items())
+    line = f"[{record.name.removeprefix('app.')}] {record.getMessage()}" + (f" {fields}" if fields else "")
+    if record.exc_info:
+      line += "\n" + self.formatException(record.exc_info)
+    return line
+
+
+class Logger:
+  """Thin wrapper over ``logging`` that takes structured fields as keyword arguments.
+
+  Fields are only serialized if the record is emitted, so a debug payload dump costs a
+  level check when DEBUG is off.
+  """
+
+  def __init__(self, name: str) -> None:
+    self._logger = logging.getLogger(f"app.{name}")
+
+  def _log(self, level: int, msg: str, fields: Dict[str, Any], exc_info: bool = False) -> None:
+    if self._logger.isEnabledFor(level):
+      self._logger.log(level, msg, exc_info=exc_info, extra={"fields": fields, "trace_id": _trace_id.get()})
+
+  def debug(self, msg: str, **fields: Any) -> None:
+    self._log(logging.DEBUG, msg, fields)
+
+  def info(self, msg: str, **fields: Any) -> None:
+    self._log(logging.INFO, msg, fields)
+
+  def warning(self, msg: str, **fields: Any) -> None:
+    self._log(logging.WARNING, msg, fields)
+
+  def error(self, msg: str, **fields: Any) -> None:
+    self._log(logging.ERROR, msg, fields)
+
+  def exception(self, msg: str, **fields: Any) -> None:
+    self._log(logging.ERROR, msg, fields, exc_info=True)
+
+
+def get_logger(name: str) -> Logger:
+  return Logger(name)
+
+
+def _configure() -> None:
+  root = logging.getLogger("app")
+  if root.handlers:
+    return
+  handler = logging.StreamHandler(sys.stdout)
+  handler.setFormatter(_TextFormatter() if LOG_FORMAT == "text" else _JsonFormatter())
+  root.addHandler(handler)
+  root.setLevel(LOG_LEVEL)
+  root.propagate = False
+  logging.getLogger("app.trace").setLevel(TRACE_LOG_LEVEL)
+
+
+_configure()
+_span_log = get_logger("trace")
+
+
+@contextmanager
+def trace(trace_id: Optional[str] = None) -> Iterator[str]:
+  """Tag every log line and span inside the block with ``trace_id`` (default: a new id)."""
+  token = _trace_id.set(trace_id or uuid.uuid4().hex[:16])
+  try:
+    yield _trace_id.get()
+  finally:
+    _trace_id.reset(token)
+
+
+@contextmanager
+def span(name: str, **fields: Any) -> Iterator[Dict[str, Any]]:
+  """Time a block: observed into the ``name`` histogram and logged as one structured line.
+
+  Yields ``fields`` so the block can attach results (e.g. a page count) to the log line.
+  Works across ``await``: the current span lives in a context variable, so nested spans
+  record their parent.
+  """
+  parent = _span.get()
+  token = _span.set(name)
+  started = time.perf_counter()
+  error = None
+  try:
+    yield fields
+  except BaseException as e:
+    error = type(e).__name__
+    raise
+  finally:
+    duration = time.perf_counter() - started
+    _span.reset(token)
+    metrics.observe(name, duration)
+    _span_log.info("span", span=name, parent=parent, duration_ms=round(duration * 1000, 3), error=error, **fields)
+
+
+class TraceMiddleware:
+  """ASGI middleware giving each HTTP request its own trace id (``X-Request-ID`` if sent).
+
+  Plain ASGI rather than BaseHTTPMiddleware, so streamed responses pass through untouched.
+  """
+
+  def __init__(self, app: Any) -> None:
+    self.app = app
+
+  async def __call__(self, scope: Dict[str, Any], receive: Any, send: Any) -> None:
+    if scope["type"] != "http":
+      await self.app(scope, receive, send)
+      return
+    request_id = dict(scope["headers"]).get(b"x-request-id")
+    with trace(request_id.decode("latin-1")[:64] if request_id else None):
+      await self.app(scope, receive, send)
@@ -0,0 +1,285 @@
+import datetime as dt
+import sqlite3
+from dataclasses import dataclass
+from typing import Any, Dict, Optional, Sequence
+
+import numpy as np
+
+from . import db, rate_store
+
+
+METALS = ("gold", "silver", "platinum")
+METAL_NONE = -1
+METAL_GOLD = 0
+METAL_SILVER = 1
+METAL_PLATINUM = 2
+
+# Metal classification and diamond stone value are resolved in SQL so the Python side
+# only ever sees flat columns. Rules mirror the dashboard's per-item valuation:
+# bullion and loose metal items are detected from metadata.metal, then the name.
+_HOLDINGS_SQL = """
+WITH h AS (
+  SELECT
+    rowid AS rid,
+    id,
+    category,
+    vendor,
+    date,
+    total_amount,
+    purity_karat,
+    LOWER(COALESCE(name, '')) AS name_lc,
+    CASE WHEN json_valid(metadata) AND json_type(metadata, '$.netMetalWeight') IN ('integer', 'real') THEN json_extract(metadata, '$.netMetalWeight') END AS meta_weight,
+    CASE WHEN json_valid(metadata) THEN LOWER(COALESCE(json_extract(metadata, '$.metal'), '')) ELSE '' END AS meta_metal,
+    CASE WHEN json_valid(metadata) AND json_type(metadata, '$.stoneCost') IN ('integer', 'real') THEN json_extract(metadata, '$.stoneCost') END AS stone_cost,
+    CASE WHEN json_valid(metadata) AND json_type(metadata, '$.grossPrice') IN ('integer', 'real') THEN json_extract(metadata, '$.grossPrice') END AS gross_price,
+    CASE WHEN json_valid(metadata) AND json_type(metadata, '$.goldRatePerGram') IN ('integer', 'real') THEN json_extract(metadata, '$.goldRatePerGram') END AS bill_gold_rate,
+    weight_grams
+  FROM investments
+  {where}
+)
+SELECT
+  id,
+  COALESCE(category, ''),
+  COALESCE(vendor, ''),
+  date,
+  COALESCE(total_amount, 0),
+  COALESCE(weight_grams, meta_weight),
+  purity_karat,
+  CASE
+    WHEN category = 'gold_jewellery' THEN 0
+    WHEN category = 'bullion' THEN
+      CASE
+        WHEN meta_metal LIKE '%silver%' THEN 1
+        WHEN meta_metal LIKE '%platinum%' THEN 2
+        WHEN meta_metal LIKE '%gold%' THEN 0
+        WHEN name_lc LIKE '%silver%' THEN 1
+        WHEN name_lc LIKE '%platinum%' THEN 2
+        ELSE 0
+      END
+    WHEN category = 'silver' OR meta_metal = 'silver' OR name_lc LIKE '%silver%' THEN 1
+    WHEN category = 'platinum' OR meta_metal = 'platinum' OR name_lc LIKE '%platinum%' THEN 2
+    WHEN category = 'diamond_jewellery' THEN 0
+    ELSE -1
+  END,
+  CASE
+    WHEN category <> 'diamond_jewellery' THEN 0
+    WHEN stone_cost > 0 THEN stone_cost
+    WHEN gross_price IS NOT NULL AND meta_weight IS NOT NULL AND bill_gold_rate IS NOT NULL
+      THEN MAX(0, gross_price - meta_weight * bill_gold_rate)
+    ELSE 0
+  END
+FROM h
+ORDER BY rid DESC
+"""
+
+
+@dataclass
+class Holdings:
+  """Columnar snapshot of the investments table."""
+
+  ids: np.ndarray  # object
+  category: np.ndarray  # object
+  vendor: np.ndarray  # object
+  date: np.ndarray  # object (ISO string or None)
+  total_amount: np.ndarray  # float64
+  weight_grams: np.ndarray  # float64, NaN when unknown
+  purity_karat: np.ndarray  # float64, NaN when unknown
+  metal: np.ndarray  # int8, METAL_* codes
+  stone_value: np.ndarray  # float64, non-zero only for diamond jewellery
+
+  def __len__(self) -> int:
+    return len(self.ids)
+
+
+def _float_column(values, default: float = np.nan) -> np.ndarray:
+  return np.fromiter((default if v is None else v for v in values), dtype=np.float64, count=len(values))
+
+
+def load_holdings(conn: Optional[sqlite3.Connection] = None, ids: Optional[Sequence[str]] = None) -> Holdings:
+  """Load holdings (all, or only ``ids``) into columnar NumPy arrays with a single query."""
+  if conn is None:
+    with db.connection() as pooled:
+      return load_holdings(pooled, ids)
+
+  if ids is None:
+    rows = conn.execute(_HOLDINGS_SQL.format(where="")).fetchall()
+  else:
+    ids = list(ids)
+    if not ids:
+      rows = []
+    else:
+      placeholders = ", ".join("?" for _ in ids)
+      rows = conn.execute(_HOLDINGS_SQL.format(where=f"WHERE id IN ({placeholders})"), ids).fetchall()
+  if not rows:
+    empty_obj = np.empty(0, dtype=object)
+    empty_f = np.empty(0, dtype=np.float64)
+    return Holdings(empty_obj, empty_obj, empty_obj, empty_obj, empty_f, empty_f, empty_f, np.empty(0, dtype=np.int8), empty_f)
+
+  ids, category, vendor, date, total, weight, purity, metal, stone = zip(*rows)
+  return Holdings(
+    ids=np.array(ids, dtype=object),
+    category=np.array(category, dtype=object),
+    vendor=np.array(vendor, dtype=object),
+    date=np.array(date, dtype=object),
+    total_amount=_float_column(total, 0.0),
+    weight_grams=_float_column(weight),
+    purity_karat=_float_column(purity),
+    metal=np.array(metal, dtype=np.int8),
+    stone_value=_float_column(stone, 0.0),
+  )
+
+
+def as_rate(value: Any) -> float:
+  """Stored rate as a float; missing, invalid or non-positive rates become NaN."""
+  try:
+    v = float(value)
+  except (TypeError, ValueError):
+    return np.nan
+  return v if v > 0 else np.nan
+
+
+def gold_rate_table(gold_rates: Optional[Dict[str, Any]]) -> np.ndarray:
+  """INR/gram indexed by karat (0..24) from a day's ``{"22K": rate, ...}``. Karats without
+  a stored rate scale from 24K."""
+  table = np.full(25, np.nan)
+  if not gold_rates:
+    return table
+  r24 = as_rate(gold_rates.get("24K"))
+  table[:] = r24 * np.arange(25) / 24.0
+  for purity, value in gold_rates.items():
+    stored = as_rate(value)
+    if not np.isnan(stored):
+      table[rate_store.karat_of(purity)] = stored
+  return table
+
+
+@dataclass
+class RateSnapshot:
+  gold_by_karat: np.ndarray
+  silver: float
+  platinum: float
+  as_of: Dict[str, Optional[str]]
+
+
+def latest_rate_snapshot() -> RateSnapshot:
+  latest = rate_store.latest_rates()
+  rates = {metal: (day or {}).get("inr_per_gram", {}) for metal, day in latest.items()}
+  return RateSnapshot(
+    gold_by_karat=gold_rate_table(rates["gold"]),
+    silver=as_rate(rates["silver"].get(rate_store.BASE_PURITY["silver"])),
+    platinum=as_rate(rates["platinum"].get(rate_store.BASE_PURITY["platinum"])),
+    as_of={metal: (latest.get(metal) or {}).get("date") for metal in METALS},
+  )
+
+
+def holding_rates(holdings: Holdings, gold_by_karat: np.ndarray, silver, platinum) -> np.ndarray:
+  """Per-holding INR/gram for each holding's metal and purity.
+
+  With a single snapshot (``gold_by_karat`` shaped (25,), scalar silver/platinum) this
+  returns shape (N,). With D snapshots (``gold_by_karat`` shaped (D, 25), silver and
+  platinum shaped (D,)) it returns (N, D).
+  """
+  karat = np.nan_to_num(holdings.purity_karat, nan=24.0).clip(0, 24).astype(np.intp)
+  metal = holdings.metal
+  gold = gold_by_karat[..., karat]
+  if gold.ndim == 2:
+    gold = gold.T
+    metal = metal[:, None]
+    silver = np.asarray(silver)[None, :]
+    platinum = np.asarray(platinum)[None, :]
+  rate = np.where(metal == METAL_GOLD, gold, np.nan)
+  rate = np.where(metal == METAL_SILVER, silver, rate)
+  rate = np.where(metal == METAL_PLATINUM, platinum, rate)
+  return rate
+
+
+def mark_with_rates(holdings: Holdings, rate: np.ndarray) -> Dict[str, np.ndarray]:
+  """Vectorized market value given per-holding rates shaped (N,) or (N, D).
+
+  Holdings without a usable metal rate or weight are carried at cost, except diamond
+  jewellery, which still contributes its stone value when a gold rate is known.
+  """
+  extra = (slice(None),) + (None,) * (rate.ndim - 1)
+  weight = holdings.weight_grams[extra]
+  stone = holdings.stone_value[extra]
+  cost = holdings.total_amount[extra]
+  priced = np.isfinite(rate) & np.isfinite(weight) & (weight > 0)
+  metal_value = np.where(priced, weight * np.nan_to_num(rate), 0.0)
+  marked = priced | ((stone > 0) & np.isfinite(rate))
+  market_value = np.where(marked, metal_value + stone, cost)
+  return {
+    "rate": rate,
+    "priced": marked,
+    "market_value": market_value,
+    "gain": market_value - cost,
+  }
+
+
+def mark_to_market(holdings: Holdings, rates: RateSnapshot) -> Dict[str, np.ndarray]:
+  """Vectorized market value for every holding against one rate snapshot."""
+  rate = holding_rates(holdings, rates.gold_by_karat, rates.silver, rates.platinum)
+  return mark_with_rates(holdings, rate)
+
+
+def holding_dates(holdings: Holdings) -> np.ndarray:
+  """Purchase dates as datetime64[D]; missing or unparseable dates become NaT."""
+  try:
+    return np.array(holdings.date, dtype="datetime64[D]")
+  except ValueError:
+    parsed = []
+    for v in holdings.date:
+      try:
+        parsed.append(np.datetime64(dt.date.fromisoformat(v), "D") if v else np.datetime64("NaT"))
+      except (TypeError, ValueError):
+        parsed.append(np.datetime64("NaT"))
+    return np.array(parsed, dtype="datetime64[D]")
+
+
+def _summary(invested: float, market_value: float, count: int, priced: int) -> Dict[str, Any]:
+  gain = market_value - invested
+  return {
+    "holdings": count,
+    "priced_holdings": priced,
+    "invested": round(invested, 2),
+    "market_value": round(market_value, 2),
+    "gain": round(gain, 2),
+    "gain_pct": round(gain / invested * 100, 4) if invested else None,
+  }
+
+
+def compute_valuation(include_holdings: bool = False) -> Dict[str, Any]:
+  holdings = load_holdings()
+  rates = latest_rate_snapshot()
+  marked = mark_to_market(holdings, rates)
+
+  total_invested = float(holdings.total_amount.sum())
+  total_market = float(marked["market_value"].sum())
+
+  by_category = []
+  if len(holdings):
+    names, codes = np.unique(holdings.category.astype(str), return_inverse=True)
+    n = len(names)
+    counts = np.bincount(codes, minlength=n)
+    priced = np.bincount(codes, weights=marked["priced"], minlength=n)
+    invested = np.bincount(codes, weights=holdings.total_amount, minlength=n)
+    market = np.bincount(codes, weights=marked["market_value"], minlength=n)
+    for i, name in enumerate(names):
+      item = {"category": name or None, **_summary(float(invested[i]), float(market[i]), int(counts[i]), int(priced[i]))}
+      item["allocation_pct"] = round(float(market[i]) / total_market * 100, 4) if total_market else None
+      by_category.append(item)
+    by_category.sort(key=lambda c: c["market_value"], reverse=True)
+
+  result: Dict[str, Any] = {
+    "as_of": rates.as_of,
+    "totals": _summary(total_invested, total_market, len(holdings), int(marked["priced"].sum())),
+    "by_category": by_category,
+  }
+  if include_holdings:
+    mv = np.round(marked["market_value"], 2).tolist()
+    gain = np.round(marked["gain"], 2).tolist()
+    priced_flags = marked["priced"].tolist()
+    result["holdings"] = [
+      {"id": hid, "market_value": mv[i], "gain": gain[i], "priced": priced_flags[i]}
+      for i, hid in enumerate(holdings.ids.tolist())
+    ]
+  return result
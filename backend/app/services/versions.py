@@ -0,0 +1,107 @@
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+from . import db
+
+
+# How long a snapshot of data_versions is reused. Writes committed by this process expire
+# it at once, so this only bounds how late a write from another process (the backfill
+# CLI, a second worker, a manual sqlite edit) is noticed.
+DATA_VERSION_CHECK_S = float(os.getenv("DATA_VERSION_CHECK_S", "1"))
+
+# (version, last modified epoch seconds); resources never written since the table was
+# added read as UNWRITTEN.
+Version = Tuple[int, float]
+UNWRITTEN: Version = (0, 0.0)
+
+_lock = threading.Lock()
+_snapshot: Dict[str, Version] = {}
+_read_at: Optional[float] = None
+_generation = 0
+
+
+def init_table() -> None:
+  with db.connection() as conn:
+    conn.execute(
+      """
+      CREATE TABLE IF NOT EXISTS data_versions (
+        resource TEXT PRIMARY KEY,
+        version INTEGER NOT NULL,
+        updated_at REAL NOT NULL
+      ) WITHOUT ROWID
+      """
+    )
+    conn.commit()
+
+
+def track(conn: sqlite3.Connection, table: str, resource: str) -> None:
+  """Create triggers bumping a data_versions row on every insert, update and delete of
+  ``table``, in the writer's own transaction.
+
+  ``resource`` is a SQL expression naming the row to bump, with ``{row}`` standing for the
+  changed row (e.g. ``"'rates.' || {row}.metal"``). Being triggers, they also catch writes
+  that bypass the stores: other processes, migrations, manual edits.
+  """
+  for event, row in (("INSERT", "NEW"), ("UPDATE", "NEW"), ("DELETE", "OLD")):
+    conn.execute(
+      f"""
+      CREATE TRIGGER IF NOT EXISTS {table}_version_{event.lower()} AFTER {event} ON {table}
+      BEGIN
+        INSERT INTO data_versions (resource, version, updated_at)
+        VALUES ({resource.format(row=row)}, 1, (julianday('now') - 2440587.5) * 86400.0)
+        ON CONFLICT(resource) DO UPDATE SET version = version + 1, updated_at = excluded.updated_at;
+      END
+      """
+    )
+
+
+def read(conn: sqlite3.Connection, resource: str) -> Version:
+  """One resource's version straight from the database, e.g. inside a write transaction."""
+  row = conn.execute("SELECT version, updated_at FROM data_versions WHERE resource = ?", (resource,)).fetchone()
+  return (row["version"], row["updated_at"]) if row else UNWRITTEN
+
+
+def read_all(conn: sqlite3.Connection, prefix: str = "") -> Dict[str, Version]:
+  """Every resource's version (those starting with ``prefix``) straight from the database."""
+  rows = conn.execute("SELECT resource, version, updated_at FROM data_versions WHERE resource LIKE ?", (prefix + "%",))
+  return {r["resource"]: (r["version"], r["updated_at"]) for r in rows}
+
+
+def peek() -> Optional[Dict[str, Version]]:
+  """The current snapshot if it is still fresh, else None (non-blocking)."""
+  with _lock:
+    if _read_at is not None and time.monotonic() - _read_at < DATA_VERSION_CHECK_S:
+      return _snapshot
+  return None
+
+
+def current() -> Dict[str, Version]:
+  """``{resource: (version, updated_at)}``, re-read from the database at most every
+  DATA_VERSION_CHECK_S (blocking when it re-reads)."""
+  global _snapshot, _read_at
+  snapshot = peek()
+  if snapshot is not None:
+    return snapshot
+  with _lock:
+    generation = _generation
+  with db.connection() as conn:
+    snapshot = read_all(conn)
+  with _lock:
+    # A write expired the snapshot while this read was in flight: keep it uncached.
+    if generation == _generation:
+      _snapshot, _read_at = snapshot, time.monotonic()
+  return snapshot
+
+
+def expire() -> None:
+  """Make the next ``current()`` re-read; call after committing a write."""
+  global _read_at, _generation
+  with _lock:
+    _read_at = None
+    _generation += 1
+
+
+init_table()
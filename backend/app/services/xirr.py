@@ -0,0 +1,212 @@
+import datetime as dt
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from . import valuation
+
+
+DAYS_PER_YEAR = 365.0
+RATE_FLOOR = -0.999999
+GROUP_BY_FIELDS = ("category", "vendor", "purity")
+
+
+def _npv_and_derivative(rate: np.ndarray, amounts: np.ndarray, years: np.ndarray):
+  base = (1.0 + rate)[:, None]
+  disc = base ** (-years)
+  npv = (amounts * disc).sum(axis=1)
+  dnpv = (-years * amounts * disc / base).sum(axis=1)
+  return npv, dnpv
+
+
+def _npv(rate: np.ndarray, amounts: np.ndarray, years: np.ndarray) -> np.ndarray:
+  return (amounts * (1.0 + rate)[:, None] ** (-years)).sum(axis=1)
+
+
+def xirr_batch(
+  amounts: np.ndarray,
+  years: np.ndarray,
+  guess: float = 0.1,
+  tol: float = 1e-7,
+  max_newton: int = 50,
+  max_bisect: int = 200,
+) -> np.ndarray:
+  """Solve XIRR for many cash-flow series at once.
+
+  ``amounts`` and ``years`` are (series × flows) arrays; padding slots must have amount 0.
+  ``years`` is measured from any common origin. Every series is solved with a vectorized
+  Newton–Raphson; series that fail to converge fall back to vectorized bisection over a
+  bracket. Returns NaN where no root exists (e.g. all flows of one sign).
+  """
+  amounts = np.asarray(amounts, dtype=np.float64)
+  years = np.asarray(years, dtype=np.float64)
+  n = amounts.shape[0]
+  result = np.full(n, np.nan)
+  if n == 0:
+    return result
+
+  # Rebase each series to its first flow so (1 + r) ** -t stays well-conditioned.
+  active = amounts != 0
+  first = np.where(active, years, np.inf).min(axis=1)
+  first = np.where(np.isfinite(first), first, 0.0)
+  years = np.where(active, years - first[:, None], 0.0)
+
+  has_pos = (amounts > 0).any(axis=1)
+  has_neg = (amounts < 0).any(axis=1)
+  solvable = has_pos & has_neg & (years.max(axis=1) > 0)
+  if not solvable.any():
+    return result
+
+  idx = np.flatnonzero(solvable)
+  a = amounts[idx]
+  t = years[idx]
+  scale = np.abs(a).max(axis=1, keepdims=True)
+  a = a / scale
+
+  # Newton–Raphson on every series simultaneously.
+  rate = np.full(len(idx), guess)
+  converged = np.zeros(len(idx), dtype=bool)
+  with np.errstate(all="ignore"):
+    for _ in range(max_newton):
+      pending = ~converged
+      if not pending.any():
+        break
+      npv, dnpv = _npv_and_derivative(rate[pending], a[pending], t[pending])
+      step = npv / dnpv
+      new_rate = rate[pending] - step
+      bad = ~np.isfinite(new_rate) | (new_rate <= RATE_FLOOR)
+      new_rate = np.where(bad, np.nan, new_rate)
+      done = np.abs(step) < tol * np.maximum(1.0, np.abs(new_rate))
+      rate[pending] = new_rate
+      sub_converged = done & ~bad
+      converged[np.flatnonzero(pending)[sub_converged]] = True
+      # Series that went non-finite stop iterating and go to the bisection fallback.
+      failed = np.flatnonzero(pending)[bad]
+      converged[failed] = True
+      rate[failed] = np.nan
+
+    ok = np.isfinite(rate)
+    if ok.any():
+      residual = np.abs(_npv(rate[ok], a[ok], t[ok]))
+      bad_root = np.flatnonzero(ok)[residual > 1e-6]
+      rate[bad_root] = np.nan
+
+    # Bracketed bisection for whatever Newton could not solve.
+    todo = np.flatnonzero(~np.isfinite(rate))
+    if len(todo):
+      lo = np.full(len(todo), RATE_FLOOR)
+      hi = np.full(len(todo), 1.0)
+      f_lo = _npv(lo, a[todo], t[todo])
+      f_hi = _npv(hi, a[todo], t[todo])
+      for _ in range(12):
+        need = np.sign(f_lo) == np.sign(f_hi)
+        if not need.any():
+          break
+        hi = np.where(need, hi * 10.0, hi)
+        f_hi = np.where(need, _npv(hi, a[todo], t[todo]), f_hi)
+      bracketed = np.sign(f_lo) != np.sign(f_hi)
+      for _ in range(max_bisect):
+        mid = (lo + hi) / 2.0
+        f_mid = _npv(mid, a[todo], t[todo])
+        left = np.sign(f_mid) == np.sign(f_lo)
+        lo = np.where(left, mid, lo)
+        f_lo = np.where(left, f_mid, f_lo)
+        hi = np.where(left, hi, mid)
+        if np.all((hi - lo) < tol * np.maximum(1.0, np.abs(lo))):
+          break
+      rate[todo] = np.where(bracketed, (lo + hi) / 2.0, np.nan)
+
+  result[idx] = rate
+  return result
+
+
+def _pad_flows(group_codes: np.ndarray, amounts: np.ndarray, years: np.ndarray, n_groups: int):
+  """Scatter flat (group, amount, year) flows into zero-padded (groups × max_flows) arrays."""
+  order = np.argsort(group_codes, kind="stable")
+  codes = group_codes[order]
+  counts = np.bincount(codes, minlength=n_groups)
+  starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+  slot = np.arange(len(codes)) - starts[codes]
+  width = int(counts.max()) if len(counts) else 0
+  padded_amounts = np.zeros((n_groups, max(width, 1)))
+  padded_years = np.zeros((n_groups, max(width, 1)))
+  padded_amounts[codes, slot] = amounts[order]
+  padded_years[codes, slot] = years[order]
+  return padded_amounts, padded_years
+
+
+def _group_keys(holdings: valuation.Holdings, group_by: str) -> np.ndarray:
+  if group_by == "category":
+    return holdings.category.astype(str)
+  if group_by == "vendor":
+    return holdings.vendor.astype(str)
+  if group_by == "purity":
+    return np.array(["" if np.isnan(p) else str(int(p)) for p in holdings.purity_karat], dtype=object).astype(str)
+  raise ValueError(f"Unsupported group_by '{group_by}', expected one of {', '.join(GROUP_BY_FIELDS)}")
+
+
+def _round_rate(value: float) -> Optional[float]:
+  return round(float(value), 6) if np.isfinite(value) else None
+
+
+def compute_xirr(group_by: Optional[str] = None, include_holdings: bool = False, as_of: Optional[dt.date] = None) -> Dict[str, Any]:
+  """XIRR per group (and optionally per holding) plus the whole portfolio.
+
+  Each holding is an outflow of ``total_amount`` on its purchase date; the terminal inflow
+  is the holding's current market value (see ``valuation.mark_to_market``) on ``as_of``.
+  Holdings without a parseable date are excluded.
+  """
+  as_of = as_of or dt.date.today()
+  holdings = valuation.load_holdings()
+  marked = valuation.mark_to_market(holdings, valuation.latest_rate_snapshot())
+
+  dates = valuation.holding_dates(holdings)
+  dated = ~np.isnat(dates) & (holdings.total_amount > 0)
+  day0 = np.datetime64(as_of, "D")
+  years = (dates[dated] - day0).astype(np.float64) / DAYS_PER_YEAR
+  cost = holdings.total_amount[dated]
+  value = marked["market_value"][dated]
+  n = int(dated.sum())
+
+  def solve(codes: np.ndarray, n_groups: int) -> np.ndarray:
+    # Each group: one outflow per holding plus a single terminal inflow at t=0.
+    terminal = np.bincount(codes, weights=value, minlength=n_groups)
+    flow_codes = np.concatenate((codes, np.arange(n_groups)))
+    flow_amounts = np.concatenate((-cost, terminal))
+    flow_years = np.concatenate((years, np.zeros(n_groups)))
+    padded_a, padded_t = _pad_flows(flow_codes, flow_amounts, flow_years, n_groups)
+    return xirr_batch(padded_a, padded_t)
+
+  result: Dict[str, Any] = {"as_of": as_of.isoformat(), "group_by": group_by}
+  portfolio_rate = solve(np.zeros(n, dtype=np.intp), 1)[0] if n else np.nan
+  result["portfolio"] = {
+    "xirr": _round_rate(portfolio_rate),
+    "holdings": n,
+    "invested": round(float(cost.sum()), 2),
+    "market_value": round(float(value.sum()), 2),
+  }
+
+  if group_by:
+    keys = _group_keys(holdings, group_by)[dated]
+    names, codes = np.unique(keys, return_inverse=True)
+    rates = solve(codes, len(names)) if n else np.empty(0)
+    invested = np.bincount(codes, weights=cost, minlength=len(names))
+    market = np.bincount(codes, weights=value, minlength=len(names))
+    counts = np.bincount(codes, minlength=len(names))
+    groups: List[Dict[str, Any]] = []
+    for i, name in enumerate(names):
+      groups.append({
+        "key": name or None,
+        "xirr": _round_rate(rates[i]),
+        "holdings": int(counts[i]),
+        "invested": round(float(invested[i]), 2),
+        "market_value": round(float(market[i]), 2),
+      })
+    result["groups"] = groups
+
+  if include_holdings:
+    rates = xirr_batch(np.stack((-cost, value), axis=1), np.stack((years, np.zeros(n)), axis=1)) if n else np.empty(0)
+    ids = holdings.ids[dated].tolist()
+    result["holdings"] = [{"id": hid, "xirr": _round_rate(rates[i])} for i, hid in enumerate(ids)]
+
+  return result
@@ -0,0 +1,71 @@
+"""Shared helpers for the benchmark scripts.
+
+Benchmarks run from the ``backend`` directory, e.g. ``python -m benchmarks.bench_event_loop``.
+Each script points ``INVESTMENTS_DB_PATH`` at a throwaway database before importing the app,
+and starts it from ``main()`` under an ``if __name__ == "__main__":`` guard: the PDF render
+pool spawns workers that re-import ``__main__``.
+"""
+import os
+import socket
+import sys
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from typing import Iterator, Sequence
+
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+
+def use_temp_db(prefix: str = "bench") -> str:
+  """Point the app at a fresh SQLite file. Must run before any ``app`` import.
+
+  Also keeps the app's logs to warnings unless LOG_LEVEL is set, so they do not bury the
+  results (or slow the run down).
+  """
+  tmp_dir = tempfile.mkdtemp(prefix=f"{prefix}-")
+  path = os.path.join(tmp_dir, "investments.db")
+  os.environ["INVESTMENTS_DB_PATH"] = path
+  os.environ.setdefault("LOG_LEVEL", "WARNING")
+  if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+  return path
+
+
+def percentile(values: Sequence[float], pct: float) -> float:
+  if not values:
+    return float("nan")
+  ordered = sorted(values)
+  idx = min(len(ordered) - 1, max(0, int(round(pct / 100.0 * (len(ordered) - 1)))))
+  return ordered[idx]
+
+
+def fmt_ms(seconds: float) -> str:
+  return f"{seconds * 1000:8.2f} ms"
+
+
+@contextmanager
+def serve_app(app, host: str = "127.0.0.1") -> Iterator[str]:
+  """Run ``app`` under uvicorn in a background thread and yield its base URL.
+
+  Unlike httpx's in-process ASGI transport, a real server streams responses, so
+  time-to-first-byte is measurable.
+  """
+  import uvicorn
+
+  with socket.socket() as s:
+    s.bind((host, 0))
+    port = s.getsockname()[1]
+  server = uvicorn.Server(uvicorn.Config(app, host=host, port=port, log_level="warning"))
+  thread = threading.Thread(target=server.run, daemon=True)
+  thread.start()
+  while not server.started:
+    if not thread.is_alive():
+      raise RuntimeError("uvicorn failed to start")
+    time.sleep(0.01)
+  try:
+    yield f"http://{host}:{port}"
+  finally:
+    server.should_exit = True
+    thread.join(timeout=10)
@@ -0,0 +1,89 @@
+"""Throughput of POST /bills/batch against a local OpenAI stub.
+
+Uploads the same number of distinct bills at several batch concurrency levels and
+reports files/sec. With a stub latency of L seconds, ideal throughput is concurrency / L
+until the global OPENAI_MAX_CONCURRENCY cap (raised here to the highest level) kicks in.
+
+  python -m benchmarks.bench_batch_upload --files 64 --latency 0.5 --levels 1,4,8,16
+"""
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import time
+
+from ._common import serve_app, use_temp_db
+from .openai_stub import StubServer
+
+
+def _fake_png(level: int, i: int) -> bytes:
+  # Distinct bytes per file and run so neither the bill dedupe nor the extraction cache hits.
+  return b"\x89PNG\r\n\x1a\n" + f"bench-{level}-{i}-{time.time_ns()}".encode()
+
+
+async def _run_level(client, level: int, n_files: int) -> dict:
+  files = [("files", (f"bill-{level}-{i}.png", _fake_png(level, i), "image/png")) for i in range(n_files)]
+  started = time.perf_counter()
+  first_line_s = None
+  ok = 0
+  async with client.stream("POST", "/bills/batch", files=files, data={"concurrency": str(level)}) as r:
+    r.raise_for_status()
+    async for line in r.aiter_lines():
+      if not line:
+        continue
+      item = json.loads(line)
+      if "summary" in item:
+        continue
+      if first_line_s is None:
+        first_line_s = time.perf_counter() - started
+      ok += item["status"] == "ok"
+  elapsed = time.perf_counter() - started
+  return {
+    "elapsed": elapsed,
+    "ok": ok,
+    "first_line_s": first_line_s,
+  }
+
+
+async def _main(args) -> None:
+  import httpx
+  from app.main import app
+
+  levels = [int(x) for x in args.levels.split(",")]
+  with serve_app(app) as base_url:
+    async with httpx.AsyncClient(base_url=base_url, timeout=None) as client:
+      print(f"{args.files} files per level, stub latency {args.latency * 1000:.0f} ms")
+      print(f"{'concurrency':>11} {'elapsed':>9} {'files/s':>9} {'first result':>13} {'peak upstream':>14} {'ok':>5}")
+      for level in levels:
+        args.stub.reset()
+        res = await _run_level(client, level, args.files)
+        print(
+          f"{level:>11} {res['elapsed']:>8.2f}s {args.files / res['elapsed']:>9.2f} "
+          f"{res['first_line_s'] * 1000:>10.0f} ms {args.stub.peak_in_flight:>14} {res['ok']:>5}"
+        )
+
+
+def main() -> None:
+  parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+  parser.add_argument("--files", type=int, default=32)
+  parser.add_argument("--latency", type=float, default=0.5, help="stub seconds per completion")
+  parser.add_argument("--levels", default="1,2,4,8,16")
+  args = parser.parse_args()
+
+  args.stub = StubServer(args.latency).start()
+  use_temp_db("bench-batch")
+  os.environ["BILL_FILES_DIR"] = tempfile.mkdtemp(prefix="bench-batch-files-")
+  os.environ["OPENAI_BASE_URL"] = args.stub.base_url
+  os.environ.setdefault("OPENAI_API_KEY", "stub")
+  top = str(max(int(x) for x in args.levels.split(",")))
+  os.environ["OPENAI_MAX_CONCURRENCY"] = top
+  os.environ["BILLS_BATCH_MAX_CONCURRENCY"] = top
+  try:
+    asyncio.run(_main(args))
+  finally:
+    args.stub.stop()
+
+
+if __name__ == "__main__":
+  main()
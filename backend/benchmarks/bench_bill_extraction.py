@@ -0,0 +1,304 @@
+"""End-to-end POST /bills/upload load test against the local OpenAI stub.
+
+Replays a corpus of sample bills (images and PDFs) at the server with --concurrency
+uploads in flight and reports latency percentiles, throughput, and where the time went,
+from the server's stage histograms:
+
+  read         upload streamed to disk and hashed           (bills.read)
+  dedupe       duplicate lookup                             (bills.dedupe)
+  render       PDF pages rendered in the process pool       (pdf.render)
+  preprocess   image resize / re-encode                     (preprocess.duration)
+  queue        waiting for an OpenAI concurrency slot        (openai.queue_wait)
+  encode       base64 data URLs and the JSON request body    (openai.encode)
+  openai       the model call, retries included              (openai.call)
+  postprocess  JSON parse, cache write, stoneCost            (bills.postprocess)
+
+--corpus takes a directory of .jpg/.jpeg/.png/.webp/.pdf files; a file with "diamond" in
+its name is uploaded as a diamond bill, anything else as gold. Without it a synthetic
+corpus of gold and diamond bills (phone photo, screenshot, PDF) is generated. Each upload
+gets distinct trailing bytes, since the registry rejects duplicate bills. The stub and the
+client run in their own processes, so only the server shares this one.
+
+A final pass re-extracts every uploaded bill through POST /bills/{bill_id}/extract, which
+must be served from the extraction cache the uploads filled; the run fails if any is not.
+
+  python -m benchmarks.bench_bill_extraction --requests 60 --concurrency 8 --latency 1.0
+  python -m benchmarks.bench_bill_extraction --corpus ~/bills --error-rate 0.05
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import tempfile
+import time
+from collections import Counter
+from typing import List, Tuple
+
+from ._common import percentile, serve_app, use_temp_db
+from .openai_stub import stub_process
+
+
+STAGES = (
+  ("read", "bills.read"),
+  ("dedupe", "bills.dedupe"),
+  ("render", "pdf.render"),
+  ("preprocess", "preprocess.duration"),
+  ("queue", "openai.queue_wait"),
+  ("encode", "openai.encode"),
+  ("openai", "openai.call"),
+  ("postprocess", "bills.postprocess"),
+)
+
+CONTENT_TYPES = {
+  ".jpg": "image/jpeg",
+  ".jpeg": "image/jpeg",
+  ".png": "image/png",
+  ".webp": "image/webp",
+  ".pdf": "application/pdf",
+}
+
+
+def _diamond_page(width: int, height: int):
+  from PIL import Image, ImageDraw
+
+  page = Image.new("RGB", (width, height), (252, 252, 252))
+  draw = ImageDraw.Draw(page)
+  draw.text((width * 0.08, height * 0.04), "TAX INVOICE  Diamond ring 14KT", fill=(20, 20, 20))
+  rows = (
+    "NET STONE WEIGHT (Carats/Grams)  0.159  0.032",
+    "24KT/22KT/18KT/14KT/9KT: 14406/13205/10805/8428/5402",
+    "Gold (14KT)  2.410 g  8428.00",
+    "Making charges  1450.00 /g",
+    "Clarity SI1  Colour GH  Cut Round  Cert IGI",
+    "Gross  48530.00   Discount  2000.00",
+    "CGST 1.5%  728.00   SGST 1.5%  728.00",
+    "Net Invoice Value  47986.00",
+  )
+  for i, row in enumerate(rows):
+    y = height * 0.12 + i * height * 0.05
+    draw.text((width * 0.08, y), row, fill=(30, 30, 30))
+    draw.line((width * 0.08, y + 14, width * 0.92, y + 14), fill=(170, 170, 170))
+  return page
+
+
+def _diamond_photo() -> bytes:
+  import io
+
+  out = io.BytesIO()
+  _diamond_page(3024, 4032).save(out, format="JPEG", quality=90)
+  return out.getvalue()
+
+
+def _diamond_pdf() -> bytes:
+  import fitz
+
+  doc = fitz.open()
+  page = doc.new_page(width=595, height=842)
+  page.insert_text((40, 50), "TAX INVOICE  Diamond ring 14KT", fontsize=16)
+  page.insert_text((40, 90), "NET STONE WEIGHT (Carats/Grams)  0.159  0.032", fontsize=10)
+  page.insert_text((40, 110), "Gold (14KT)  2.410 g  8428.00   Net Invoice Value  47986.00", fontsize=10)
+  data = doc.tobytes()
+  doc.close()
+  return data
+
+
+def synthetic_corpus(directory: str) -> None:
+  from .bench_image_preprocess import phone_photo, screenshot, two_page_pdf
+
+  for name, make in (
+    ("gold_phone_photo.jpg", phone_photo),
+    ("gold_screenshot.png", screenshot),
+    ("gold_invoice.pdf", two_page_pdf),
+    ("diamond_phone_photo.jpg", _diamond_photo),
+    ("diamond_invoice.pdf", _diamond_pdf),
+  ):
+    with open(os.path.join(directory, name), "wb") as f:
+      f.write(make())
+
+
+def load_corpus(directory: str) -> List[Tuple[str, str, str]]:
+  """(path, content type, category) for every supported file in ``directory``."""
+  corpus = []
+  for name in sorted(os.listdir(directory)):
+    content_type = CONTENT_TYPES.get(os.path.splitext(name)[1].lower())
+    if content_type:
+      category = "diamond_jewellery" if "diamond" in name.lower() else "gold_jewellery"
+      corpus.append((os.path.join(directory, name), content_type, category))
+  return corpus
+
+
+def _replay(url: str, corpus: list, requests: int, concurrency: int, tag: str) -> Tuple[list, float, list]:
+  """Client process: ``requests`` uploads cycling through ``corpus``, ``concurrency`` at a time.
+
+  Returns ([(corpus name, status, seconds)], elapsed seconds, [(bill_id, category)] uploaded).
+  """
+  import httpx
+
+  contents = {path: open(path, "rb").read() for path, _, _ in corpus}
+
+  async def run() -> list:
+    queue: asyncio.Queue = asyncio.Queue()
+    for i in range(requests):
+      queue.put_nowait(i)
+    results = []
+    uploaded = []
+
+    async with httpx.AsyncClient(base_url=url, timeout=None) as client:
+      async def worker() -> None:
+        while not queue.empty():
+          i = queue.get_nowait()
+          path, content_type, category = corpus[i % len(corpus)]
+          name = os.path.basename(path)
+          # Trailing bytes keep every upload distinct and are ignored by image decoders;
+          # a PDF takes them as a comment.
+          data = contents[path] + (b"\n%" if content_type == "application/pdf" else b"") + f"{tag}-{i}".encode()
+          started = time.perf_counter()
+          r = await client.post(
+            "/bills/upload",
+            files={"file": (f"{tag}-{i}-{name}", data, content_type)},
+            data={"category": category, "force_refresh": "true"},
+          )
+          results.append((name, r.status_code, time.perf_counter() - started))
+          if r.status_code == 200:
+            uploaded.append((r.json()["bill_id"], category))
+
+      await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return results, uploaded
+
+  started = time.perf_counter()
+  results, uploaded = asyncio.run(run())
+  return results, time.perf_counter() - started, uploaded
+
+
+def _reextract(url: str, bills: list, concurrency: int) -> list:
+  """Client process: POST /bills/{bill_id}/extract for every (bill_id, category) in ``bills``.
+
+  Returns [(status, cached, seconds)].
+  """
+  import httpx
+
+  async def run() -> list:
+    queue: asyncio.Queue = asyncio.Queue()
+    for bill in bills:
+      queue.put_nowait(bill)
+    results = []
+
+    async with httpx.AsyncClient(base_url=url, timeout=None) as client:
+      async def worker() -> None:
+        while not queue.empty():
+          bill_id, category = queue.get_nowait()
+          started = time.perf_counter()
+          r = await client.post(f"/bills/{bill_id}/extract", params={"category": category})
+          cached = r.status_code == 200 and r.json()["cached"]
+          results.append((r.status_code, cached, time.perf_counter() - started))
+
+      await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return results
+
+  return asyncio.run(run())
+
+
+def _report(results: list, elapsed: float) -> None:
+  from app.services import metrics
+
+  ok = [s for _, status, s in results if status == 200]
+  failed = Counter(status for _, status, _ in results if status != 200)
+  print(f"\n{len(results)} requests, {len(ok)} ok, {sum(failed.values())} failed in {elapsed:.2f}s -> {len(results) / elapsed:.2f} req/s")
+  if failed:
+    print(f"failed statuses: {dict(sorted(failed.items()))}")
+  print(
+    f"latency  p50 {percentile(ok, 50) * 1000:.0f} ms  p95 {percentile(ok, 95) * 1000:.0f} ms  "
+    f"p99 {percentile(ok, 99) * 1000:.0f} ms  max {max(ok, default=float('nan')) * 1000:.0f} ms"
+  )
+
+  print(f"\n{'bill':>26} {'n':>4} {'p50':>9} {'p95':>9}")
+  for name in sorted({name for name, _, _ in results}):
+    own = [s for n, status, s in results if n == name and status == 200]
+    if own:
+      print(f"{name:>26} {len(own):>4} {percentile(own, 50) * 1000:>6.0f} ms {percentile(own, 95) * 1000:>6.0f} ms")
+
+  # Stage quantiles come from the server's bucketed histograms, so they are estimates.
+  snapshot = metrics.snapshot()
+  total_ms = sum(ok) * 1000
+  print(f"\n{'stage':>12} {'count':>6} {'mean':>10} {'p50':>10} {'p99':>10} {'share':>7}")
+  for label, name in STAGES:
+    h = snapshot["histograms"].get(name)
+    if not h or not h["count"]:
+      print(f"{label:>12} {0:>6}")
+      continue
+    share = h["mean_ms"] * h["count"] / total_ms if total_ms else 0.0
+    print(
+      f"{label:>12} {h['count']:>6} {h['mean_ms']:>7.1f} ms {h['p50_ms']:>7.1f} ms "
+      f"{h['p99_ms']:>7.1f} ms {share:>6.1%}"
+    )
+  retries = snapshot["counters"].get("upstream.openai.retries", 0)
+  print(f"\nOpenAI retries: {retries}; 'share' is stage time over summed request latency (stages overlap with queueing)")
+
+
+def _report_reextract(results: list) -> int:
+  """Print the re-extract pass and return how many bills missed the cache."""
+  hits = [s for status, cached, s in results if cached]
+  print(
+    f"\nre-extract: {len(hits)}/{len(results)} served from the extraction cache, "
+    f"p50 {percentile(hits, 50) * 1000:.1f} ms  p99 {percentile(hits, 99) * 1000:.1f} ms"
+  )
+  return len(results) - len(hits)
+
+
+def main() -> None:
+  parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+  parser.add_argument("--corpus", help="directory of sample bills (default: synthetic gold and diamond bills)")
+  parser.add_argument("--requests", type=int, default=40)
+  parser.add_argument("--concurrency", type=int, default=8)
+  parser.add_argument("--latency", type=float, default=1.0, help="stub seconds per completion")
+  parser.add_argument("--jitter", type=float, default=0.5, help="stub extra uniform random seconds")
+  parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of stub responses that fail")
+  parser.add_argument("--error-status", type=int, default=500)
+  parser.add_argument("--responses", help="JSON file of canned extractions for the stub")
+  parser.add_argument("--preset", default=None, help="IMAGE_PREPROCESS_PRESET (default: the app default)")
+  args = parser.parse_args()
+
+  corpus_dir = args.corpus
+  if corpus_dir is None:
+    corpus_dir = tempfile.mkdtemp(prefix="bench-bill-corpus-")
+    synthetic_corpus(corpus_dir)
+  corpus = load_corpus(corpus_dir)
+  if not corpus:
+    raise SystemExit(f"No bills found in {corpus_dir}")
+
+  stub_args = ["--jitter", str(args.jitter), "--error-rate", str(args.error_rate),
+               "--error-status", str(args.error_status), "--seed", "1"]
+  if args.responses:
+    stub_args += ["--responses", os.path.abspath(args.responses)]
+  with stub_process(args.latency, 0.0, *stub_args) as stub_url:
+    use_temp_db("bench-bill-extraction")
+    os.environ["BILL_FILES_DIR"] = tempfile.mkdtemp(prefix="bench-bill-extraction-files-")
+    os.environ["OPENAI_BASE_URL"] = stub_url
+    os.environ.setdefault("OPENAI_API_KEY", "stub")
+    if args.preset:
+      os.environ["IMAGE_PREPROCESS_PRESET"] = args.preset
+
+    from app.main import app
+    from app.services import image_preprocess, metrics, openai_client
+
+    print(
+      f"{len(corpus)} bill(s) from {corpus_dir}; stub latency {args.latency:g}s + up to {args.jitter:g}s, "
+      f"error rate {args.error_rate:g}; OPENAI_MAX_CONCURRENCY={openai_client.MAX_CONCURRENCY}, "
+      f"preset={image_preprocess.DEFAULT_PRESET}, {args.concurrency} in flight"
+    )
+    ctx = multiprocessing.get_context("spawn")
+    with serve_app(app) as base_url, ctx.Pool(1) as pool:
+      # One pass over the corpus warms the render pool and connections, then the
+      # histograms start from zero for the measured run.
+      pool.apply(_replay, (base_url, corpus, len(corpus), min(args.concurrency, len(corpus)), "warmup"))
+      metrics.reset()
+      results, elapsed, uploaded = pool.apply(_replay, (base_url, corpus, args.requests, args.concurrency, f"run{time.time_ns()}"))
+      # Reported before the re-extract pass adds its own renders to the histograms.
+      _report(results, elapsed)
+      reextracted = pool.apply(_reextract, (base_url, uploaded, args.concurrency))
+    if _report_reextract(reextracted):
+      raise SystemExit("re-extract: some stored bills were not served from the extraction cache")
+
+
+if __name__ == "__main__":
+  main()
@@ -0,0 +1,99 @@
+"""Measure /health/ latency while many /investments/ reads are in flight.
+
+Compares the executor-backed routes against a baseline where blocking calls run
+inline on the event loop (the previous behaviour).
+
+  python -m benchmarks.bench_event_loop --rows 1000 --readers 50
+"""
+import argparse
+import asyncio
+import time
+import uuid
+
+from ._common import fmt_ms, percentile, use_temp_db
+
+
+def _seed(rows: int) -> None:
+  from app.services import db, investment_store  # noqa: F401  (import creates the schema)
+
+  with db.connection() as conn:
+    conn.executemany(
+      """
+      INSERT INTO investments (id, bill_id, category, name, vendor, date, total_amount, weight_grams, purity_karat)
+      VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+      """,
+      (
+        (str(uuid.uuid4()), f"bill-{i}", "gold_jewellery", f"Item {i}", "GRT", "2025-01-01", 50000.0, 5.0, 22)
+        for i in range(rows)
+      ),
+    )
+    conn.commit()
+
+
+async def _run(readers: int, rounds: int) -> list:
+  import httpx
+  from app.main import app
+
+  transport = httpx.ASGITransport(app=app)
+  async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+    done = asyncio.Event()
+    health_latencies = []
+
+    async def reader() -> None:
+      for _ in range(rounds):
+        r = await client.get("/investments/")
+        r.raise_for_status()
+
+    async def prober() -> None:
+      # Probes are scheduled on a fixed cadence and latency is measured from the
+      # scheduled time, so time spent waiting on a stalled loop is counted.
+      interval = 0.005
+      scheduled = time.perf_counter()
+      while not done.is_set():
+        delay = scheduled - time.perf_counter()
+        if delay > 0:
+          await asyncio.sleep(delay)
+        r = await client.get("/health/")
+        r.raise_for_status()
+        health_latencies.append(time.perf_counter() - scheduled)
+        scheduled = max(scheduled + interval, time.perf_counter())
+
+    probe_task = asyncio.create_task(prober())
+    await asyncio.sleep(0.05)
+    await asyncio.gather(*(reader() for _ in range(readers)))
+    done.set()
+    await probe_task
+    return health_latencies
+
+
+def main() -> None:
+  parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+  parser.add_argument("--rows", type=int, default=1000)
+  parser.add_argument("--readers", type=int, default=50)
+  parser.add_argument("--rounds", type=int, default=2)
+  args = parser.parse_args()
+
+  use_temp_db("bench-event-loop")
+  _seed(args.rows)
+
+  from app.services import blocking_io
+
+  executor_run = blocking_io.run_blocking
+
+  async def inline_run(fn, *a, **kw):
+    return fn(*a, **kw)
+
+  print(f"rows={args.rows} concurrent /investments/ readers={args.readers} rounds={args.rounds}")
+  for label, runner in (("inline (baseline)", inline_run), ("executor", executor_run)):
+    blocking_io.run_blocking = runner
+    started = time.perf_counter()
+    lat = asyncio.run(_run(args.readers, args.rounds))
+    elapsed = time.perf_counter() - started
+    print(
+      f"{label:18s} /health/ n={len(lat):5d} p50={fmt_ms(percentile(lat, 50))} "
+      f"p99={fmt_ms(percentile(lat, 99))} max={fmt_ms(max(lat) if lat else 0.0)} wall={elapsed:.2f}s"
+    )
+
+
+if __name__ == "__main__":
+  main()
@@ -0,0 +1,134 @@
+"""Vision payload size and upload latency per image preprocessing preset.
+
+Generates fixtures (a 12 MP phone photo of a bill on a desk, a PNG screenshot and a
+two-page PDF), uploads each through POST /bills/upload under every preset against the
+local OpenAI stub, and reports the bytes that reached the stub and end-to-end latency.
+The stub charges request bodies against a simulated uplink (--upload-mbps), which is
+where smaller payloads pay off.
+
+  python -m benchmarks.bench_image_preprocess --repeat 3 --upload-mbps 20
+"""
+import argparse
+import io
+import os
+import statistics
+import tempfile
+import time
+
+from ._common import serve_app, use_temp_db
+from .openai_stub import StubServer
+
+
+def _bill_page(width: int, height: int, seed: int):
+  from PIL import Image, ImageDraw
+
+  page = Image.new("RGB", (width, height), (250, 248, 240))
+  draw = ImageDraw.Draw(page)
+  draw.text((width * 0.08, height * 0.04), f"TAX INVOICE  No. {seed:05d}", fill=(20, 20, 20))
+  for row in range(40):
+    y = height * 0.1 + row * height * 0.02
+    draw.text((width * 0.08, y), f"{row + 1:>2}  22K gold chain  9.870 g  7250.00  850.00", fill=(30, 30, 30))
+    draw.line((width * 0.08, y + 12, width * 0.92, y + 12), fill=(160, 160, 160))
+  return page
+
+
+def phone_photo() -> bytes:
+  """12 MP JPEG: a noisy desk with the bill in the middle, as a phone camera would save it."""
+  import numpy as np
+  from PIL import Image
+
+  rng = np.random.default_rng(7)
+  desk = rng.normal((120, 85, 60), 18, size=(3024, 4032, 3)).clip(0, 255).astype("uint8")
+  photo = Image.fromarray(desk)
+  photo.paste(_bill_page(2000, 2700, 1), (1000, 160))
+  out = io.BytesIO()
+  photo.save(out, format="JPEG", quality=92)
+  return out.getvalue()
+
+
+def screenshot() -> bytes:
+  out = io.BytesIO()
+  _bill_page(1170, 2532, 2).save(out, format="PNG")
+  return out.getvalue()
+
+
+def two_page_pdf() -> bytes:
+  import fitz
+
+  doc = fitz.open()
+  for p in range(2):
+    page = doc.new_page(width=595, height=842)
+    page.insert_text((40, 50), f"TAX INVOICE  page {p + 1}", fontsize=16)
+    for row in range(60):
+      page.insert_text((40, 80 + row * 12), f"{row + 1:>3}  22K gold chain  9.870 g  7250.00  850.00", fontsize=8)
+  data = doc.tobytes()
+  doc.close()
+  return data
+
+
+FIXTURES = {
+  "phone_photo.jpg": ("image/jpeg", phone_photo),
+  "screenshot.png": ("image/png", screenshot),
+  "invoice.pdf": ("application/pdf", two_page_pdf),
+}
+
+
+def _unique(data: bytes, content_type: str, n: int) -> bytes:
+  # Trailing bytes keep every upload distinct (the bills registry rejects duplicates) and
+  # are ignored by image decoders; a PDF takes a trailing comment.
+  return data + (b"\n%" if content_type == "application/pdf" else b"") + f"bench-{n}-{time.time_ns()}".encode()
+
+
+def main() -> None:
+  parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+  parser.add_argument("--repeat", type=int, default=3, help="uploads per fixture and preset")
+  parser.add_argument("--latency", type=float, default=0.3, help="stub seconds per completion")
+  parser.add_argument("--upload-mbps", type=float, default=20.0, help="simulated uplink to the model API")
+  parser.add_argument("--presets", default="off,color,balanced,compact")
+  args = parser.parse_args()
+
+  stub = StubServer(args.latency, upload_mbps=args.upload_mbps).start()
+  use_temp_db("bench-preprocess")
+  os.environ["BILL_FILES_DIR"] = tempfile.mkdtemp(prefix="bench-preprocess-files-")
+  os.environ["OPENAI_BASE_URL"] = stub.base_url
+  os.environ.setdefault("OPENAI_API_KEY", "stub")
+
+  import httpx
+  from app.main import app
+  from app.services import image_preprocess
+
+  fixtures = {name: (ct, make()) for name, (ct, make) in FIXTURES.items()}
+  print(f"stub latency {args.latency * 1000:.0f} ms, uplink {args.upload_mbps:g} Mbit/s, {args.repeat} upload(s) each")
+  print(f"{'fixture':>16} {'upload':>10} {'preset':>9} {'sent/req':>10} {'saved':>7} {'p50 latency':>12}")
+  n = 0
+  try:
+    with serve_app(app) as base_url, httpx.Client(base_url=base_url, timeout=None) as client:
+      for name, (content_type, data) in fixtures.items():
+        for preset in args.presets.split(","):
+          image_preprocess.DEFAULT_PRESET = preset
+          stub.reset()
+          latencies = []
+          for _ in range(args.repeat):
+            n += 1
+            started = time.perf_counter()
+            r = client.post(
+              "/bills/upload",
+              files={"file": (f"{n}-{name}", _unique(data, content_type, n), content_type)},
+              # Rendered PDF pages are identical across uploads; skip the extraction cache.
+              data={"force_refresh": "true"},
+            )
+            latencies.append(time.perf_counter() - started)
+            r.raise_for_status()
+          sent = stub.bytes_received / max(1, stub.requests)
+          payload = r.json()["payload"]
+          print(
+            f"{name:>16} {len(data) / 1e6:>8.2f}MB {preset:>9} {sent / 1e6:>8.2f}MB "
+            f"{payload['bytes_saved'] / max(1, payload['original_bytes']):>6.0%} "
+            f"{statistics.median(latencies) * 1000:>9.0f} ms"
+          )
+  finally:
+    stub.stop()
+
+
+if __name__ == "__main__":
+  main()
@@ -0,0 +1,96 @@
+"""First-page latency of the keyset-paginated investments listing as the table grows.
+
+  python -m benchmarks.bench_list_investments --sizes 10000 100000 1000000
+"""
+import argparse
+import json
+import random
+import time
+import uuid
+
+from ._common import use_temp_db
+
+
+VENDORS = ("GRT", "Tanishq", "CaratLane", "Kalyan", "Malabar")
+CATEGORIES = ("gold_jewellery", "diamond_jewellery", "bullion")
+
+
+def _grow(target: int, current: int) -> None:
+  from app.services import db
+
+  rnd = random.Random(current)
+
+  def row(i: int):
+    return (
+      str(uuid.uuid4()), f"bill-{i}", rnd.choice(CATEGORIES), f"Item {i}", rnd.choice(VENDORS),
+      f"20{rnd.randint(15, 25)}-{rnd.randint(1, 12):02d}-{rnd.randint(1, 28):02d}",
+      rnd.uniform(5000, 500000), rnd.uniform(0.5, 100), rnd.choice((24, 22, 18, 14)),
+    )
+
+  with db.connection() as conn:
+    for start in range(current, target, 50_000):
+      conn.executemany(
+        """
+        INSERT INTO investments (id, bill_id, category, name, vendor, date, total_amount, weight_grams, purity_karat)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """,
+        (row(i) for i in range(start, min(target, start + 50_000))),
+      )
+      conn.commit()
+    conn.execute("ANALYZE")
+    conn.commit()
+
+
+def _time(fn, repeat: int) -> float:
+  best = float("inf")
+  for _ in range(repeat):
+    started = time.perf_counter()
+    fn()
+    best = min(best, time.perf_counter() - started)
+  return best
+
+
+def main() -> None:
+  parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+  parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+  parser.add_argument("--limit", type=int, default=50)
+  parser.add_argument("--repeat", type=int, default=5)
+  parser.add_argument("--full-max", type=int, default=100_000, help="skip the unpaginated listing above this size")
+  args = parser.parse_args()
+
+  use_temp_db("bench-list")
+  from app.services import investment_store
+
+  def page(**filters):
+    def run():
+      records, cursor = investment_store.list_investments_page(limit=args.limit, **filters)
+      json.dumps(records)
+      return cursor
+    return run
+
+  cases = {
+    "first page": page(),
+    "category": page(category="bullion"),
+    "vendor+date range": page(vendor="GRT", date_from="2020-01-01", date_to="2021-12-31"),
+    "purity": page(purity_karat=18),
+  }
+
+  current = 0
+  print(f"limit={args.limit}, best of {args.repeat}")
+  for size in sorted(args.sizes):
+    _grow(size, current)
+    current = size
+    line = [f"rows={size:>9,}"]
+    for label, fn in cases.items():
+      line.append(f"{label}={_time(fn, args.repeat) * 1000:7.2f}ms")
+    if size <= args.full_max:
+      full = _time(lambda: json.dumps(investment_store.list_investments_page()[0]), 1)
+      line.append(f"unpaginated={full * 1000:9.1f}ms")
+    # Second page via cursor, to show the keyset seek stays flat.
+    _, cursor = investment_store.list_investments_page(limit=args.limit)
+    line.append(f"next page={_time(lambda: investment_store.list_investments_page(limit=args.limit, cursor=cursor), args.repeat) * 1000:6.2f}ms")
+    print("  ".join(line))
+
+
+if __name__ == "__main__":
+  main()
@@ -0,0 +1,115 @@
+"""Event-loop stall and render throughput for bill PDFs.
+
+Renders the same synthetic multi-page invoices three ways while a ticker coroutine
+measures how late the event loop wakes it up:
+
+  inline   first page rendered with PyMuPDF on the loop (the original upload path)
+  thread   the same call on the blocking-I/O thread pool
+  process  pdf_service.render_pages in the render process pool (every page, in parallel)
+
+  python -m benchmarks.bench_pdf_render --docs 16 --pages 2 --concurrency 4
+"""
+import argparse
+import asyncio
+import time
+
+from ._common import fmt_ms, percentile, use_temp_db
+
+
+def _make_pdf(pages: int, seed: int) -> bytes:
+  """A dense, invoice-like PDF: a table of text rows plus ruled lines on every page."""
+  import fitz
+
+  doc = fitz.open()
+  for p in range(pages):
+    page = doc.new_page(width=595, height=842)
+    page.insert_text((40, 50), f"TAX INVOICE #{seed}-{p + 1}", fontsize=16)
+    for row in range(60):
+      y = 80 + row * 12
+      page.insert_text((40, y), f"{row + 1:>3}  22K gold chain  9.870 g  7250.00  850.00  {seed * 31 + row}", fontsize=8)
+      page.draw_line((40, y + 2), (555, y + 2), width=0.3)
+  data = doc.tobytes()
+  doc.close()
+  return data
+
+
+def _first_page_png(pdf: bytes):
+  """The original upload path's renderer: page 1 at 200 dpi, or None."""
+  import fitz
+
+  try:
+    with fitz.open(stream=pdf, filetype="pdf") as doc:
+      return doc.load_page(0).get_pixmap(dpi=200).tobytes("png") if doc.page_count else None
+  except Exception:
+    return None
+
+
+async def _ticker(stop: asyncio.Event, interval: float, lateness: list) -> None:
+  scheduled = time.perf_counter() + interval
+  while not stop.is_set():
+    await asyncio.sleep(max(0.0, scheduled - time.perf_counter()))
+    now = time.perf_counter()
+    lateness.append(max(0.0, now - scheduled))
+    scheduled = now + interval
+
+
+async def _run(mode: str, pdfs: list, concurrency: int) -> dict:
+  from app.services import blocking_io, pdf_service
+
+  sem = asyncio.Semaphore(concurrency)
+
+  async def render(pdf: bytes) -> int:
+    async with sem:
+      if mode == "inline":
+        return 1 if _first_page_png(pdf) else 0
+      if mode == "thread":
+        return 1 if await blocking_io.run_blocking(_first_page_png, pdf) else 0
+      pages, _ = await pdf_service.render_pages(pdf)
+      return len(pages)
+
+  stop = asyncio.Event()
+  lateness: list = []
+  ticker = asyncio.create_task(_ticker(stop, 0.005, lateness))
+  await asyncio.sleep(0.02)
+  started = time.perf_counter()
+  pages = sum(await asyncio.gather(*(render(pdf) for pdf in pdfs)))
+  elapsed = time.perf_counter() - started
+  stop.set()
+  await ticker
+  return {"elapsed": elapsed, "pages": pages, "lateness": lateness}
+
+
+def main() -> None:
+  parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+  parser.add_argument("--docs", type=int, default=16)
+  parser.add_argument("--pages", type=int, default=2, help="pages per PDF")
+  parser.add_argument("--concurrency", type=int, default=4, help="PDFs rendered at once")
+  parser.add_argument("--modes", default="inline,thread,process")
+  args = parser.parse_args()
+
+  use_temp_db("bench-pdf")
+  from app.services import blocking_io, pdf_service
+
+  pdfs = [_make_pdf(args.pages, i) for i in range(args.docs)]
+
+  async def _all() -> None:
+    await pdf_service.startup()
+    print(f"{args.docs} PDFs x {args.pages} pages, concurrency {args.concurrency}, {pdf_service.RENDER_WORKERS} render worker(s)")
+    print(f"{'mode':>8} {'elapsed':>9} {'pages/s':>9} {'stall p99':>12} {'stall max':>12} {'stall total':>12}")
+    for mode in args.modes.split(","):
+      res = await _run(mode, pdfs, args.concurrency)
+      lateness = res["lateness"]
+      print(
+        f"{mode:>8} {res['elapsed']:>8.2f}s {res['pages'] / res['elapsed']:>9.2f} "
+        f"{fmt_ms(percentile(lateness, 99)):>12} {fmt_ms(max(lateness, default=0.0)):>12} {fmt_ms(sum(lateness)):>12}"
+      )
+
+  try:
+    asyncio.run(_all())
+  finally:
+    pdf_service.shutdown()
+    blocking_io.shutdown()
+
+
+if __name__ == "__main__":
+  main()
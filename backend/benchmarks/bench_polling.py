@@ -0,0 +1,157 @@
+"""Polling dashboard load test: full re-downloads vs conditional GETs with compression.
+
+--clients dashboards each poll today's rates for all three metals, a year of gold
+history and the investment list, --rounds times, as fast as the server answers. In the
+"plain" pass every poll asks for an uncompressed body and sends no validators (the old
+behaviour); in the "conditional" pass clients accept br/gzip and revalidate with
+If-None-Match. Meanwhile the server takes a gold rate write every --write-interval
+seconds, so some polls must still come back 200.
+
+Reports body bytes on the wire, status mix, latency and the server process's CPU time
+(the clients run in their own process).
+
+  python -m benchmarks.bench_polling --clients 20 --rounds 50 --holdings 2000
+"""
+import argparse
+import asyncio
+import datetime as dt
+import multiprocessing
+import threading
+import time
+from collections import Counter
+from typing import Dict, List, Tuple
+
+from ._common import percentile, serve_app, use_temp_db
+
+
+DASHBOARD = (
+  "/rates/gold/today",
+  "/rates/silver/today",
+  "/rates/platinum/today",
+  "/rates/gold/history?limit=365",
+  "/investments/",
+)
+
+
+def _seed(years: int, holdings: int) -> None:
+  import random
+
+  from app.services import investment_store, rate_backfill
+
+  rnd = random.Random(5)
+  today = dt.date.today()
+  lines = ["metal,purity,date,inr_per_gram"]
+  for i in range(365 * years, -1, -1):
+    day = (today - dt.timedelta(days=i)).isoformat()
+    r24 = 7000 + (365 * years - i) * 2.5
+    for karat in (24, 22, 18, 14, 9):
+      lines.append(f"gold,{karat}K,{day},{r24 * karat / 24:.2f}")
+    lines.append(f"silver,999,{day},{60 + rnd.random() * 40:.2f}")
+    lines.append(f"platinum,950,{day},{2500 + rnd.random() * 500:.2f}")
+  rate_backfill.run(lines, "csv", "bench")
+  investment_store.create_investments([
+    {
+      "bill_id": f"bill-{i}",
+      "category": rnd.choice(("gold_jewellery", "diamond_jewellery")),
+      "name": f"Item {i}",
+      "vendor": rnd.choice(("GRT", "Tanishq", "CaratLane")),
+      "date": (today - dt.timedelta(days=rnd.randint(0, 365 * years))).isoformat(),
+      "total_amount": round(rnd.uniform(5000, 500000), 2),
+      "weight_grams": round(rnd.uniform(0.5, 100), 3),
+      "purity_karat": rnd.choice((24, 22, 18)),
+      "metadata": {"stoneCost": round(rnd.uniform(5000, 50000), 2)},
+    }
+    for i in range(holdings)
+  ])
+
+
+def _poll(url: str, clients: int, rounds: int, conditional: bool) -> Tuple[list, float]:
+  """Client process: ``clients`` dashboards polling ``rounds`` times. Returns
+  ([(status, wire body bytes, seconds)], elapsed seconds)."""
+  import httpx
+
+  async def dashboard(client: httpx.AsyncClient, results: list) -> None:
+    etags: Dict[str, str] = {}
+    for _ in range(rounds):
+      for path in DASHBOARD:
+        headers = {"accept-encoding": "br, gzip" if conditional else "identity"}
+        if conditional and path in etags:
+          headers["if-none-match"] = etags[path]
+        started = time.perf_counter()
+        r = await client.get(path, headers=headers)
+        await r.aread()
+        results.append((r.status_code, r.num_bytes_downloaded, time.perf_counter() - started))
+        if "etag" in r.headers:
+          etags[path] = r.headers["etag"]
+
+  async def run() -> list:
+    results: list = []
+    async with httpx.AsyncClient(base_url=url, timeout=None) as client:
+      await asyncio.gather(*(dashboard(client, results) for _ in range(clients)))
+    return results
+
+  started = time.perf_counter()
+  results = asyncio.run(run())
+  return results, time.perf_counter() - started
+
+
+def _writer(stop: threading.Event, interval: float) -> None:
+  from app.services import rate_store
+
+  price = 16000.0
+  while not stop.wait(interval):
+    price += 1
+    rate_store.upsert_rates("gold", dt.date.today().isoformat(), {"24K": price}, "bench", "x")
+
+
+def _report(label: str, results: List[tuple], elapsed: float, cpu: float) -> Dict[str, float]:
+  statuses = Counter(status for status, _, _ in results)
+  body = sum(n for _, n, _ in results)
+  latencies = [s for _, _, s in results]
+  print(
+    f"{label:>12} {len(results):>7} {statuses.get(200, 0):>6} {statuses.get(304, 0):>6} "
+    f"{body / 1e6:>9.2f} MB {body / len(results) / 1024:>7.1f} KB "
+    f"{percentile(latencies, 50) * 1000:>6.1f} ms {cpu:>7.2f} s {cpu / len(results) * 1000:>7.2f} ms "
+    f"{len(results) / elapsed:>7.0f}"
+  )
+  return {"bytes": body, "cpu": cpu}
+
+
+def main() -> None:
+  parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+  parser.add_argument("--clients", type=int, default=20)
+  parser.add_argument("--rounds", type=int, default=20)
+  parser.add_argument("--years", type=int, default=3, help="years of seeded daily rates")
+  parser.add_argument("--holdings", type=int, default=1000)
+  parser.add_argument("--write-interval", type=float, default=2.0, help="seconds between gold rate writes")
+  args = parser.parse_args()
+
+  use_temp_db("bench-polling")
+  _seed(args.years, args.holdings)
+  from app.main import app
+
+  print(f"{args.clients} dashboards x {args.rounds} rounds x {len(DASHBOARD)} endpoints; a gold rate write every {args.write_interval:g}s")
+  print(f"{'mode':>12} {'polls':>7} {'200':>6} {'304':>6} {'body bytes':>12} {'per poll':>10} {'p50':>9} {'srv CPU':>9} {'CPU/poll':>10} {'polls/s':>7}")
+  ctx = multiprocessing.get_context("spawn")
+  totals = {}
+  with serve_app(app) as base_url, ctx.Pool(1) as pool:
+    pool.apply(_poll, (base_url, 2, 1, False))  # warm up connections and caches
+    for label, conditional in (("plain", False), ("conditional", True)):
+      stop = threading.Event()
+      writer = threading.Thread(target=_writer, args=(stop, args.write_interval), daemon=True)
+      writer.start()
+      cpu_started = time.process_time()
+      results, elapsed = pool.apply(_poll, (base_url, args.clients, args.rounds, conditional))
+      cpu = time.process_time() - cpu_started
+      stop.set()
+      writer.join()
+      totals[label] = _report(label, results, elapsed, cpu)
+  plain, cond = totals["plain"], totals["conditional"]
+  print(
+    f"\nbytes sent {plain['bytes'] / max(cond['bytes'], 1):.1f}x lower, "
+    f"server CPU {plain['cpu'] / max(cond['cpu'], 1e-9):.1f}x lower with validators and compression"
+  )
+
+
+if __name__ == "__main__":
+  main()
@@ -0,0 +1,98 @@
+"""Batched as-of rate lookup vs one SQL query per purchase date.
+
+Seeds --years of weekday gold rates (weekends and holidays have no row), then looks up
+the 22K rate on or before --dates random purchase dates both ways.
+
+  python -m benchmarks.bench_rate_asof --years 20 --dates 100000
+"""
+import argparse
+import datetime as dt
+import time
+
+import numpy as np
+
+from ._common import use_temp_db
+
+
+def _seed(years: int) -> int:
+  from app.services import db
+
+  rnd = np.random.default_rng(3)
+  start = dt.date.today() - dt.timedelta(days=365 * years)
+  rows = []
+  for i in range(365 * years):
+    day = start + dt.timedelta(days=i)
+    if day.weekday() >= 5 or rnd.random() < 0.03:
+      continue
+    r24 = 3000 + i * 0.8 + rnd.normal(0, 20)
+    for karat in (24, 22, 18, 14, 9):
+      rows.append(("gold", f"{karat}K", day.isoformat(), round(r24 * karat / 24, 2), "bench", "x"))
+  with db.connection() as conn:
+    conn.executemany(
+      "INSERT INTO metal_rates (metal, purity, date, inr_per_gram, source, captured_at_ist) VALUES (?, ?, ?, ?, ?, ?)",
+      rows,
+    )
+    conn.commit()
+  return len(rows)
+
+
+def _per_date(dates):
+  from app.services import db
+
+  out = []
+  with db.connection() as conn:
+    for date in dates:
+      row = conn.execute(
+        """
+        SELECT inr_per_gram FROM metal_rates
+        WHERE metal = 'gold' AND purity = '22K' AND date <= ? AND inr_per_gram > 0
+        ORDER BY date DESC LIMIT 1
+        """,
+        (date,),
+      ).fetchone()
+      out.append(row[0] if row else float("nan"))
+  return np.array(out)
+
+
+def main() -> None:
+  parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+  parser.add_argument("--years", type=int, default=20)
+  parser.add_argument("--dates", type=int, default=100_000)
+  args = parser.parse_args()
+
+  use_temp_db("bench-rate-asof")
+  from app.services import investment_store, rate_store  # noqa: F401  (imports create the schema)
+
+  rows = _seed(args.years)
+  rnd = np.random.default_rng(11)
+  today = np.datetime64(dt.date.today(), "D")
+  dates = [str(d) for d in today - rnd.integers(0, 365 * args.years + 30, args.dates)]
+
+  started = time.perf_counter()
+  rate_store.rates_asof("gold", "22K", dates[:1])
+  t_load = time.perf_counter() - started
+
+  started = time.perf_counter()
+  batched, _ = rate_store.rates_asof("gold", "22K", dates)
+  t_batch = time.perf_counter() - started
+
+  started = time.perf_counter()
+  naive = _per_date(dates)
+  t_naive = time.perf_counter() - started
+
+  rate_store.upsert_rates("gold", str(today), {"22K": 99999.0}, "bench", "x")
+  started = time.perf_counter()
+  after, _ = rate_store.rates_asof("gold", "22K", [str(today)])
+  t_refresh = time.perf_counter() - started
+
+  same = np.allclose(batched, naive, equal_nan=True)
+  print(f"{rows} stored rates, {args.dates} lookup dates")
+  print(f"  index load (first call)   {t_load * 1000:9.1f} ms")
+  print(f"  batched as-of             {t_batch * 1000:9.1f} ms")
+  print(f"  one query per date        {t_naive * 1000:9.1f} ms  ({t_naive / t_batch:.0f}x slower)")
+  print(f"  lookup after an upsert    {t_refresh * 1000:9.1f} ms  (rate {after[0]:g}, no reload)")
+  print(f"  results match: {same}")
+
+
+if __name__ == "__main__":
+  main()
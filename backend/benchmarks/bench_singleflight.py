@@ -0,0 +1,153 @@
+"""Check that concurrent /rates/gold/today misses share one upstream scrape.
+
+A local stand-in for goodreturns.in counts requests. The script fires a burst of
+concurrent requests while today's row is missing and reports how many reached upstream,
+then repeats against a failing and a hanging upstream to exercise negative caching and
+the fetch timeout. Exits non-zero if any expectation fails.
+
+  python -m benchmarks.bench_singleflight --clients 200
+"""
+import argparse
+import asyncio
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from ._common import fmt_ms, percentile, use_temp_db
+
+
+_PAGE = "".join(
+  f"<tr><td>{label}</td><td>₹{price:,}</td></tr>"
+  for label, price in (("24K", 15000), ("22K", 13750), ("18K", 11250), ("14K", 8750), ("9K", 5625))
+).encode("utf-8")
+
+
+class Upstream:
+  """Counts hits; ``mode`` is "ok", "fail" or "hang" and ``delay_s`` slows every response."""
+
+  def __init__(self) -> None:
+    self.hits = 0
+    self.mode = "ok"
+    self.delay_s = 0.2
+    self._lock = threading.Lock()
+    upstream = self
+
+    class Handler(BaseHTTPRequestHandler):
+      def do_GET(self) -> None:
+        with upstream._lock:
+          upstream.hits += 1
+        time.sleep(upstream.delay_s if upstream.mode != "hang" else 5.0)
+        status = 500 if upstream.mode == "fail" else 200
+        body = b"upstream error" if status != 200 else _PAGE
+        self.send_response(status)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        try:
+          self.wfile.write(body)
+        except OSError:
+          pass
+
+      def log_message(self, *args) -> None:
+        pass
+
+    self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    self.server.daemon_threads = True
+    threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+  @property
+  def url(self) -> str:
+    return f"http://127.0.0.1:{self.server.server_address[1]}/gold-rates/"
+
+  def reset(self, mode: str) -> None:
+    with self._lock:
+      self.hits = 0
+    self.mode = mode
+
+
+async def _burst(client, clients: int):
+  latencies = []
+
+  async def one():
+    started = time.perf_counter()
+    r = await client.get("/rates/gold/today")
+    latencies.append(time.perf_counter() - started)
+    return r.status_code
+
+  statuses = await asyncio.gather(*(one() for _ in range(clients)))
+  return statuses, latencies
+
+
+async def _run(upstream: Upstream, clients: int) -> bool:
+  import httpx
+  from app.main import app
+  from app.services import rate_store
+
+  ok = True
+
+  def check(label: str, condition: bool) -> None:
+    nonlocal ok
+    ok &= condition
+    print(f"  [{'PASS' if condition else 'FAIL'}] {label}")
+
+  transport = httpx.ASGITransport(app=app)
+  async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=30) as client:
+    print(f"failing upstream, {clients} concurrent clients")
+    upstream.reset("fail")
+    statuses, _ = await _burst(client, clients)
+    check(f"one upstream hit for the burst (got {upstream.hits})", upstream.hits == 1)
+    check("every client got 502", all(s == 502 for s in statuses))
+    statuses, _ = await _burst(client, clients)
+    check(f"failure is negatively cached (upstream hits still {upstream.hits})", upstream.hits == 1)
+
+    print(f"hanging upstream (timeout {rate_store.RATE_FETCH_TIMEOUT_S}s)")
+    rate_store.rate_fetches.forget()
+    upstream.reset("hang")
+    started = time.perf_counter()
+    statuses, _ = await _burst(client, clients)
+    elapsed = time.perf_counter() - started
+    check(f"one upstream hit (got {upstream.hits})", upstream.hits == 1)
+    check(f"burst bounded by the timeout ({elapsed:.2f}s)", elapsed < rate_store.RATE_FETCH_TIMEOUT_S + 1.0)
+    check("every client got 502", all(s == 502 for s in statuses))
+
+    print(f"healthy upstream ({upstream.delay_s * 1000:.0f} ms per scrape)")
+    rate_store.rate_fetches.forget()
+    upstream.reset("ok")
+    statuses, latencies = await _burst(client, clients)
+    check(f"one upstream hit for the burst (got {upstream.hits})", upstream.hits == 1)
+    check("every client got 200", all(s == 200 for s in statuses))
+    print(f"    p50 {fmt_ms(percentile(latencies, 50))}  p99 {fmt_ms(percentile(latencies, 99))}")
+    statuses, _ = await _burst(client, clients)
+    check(f"follow-up burst served from the stored row (upstream hits {upstream.hits})", upstream.hits == 1)
+
+    print("stats:", rate_store.rate_fetches.stats())
+  return ok
+
+
+def main() -> None:
+  parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+  parser.add_argument("--clients", type=int, default=100)
+  parser.add_argument("--timeout", type=float, default=1.0, help="RATE_FETCH_TIMEOUT_S for the run")
+  args = parser.parse_args()
+
+  upstream = Upstream()
+  use_temp_db("bench-singleflight")
+  os.environ["GOODRETURNS_URL"] = upstream.url
+  os.environ["RATE_FETCH_TIMEOUT_S"] = str(args.timeout)
+  # Count coalescing alone: with HTTP retries on, one shared fetch may hit upstream more than once.
+  os.environ["HTTP_RETRY_ATTEMPTS"] = "0"
+  # The routes key "today" on the local date while the scraper stamps rows with the IST
+  # date; run in IST (as the service is deployed) so the two agree at any hour.
+  os.environ["TZ"] = "Asia/Kolkata"
+  time.tzset()
+  try:
+    ok = asyncio.run(_run(upstream, args.clients))
+  finally:
+    upstream.server.shutdown()
+  sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+  main()
@@ -0,0 +1,110 @@
+"""Peak Python heap (tracemalloc) while many large bills are uploaded at once.
+
+Fires --uploads concurrent uploads of --size-mb each at the server and reports the peak
+traced allocation above the idle baseline for two paths:
+
+  buffered   the previous upload_bill pattern, mounted here as a bench-only route:
+             file.read() the whole upload, hash it, base64 it, write it out
+  streaming  POST /bills/upload: chunked ingest to disk, with the stored file
+             base64-streamed into the OpenAI request body once a slot is free
+
+The uploads are sent from, and the OpenAI stub runs in, separate processes so only the
+server's allocations are traced. Preprocessing is off by default so the full payload
+reaches the stub.
+
+  python -m benchmarks.bench_upload_memory --uploads 20 --size-mb 10
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import tempfile
+import time
+import tracemalloc
+
+from ._common import serve_app, use_temp_db
+from .openai_stub import stub_process
+
+
+def _send(url: str, uploads: int, size: int) -> list:
+  """Client process: ``uploads`` concurrent multipart uploads of distinct random files."""
+  import httpx
+
+  async def run() -> list:
+    async with httpx.AsyncClient(timeout=None) as client:
+      async def one(i: int) -> int:
+        data = os.urandom(size)
+        r = await client.post(url, files={"file": (f"bill-{i}-{time.time_ns()}.png", data, "image/png")})
+        return r.status_code
+
+      return await asyncio.gather(*(one(i) for i in range(uploads)))
+
+  return asyncio.run(run())
+
+
+def _mount_buffered_route(app) -> None:
+  import base64
+  import hashlib
+
+  from fastapi import File, UploadFile
+
+  from app.services import bill_store, openai_client
+
+  @app.post("/bench/buffered-upload")
+  async def buffered_upload(file: UploadFile = File(...)) -> dict:
+    raw_bytes = await file.read()
+    hashlib.sha256(raw_bytes).hexdigest()
+    data_url = f"data:{file.content_type};base64,{base64.b64encode(raw_bytes).decode('utf-8')}"
+    os.makedirs(bill_store.TEMP_DIR, exist_ok=True)
+    with open(os.path.join(bill_store.TEMP_DIR, f"buffered-{time.time_ns()}"), "wb") as f:
+      f.write(raw_bytes)
+    await openai_client.get_client().call_gpt4o_vision("bench", data_url)
+    return {"size": len(raw_bytes)}
+
+
+def _run(args) -> None:
+  from app.main import app
+  from app.services import openai_client
+
+  _mount_buffered_route(app)
+  size = int(args.size_mb * 1024 * 1024)
+  ctx = multiprocessing.get_context("spawn")
+  print(
+    f"{args.uploads} concurrent uploads of {args.size_mb:g} MB, "
+    f"OPENAI_MAX_CONCURRENCY={openai_client.MAX_CONCURRENCY}, preset={args.preset}"
+  )
+  print(f"{'path':>10} {'peak heap':>11} {'per upload':>11} {'elapsed':>9} {'ok':>4}")
+  with serve_app(app) as base_url, ctx.Pool(1) as pool:
+    for name, route in (("buffered", "/bench/buffered-upload"), ("streaming", "/bills/upload")):
+      tracemalloc.start()
+      baseline = tracemalloc.get_traced_memory()[0]
+      started = time.perf_counter()
+      statuses = pool.apply(_send, (base_url + route, args.uploads, size))
+      elapsed = time.perf_counter() - started
+      peak = tracemalloc.get_traced_memory()[1] - baseline
+      tracemalloc.stop()
+      print(
+        f"{name:>10} {peak / 2**20:>8.1f} MB {peak / args.uploads / 2**20:>8.1f} MB "
+        f"{elapsed:>8.2f}s {sum(s == 200 for s in statuses):>4}"
+      )
+
+
+def main() -> None:
+  parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+  parser.add_argument("--uploads", type=int, default=20)
+  parser.add_argument("--size-mb", type=float, default=10.0)
+  parser.add_argument("--latency", type=float, default=0.2, help="stub seconds per completion")
+  parser.add_argument("--preset", default="off", help="IMAGE_PREPROCESS_PRESET for the streaming path")
+  args = parser.parse_args()
+
+  with stub_process(args.latency) as stub_url:
+    use_temp_db("bench-upload-memory")
+    os.environ["BILL_FILES_DIR"] = tempfile.mkdtemp(prefix="bench-upload-memory-files-")
+    os.environ["OPENAI_BASE_URL"] = stub_url
+    os.environ.setdefault("OPENAI_API_KEY", "stub")
+    os.environ["IMAGE_PREPROCESS_PRESET"] = args.preset
+    _run(args)
+
+
+if __name__ == "__main__":
+  main()
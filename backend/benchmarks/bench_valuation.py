@@ -0,0 +1,113 @@
+"""Mark-to-market 100k synthetic holdings: vectorized engine vs a per-dict Python loop.
+
+  python -m benchmarks.bench_valuation --holdings 100000
+"""
+import argparse
+import json
+import random
+import time
+import uuid
+
+from ._common import use_temp_db
+
+
+CATEGORIES = ("gold_jewellery", "diamond_jewellery", "bullion")
+
+
+def _seed(n: int) -> None:
+  from app.services import db, investment_store, rate_store  # noqa: F401  (imports create the schema)
+
+  rnd = random.Random(42)
+
+  def row(i: int):
+    category = rnd.choice(CATEGORIES)
+    metadata = None
+    name = f"Item {i}"
+    if category == "diamond_jewellery":
+      metadata = json.dumps({"stoneCost": rnd.uniform(5000, 50000)})
+    elif category == "bullion":
+      metal = rnd.choice(("gold", "silver", "platinum"))
+      name = f"{metal.title()} bar {i}"
+      metadata = json.dumps({"metal": metal})
+    return (
+      str(uuid.uuid4()), f"bill-{i}", category, name, rnd.choice(("GRT", "Tanishq", "CaratLane")),
+      f"202{rnd.randint(0, 5)}-0{rnd.randint(1, 9)}-1{rnd.randint(0, 9)}",
+      rnd.uniform(5000, 500000), rnd.uniform(0.5, 100), rnd.choice((24, 22, 18, 14, 9)), metadata,
+    )
+
+  with db.connection() as conn:
+    conn.executemany(
+      """
+      INSERT INTO investments (id, bill_id, category, name, vendor, date, total_amount, weight_grams, purity_karat, metadata)
+      VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+      """,
+      (row(i) for i in range(n)),
+    )
+    conn.commit()
+  rate_store.upsert_daily_rate("2026-01-01", 15000, 13750, 11250, 8750, 5600, "bench", "2026-01-01T10:30:00+05:30")
+  rate_store.upsert_daily_silver_rate("2026-01-01", 250, "bench", "2026-01-01T10:30:00+05:30")
+  rate_store.upsert_daily_platinum_rate("2026-01-01", 3200, "bench", "2026-01-01T10:30:00+05:30")
+
+
+def _naive(records, latest) -> float:
+  """One Python dict at a time, the way the dashboard does it today."""
+  from app.services import rate_store
+
+  gold = latest["gold"]["inr_per_gram"]
+  silver = latest["silver"]["inr_per_gram"][rate_store.BASE_PURITY["silver"]]
+  platinum = latest["platinum"]["inr_per_gram"][rate_store.BASE_PURITY["platinum"]]
+  total = 0.0
+  for inv in records:
+    meta = inv.get("metadata") or {}
+    weight = inv.get("weight_grams") or meta.get("netMetalWeight") or 0
+    metal = str(meta.get("metal") or "").lower()
+    if inv["category"] == "bullion" and "silver" in metal:
+      total += silver * weight
+    elif inv["category"] == "bullion" and "platinum" in metal:
+      total += platinum * weight
+    else:
+      rate = gold.get(f"{inv.get('purity_karat') or 24}K") or gold["24K"]
+      total += rate * weight + (meta.get("stoneCost") or 0)
+  return total
+
+
+def main() -> None:
+  parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+  parser.add_argument("--holdings", type=int, default=100_000)
+  parser.add_argument("--repeat", type=int, default=5)
+  args = parser.parse_args()
+
+  use_temp_db("bench-valuation")
+  _seed(args.holdings)
+  from app.services import investment_store, rate_store, valuation
+
+  def best(fn):
+    times = []
+    out = None
+    for _ in range(args.repeat):
+      started = time.perf_counter()
+      out = fn()
+      times.append(time.perf_counter() - started)
+    return min(times), out
+
+  t_load, holdings = best(valuation.load_holdings)
+  rates = valuation.latest_rate_snapshot()
+  t_mark, marked = best(lambda: valuation.mark_to_market(holdings, rates))
+  t_full, _ = best(valuation.compute_valuation)
+
+  t_list, records = best(investment_store.list_investments)
+  latest = rate_store.latest_rates()
+  t_loop, naive_total = best(lambda: _naive(records, latest))
+
+  print(f"holdings={args.holdings} (best of {args.repeat})")
+  print(f"  columnar load        {t_load * 1000:9.1f} ms")
+  print(f"  vectorized mark      {t_mark * 1000:9.1f} ms")
+  print(f"  compute_valuation    {t_full * 1000:9.1f} ms  (load + mark + aggregates)")
+  print(f"  list_investments     {t_list * 1000:9.1f} ms")
+  print(f"  per-dict loop        {t_loop * 1000:9.1f} ms")
+  print(f"  end-to-end speedup   {(t_list + t_loop) / t_full:9.1f}x")
+  print(f"  market value (vectorized / naive): {marked['market_value'].sum():,.0f} / {naive_total:,.0f}")
+
+
+if __name__ == "__main__":
+  main()
@@ -0,0 +1,253 @@
+"""Local stand-in for the OpenAI chat completions endpoint.
+
+Answers every ``POST /chat/completions`` after a latency (``latency_s`` plus up to
+``jitter_s`` of uniform noise, plus, optionally, the time the request body would take over a
+link of ``upload_mbps``) with a canned bill extraction, and counts requests, request bytes,
+injected errors and peak concurrency. A fraction ``error_rate`` of requests fails with
+``error_status`` instead, to exercise the client's retries.
+
+Canned answers are the gold extraction below, or the diamond one when the request carries
+the diamond prompt; ``responses`` (``--responses FILE``, a JSON object or a list of them)
+replaces both, cycling through the list. Usable from a script (``StubServer``) or
+standalone, with the app pointed at it through ``OPENAI_BASE_URL``:
+
+  python -m benchmarks.openai_stub --port 8099 --latency 1.5 --error-rate 0.05
+  OPENAI_BASE_URL=http://127.0.0.1:8099/v1 OPENAI_API_KEY=stub uvicorn app.main:app
+"""
+import argparse
+import itertools
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Iterator, List, Optional
+
+
+CANNED_EXTRACTION: Dict[str, Any] = {
+  "vendor": "GRT",
+  "productName": "Gold chain",
+  "purchaseDate": "2025-01-10",
+  "netMetalWeight": 9.87,
+  "stoneWeight": None,
+  "grossWeight": 9.87,
+  "goldRatePerGram": 7250,
+  "makingChargesPerGram": 850,
+  "hallmarkCharges": 45,
+  "stoneCost": None,
+  "grossPrice": 80000,
+  "gst": {"cgst": 1200, "sgst": 1200, "total": 2400},
+  "discounts": None,
+  "finalPrice": 82400,
+  "goldPurity": "22K",
+}
+
+CANNED_DIAMOND_EXTRACTION: Dict[str, Any] = {
+  "vendor": "Tanishq",
+  "productName": "Diamond ring",
+  "purchaseDate": "2025-02-14",
+  "netMetalWeight": 2.41,
+  "stoneWeight": 0.032,
+  "grossWeight": 2.44,
+  "goldRatePerGram": 8428,
+  "makingChargesPerGram": 1450,
+  "hallmarkCharges": 45,
+  # Left out, as on many real bills, so the server derives it from grossPrice.
+  "stoneCost": None,
+  "grossPrice": 48530,
+  "gst": {"cgst": 728, "sgst": 728, "total": 1456},
+  "discounts": 2000,
+  "finalPrice": 47986,
+  "goldPurity": "14K",
+  "diamondCarat": 0.159,
+  "diamondCut": "Round",
+  "diamondClarity": "SI1",
+  "diamondColor": "GH",
+  "diamondCertificate": "IGI",
+}
+
+# Distinctive text of the diamond extraction prompt (app/routes/bills.py).
+_DIAMOND_MARKER = b"Indian DIAMOND jewellery"
+
+
+def load_responses(path: str) -> List[Dict[str, Any]]:
+  """Canned extractions from a JSON file holding one object or a list of them."""
+  with open(path, encoding="utf-8") as f:
+    data = json.load(f)
+  return data if isinstance(data, list) else [data]
+
+
+class StubServer:
+  """Threaded stub; every request sleeps ``latency_s`` (+ jitter) to mimic model latency."""
+
+  def __init__(
+    self,
+    latency_s: float = 1.0,
+    host: str = "127.0.0.1",
+    port: int = 0,
+    upload_mbps: float = 0.0,
+    jitter_s: float = 0.0,
+    error_rate: float = 0.0,
+    error_status: int = 500,
+    responses: Optional[List[Dict[str, Any]]] = None,
+    seed: Optional[int] = None,
+  ) -> None:
+    self.latency_s = latency_s
+    self.upload_mbps = upload_mbps
+    self.jitter_s = jitter_s
+    self.error_rate = error_rate
+    self.error_status = error_status
+    self.requests = 0
+    self.errors = 0
+    self.bytes_received = 0
+    self.in_flight = 0
+    self.peak_in_flight = 0
+    self._lock = threading.Lock()
+    self._random = random.Random(seed)
+    self._responses = itertools.cycle(responses) if responses else None
+    stub = self
+
+    class Handler(BaseHTTPRequestHandler):
+      protocol_version = "HTTP/1.1"
+
+      def do_POST(self) -> None:
+        length = int(self.headers.get("Content-Length") or 0)
+        request_body = self.rfile.read(length)
+        with stub._lock:
+          stub.requests += 1
+          stub.bytes_received += length
+          stub.in_flight += 1
+          stub.peak_in_flight = max(stub.peak_in_flight, stub.in_flight)
+          delay = stub.latency_s + stub._random.uniform(0, stub.jitter_s)
+          failed = stub._random.random() < stub.error_rate
+          if failed:
+            stub.errors += 1
+          extraction = stub._canned(request_body)
+        try:
+          transfer_s = length * 8 / (stub.upload_mbps * 1e6) if stub.upload_mbps > 0 else 0.0
+          time.sleep(delay + transfer_s)
+        finally:
+          with stub._lock:
+            stub.in_flight -= 1
+        if failed:
+          status = stub.error_status
+          body = json.dumps({"error": {"message": "Injected by the OpenAI stub", "type": "server_error"}}).encode("utf-8")
+        else:
+          status = 200
+          body = json.dumps({
+            "id": "chatcmpl-stub",
+            "object": "chat.completion",
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": json.dumps(extraction)}}],
+          }).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+      def log_message(self, *args) -> None:
+        pass
+
+    self.server = ThreadingHTTPServer((host, port), Handler)
+    self.server.daemon_threads = True
+    self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+  @property
+  def base_url(self) -> str:
+    host, port = self.server.server_address[:2]
+    return f"http://{host}:{port}/v1"
+
+  def start(self) -> "StubServer":
+    self._thread.start()
+    return self
+
+  def _canned(self, request_body: bytes) -> Dict[str, Any]:
+    if self._responses is not None:
+      return next(self._responses)
+    # The prompt precedes the images in the body, so only its start needs searching.
+    if _DIAMOND_MARKER in request_body[:16384]:
+      return CANNED_DIAMOND_EXTRACTION
+    return CANNED_EXTRACTION
+
+  def reset(self) -> None:
+    with self._lock:
+      self.requests = 0
+      self.errors = 0
+      self.bytes_received = 0
+      self.peak_in_flight = 0
+
+  def stop(self) -> None:
+    self.server.shutdown()
+
+
+@contextmanager
+def stub_process(latency_s: float = 1.0, upload_mbps: float = 0.0, *extra_args: str) -> Iterator[str]:
+  """Run the stub in a child process and yield its base URL.
+
+  For memory measurements: an in-process StubServer would count every request body it
+  receives against the process being measured. ``extra_args`` are passed to the command
+  line (e.g. ``"--error-rate", "0.05"``).
+  """
+  with socket.socket() as s:
+    s.bind(("127.0.0.1", 0))
+    port = s.getsockname()[1]
+  backend_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+  proc = subprocess.Popen(
+    [sys.executable, "-m", "benchmarks.openai_stub", "--port", str(port),
+     "--latency", str(latency_s), "--upload-mbps", str(upload_mbps), *extra_args],
+    cwd=backend_dir,
+    stdout=subprocess.DEVNULL,
+  )
+  try:
+    deadline = time.monotonic() + 10
+    while True:
+      try:
+        socket.create_connection(("127.0.0.1", port), timeout=0.5).close()
+        break
+      except OSError:
+        if proc.poll() is not None or time.monotonic() > deadline:
+          raise RuntimeError("OpenAI stub process failed to start")
+        time.sleep(0.05)
+    yield f"http://127.0.0.1:{port}/v1"
+  finally:
+    proc.terminate()
+    proc.wait()
+
+
+def main() -> None:
+  parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+  parser.add_argument("--host", default="127.0.0.1")
+  parser.add_argument("--port", type=int, default=8099)
+  parser.add_argument("--latency", type=float, default=1.0, help="seconds per completion")
+  parser.add_argument("--upload-mbps", type=float, default=0.0, help="simulated uplink; 0 disables")
+  parser.add_argument("--jitter", type=float, default=0.0, help="extra uniform random seconds per completion")
+  parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests that fail")
+  parser.add_argument("--error-status", type=int, default=500, help="HTTP status of a failed request")
+  parser.add_argument("--responses", help="JSON file with a canned extraction or a list of them")
+  parser.add_argument("--seed", type=int, help="seed for jitter and error injection")
+  args = parser.parse_args()
+  stub = StubServer(
+    args.latency, args.host, args.port, args.upload_mbps,
+    jitter_s=args.jitter,
+    error_rate=args.error_rate,
+    error_status=args.error_status,
+    responses=load_responses(args.responses) if args.responses else None,
+    seed=args.seed,
+  )
+  print(
+    f"OpenAI stub listening on {stub.base_url} "
+    f"(latency {args.latency}s + up to {args.jitter}s, error rate {args.error_rate:g})"
+  )
+  try:
+    stub.server.serve_forever()
+  except KeyboardInterrupt:
+    pass
+
+
+if __name__ == "__main__":
+  main()